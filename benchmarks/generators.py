@@ -0,0 +1,133 @@
+"""
+Parametric models for the benchmarks.
+
+The models are built from arrays with Model.from_arrays. Each generator returns the model and a load vector, the
+*_with_dofs functions choose the parameters for an approximate number of DOFs.
+"""
+import numpy as np
+
+from source.OneD.beam.beam import BeamModel
+from source.OneD.frame.spatial_frame import SpatialFrameModel
+from source.OneD.truss.truss import TrussModel
+
+# steel, A = 10 cm², I = 1e-5 m⁴
+TRUSS_PROPERTIES = [1e-3, 2.1e11, 7850]  # A, E, ro
+BEAM_PROPERTIES = [1e-3, 1e-5, 2.1e11, 7850]  # A, I, E, ro
+FRAME_PROPERTIES = [1e-2, 1e-5, 2e-5, 3e-5, 2.1e11, 7850, 0.3]  # A, Iy, Iz, J, E, ro, nu
+
+
+def _grid_edges(ids: np.array) -> np.array:
+    """The edges between neighbouring grid points along every axis of a node ID grid."""
+    edges = []
+    for axis in range(ids.ndim):
+        a = np.moveaxis(ids, axis, 0)
+        edges.append(np.column_stack((a[:-1].ravel(), a[1:].ravel())))
+    return np.vstack(edges)
+
+
+def _face_diagonals(ids: np.array) -> np.array:
+    """One diagonal in every face of the grid cells, the faces normal to each axis pair."""
+    diagonals = []
+    for a, b in ((0, 1), (0, 2), (1, 2))[:3 if ids.ndim == 3 else 1]:
+        x = np.moveaxis(ids, (a, b), (0, 1))
+        diagonals.append(np.column_stack((x[:-1, :-1].ravel(), x[1:, 1:].ravel())))
+    return np.vstack(diagonals)
+
+
+def truss_grid(n: int, m: int, spatial: bool = False, spacing: float = 1.0):
+    """
+    A plane n x m cell truss grid in the x-y plane with one diagonal per cell, or a spatial grid of n x m x 1 cubes with
+    one diagonal per face. The nodes at x = 0 are fixed, the nodes at x = max are loaded downwards.
+
+    :return: model, load vector
+    """
+    shape = (n + 1, m + 1, 2) if spatial else (n + 1, m + 1)
+    ids = np.arange(np.prod(shape)).reshape(shape)
+    coords = np.stack(np.meshgrid(*(np.arange(x) * spacing for x in shape), indexing='ij'), axis=-1)
+    coords = coords.reshape(-1, len(shape))
+    connectivity = np.vstack((_grid_edges(ids), _face_diagonals(ids)))
+
+    ND = len(shape)
+    fixed = np.zeros((len(coords), ND), dtype=bool)
+    fixed[ids[0].ravel()] = True
+    model = TrussModel.from_arrays(coords, connectivity, TRUSS_PROPERTIES, fixed)
+
+    F = np.zeros(ND * len(coords))
+    F[ND * ids[-1].ravel() + 1] = -1e4
+    return model, F
+
+
+def frame_building(nx: int, ny: int, storeys: int, bay: float = 6.0, height: float = 3.5):
+    """
+    A multi-storey spatial frame: nx x ny bays, columns at every grid point and beams in both directions at every
+    floor. The base is fixed, every floor node gets a gravity and a lateral load.
+
+    :return: model, load vector
+    """
+    shape = (nx + 1, ny + 1, storeys + 1)
+    ids = np.arange(np.prod(shape)).reshape(shape)
+    spacing = np.array([bay, bay, height])
+    coords = np.stack(np.meshgrid(*(np.arange(x) for x in shape), indexing='ij'), axis=-1).reshape(-1, 3) * spacing
+    # the edges of the grid are the columns and beams, the edges in the ground floor are dropped
+    edges = _grid_edges(ids)
+    connectivity = edges[coords[edges[:, 0], 2] + coords[edges[:, 1], 2] > 0]
+
+    fixed = np.zeros((len(coords), 6), dtype=bool)
+    fixed[ids[:, :, 0].ravel()] = True
+    model = SpatialFrameModel.from_arrays(coords, connectivity, FRAME_PROPERTIES, fixed)
+
+    F = np.zeros(6 * len(coords))
+    floors = ids[:, :, 1:].ravel()
+    F[6 * floors] = 1e3  # lateral, x
+    F[6 * floors + 2] = -1e4  # gravity, -z
+    return model, F
+
+
+def beam_span(n_elements: int, length: float = None, support_spacing: int = 10):
+    """
+    A long continuous beam with a pinned support at every support_spacing-th node and a uniform set of nodal loads.
+
+    :return: model, load vector
+    """
+    length = n_elements if length is None else length
+    x = np.linspace(0, length, n_elements + 1)
+    coords = np.column_stack((x, np.zeros_like(x)))
+    connectivity = np.column_stack((np.arange(n_elements), np.arange(1, n_elements + 1)))
+    fixed = np.zeros((len(x), 2), dtype=bool)
+    fixed[::support_spacing, 0] = True
+    fixed[-1, 0] = True
+    model = BeamModel.from_arrays(coords, connectivity, BEAM_PROPERTIES, fixed)
+
+    F = np.zeros(2 * len(x))
+    F[0::2] = -1e3
+    return model, F
+
+
+def truss_grid_with_dofs(n_dofs: int, spatial: bool = False):
+    """A square truss grid with about n_dofs DOFs."""
+    per_node = 6 if spatial else 2  # DOFs per node of a column of the grid
+    n = max(int(round((n_dofs / per_node) ** 0.5)) - 1, 1)
+    return truss_grid(n, n, spatial=spatial)
+
+
+def frame_building_with_dofs(n_dofs: int):
+    """A building with 4 x 4 bays and about n_dofs DOFs, at least one storey."""
+    storeys = max(int(round(n_dofs / (6 * 25))) - 1, 1)
+    if storeys <= 50:
+        return frame_building(4, 4, storeys)
+    # larger buildings grow in plan, with 50 storeys
+    bays = max(int(round((n_dofs / (6 * 51)) ** 0.5)) - 1, 4)
+    return frame_building(bays, bays, 50)
+
+
+def beam_span_with_dofs(n_dofs: int):
+    """A continuous beam with about n_dofs DOFs."""
+    return beam_span(max(n_dofs // 2 - 1, 2))
+
+
+GENERATORS = {
+    'truss_plane': lambda n: truss_grid_with_dofs(n),
+    'truss_spatial': lambda n: truss_grid_with_dofs(n, spatial=True),
+    'frame_building': frame_building_with_dofs,
+    'beam_span': beam_span_with_dofs,
+}
@@ -0,0 +1,192 @@
+"""
+Scaling benchmarks of the model phases.
+
+For every generator (see generators.py) and every size, the phases are timed one after another on the same model and
+the peak memory allocated in each phase is recorded with tracemalloc:
+
+    construction        Model.from_arrays
+    assembly            sparse global stiffness matrix, all DOFs
+    reassembly          the same again, the sparsity pattern is reused
+    coloring            element coloring for the threaded assembly, computed once per connectivity
+    threaded_assembly   the same matrix assembled color by color with --threads threads, compare with reassembly
+    boundary_conditions free DOFs and the stiffness matrix restricted to them
+    solve               sparse factorization and solution
+    member_forces       axial forces (trusses), end forces (frames) or curvatures (beams)
+    dense_solve         Model.solve, up to --dense-limit DOFs
+    modal               Model.solve_modal, up to --modal-limit DOFs
+
+The results are written as JSON and compared with a baseline file; a phase is a regression if its time or memory grew
+by more than the tolerance factor. The times include the tracemalloc overhead unless --no-memory is given, so compare
+runs made with the same options only.
+
+Usage:
+python -m benchmarks.run --sizes 100 1000 10000 --out results.json --baseline benchmarks/baseline.json
+python -m benchmarks.run --sizes 100 1000 10000 --save-baseline benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.generators import GENERATORS
+
+
+def _measure(function, memory: bool):
+    """Runs the function, returns its result, the wall time and the peak of the memory allocated meanwhile."""
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def _member_forces(model, u):
+    if hasattr(model, 'end_forces'):
+        return model.end_forces(u)
+    if hasattr(model, 'axial_forces'):
+        return model.axial_forces(u)
+    return model.sample_curvatures(u)
+
+
+def benchmark(name: str, n_dofs: int, memory: bool = True, dense_limit: int = 5000,
+              modal_limit: int = 2000, threads: int = None) -> list:
+    """
+    Runs the phases for one generator and size.
+
+    :param threads: Number of threads of the threaded assembly, by default the number of CPUs.
+
+    :return: One record per phase: model, target and actual DOFs, number of elements, phase, time (s), peak memory (B).
+    """
+    generator = GENERATORS[name]
+    records = []
+    state = {}
+
+    def record(phase: str, function):
+        result, elapsed, peak = _measure(function, memory)
+        records.append({'model': name, 'size': n_dofs, 'n_dofs': state.get('n_dofs'),
+                        'n_elements': state.get('n_elements'), 'phase': phase, 'time': elapsed, 'memory': peak})
+        return result
+
+    model, F = record('construction', lambda: generator(n_dofs))
+    state.update(n_dofs=len(F), n_elements=len(model.elements))
+    for x in records:
+        x.update(n_dofs=len(F), n_elements=len(model.elements))
+
+    record('assembly', lambda: model.assemble_sparse_K(free=False))
+    record('reassembly', lambda: model.assemble_sparse_K(free=False))
+    threads = threads or os.cpu_count() or 1
+    record('coloring', lambda: model.element_color_blocks(threads))
+    record('threaded_assembly', lambda: model.assemble_sparse_K(free=False, max_workers=threads))
+    free = model.free_dofs()
+
+    def boundary_conditions():
+        pattern = model.sparse_pattern(model.free_dofs())
+        return pattern, pattern.assemble(model.element_stiffness_matrices())
+
+    pattern, data = record('boundary_conditions', boundary_conditions)
+
+    def solve():
+        u = np.zeros(len(F))
+        u[free] = pattern.factorize(data, spd=True).solve(F[free])
+        return u
+
+    u = record('solve', solve)
+    record('member_forces', lambda: _member_forces(model, u))
+    if len(F) <= dense_limit:
+        record('dense_solve', lambda: model.solve(F.copy(), backend='dense'))
+    if len(F) <= modal_limit:
+        record('modal', model.solve_modal)
+    return records
+
+
+def run(sizes, models=None, memory: bool = True, dense_limit: int = 5000, modal_limit: int = 2000,
+        threads: int = None) -> dict:
+    """
+    Runs the benchmarks.
+
+    :return: dict with the environment and the records, see benchmark.
+    """
+    records = []
+    for name in models or GENERATORS:
+        for size in sizes:
+            records += benchmark(name, size, memory, dense_limit, modal_limit, threads)
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'memory': memory,
+        'records': records,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 1.5, min_time: float = 0.005) -> list:
+    """
+    The phases that got slower or need more memory than in the baseline.
+
+    :param results: The results of run.
+    :param baseline: Earlier results of run.
+    :param tolerance: Allowed factor of growth.
+    :param min_time: Phases faster than this (in both runs) are ignored, their times are mostly noise.
+    :return: List of messages, empty if there are no regressions.
+    """
+    reference = {(x['model'], x['size'], x['phase']): x for x in baseline['records']}
+    messages = []
+    for x in results['records']:
+        old = reference.get((x['model'], x['size'], x['phase']))
+        if old is None:
+            continue
+        label = f"{x['model']} {x['n_dofs']} DOFs {x['phase']}"
+        if max(x['time'], old['time']) >= min_time and x['time'] > tolerance * old['time']:
+            messages.append(f"{label}: time {old['time']:.4g} s -> {x['time']:.4g} s")
+        if x['memory'] and old['memory'] and x['memory'] > tolerance * old['memory']:
+            messages.append(f"{label}: memory {old['memory'] / 2 ** 20:.4g} MiB -> {x['memory'] / 2 ** 20:.4g} MiB")
+    return messages
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000],
+                        help='target numbers of DOFs, up to 1000000')
+    parser.add_argument('--models', nargs='+', choices=list(GENERATORS), help='default: all')
+    parser.add_argument('--out', help='JSON file for the results')
+    parser.add_argument('--baseline', help='JSON file of earlier results to compare with')
+    parser.add_argument('--save-baseline', help='write the results as a new baseline file')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='allowed factor of growth')
+    parser.add_argument('--no-memory', action='store_true', help='do not trace the memory')
+    parser.add_argument('--dense-limit', type=int, default=5000, help='maximum DOFs of the dense solve')
+    parser.add_argument('--modal-limit', type=int, default=2000, help='maximum DOFs of the modal analysis')
+    parser.add_argument('--threads', type=int, help='threads of the threaded assembly, default: number of CPUs')
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.models, not args.no_memory, args.dense_limit, args.modal_limit, args.threads)
+    for x in results['records']:
+        memory = '' if x['memory'] is None else f"{x['memory'] / 2 ** 20:10.2f} MiB"
+        print(f"{x['model']:15s} {x['n_dofs']:8d} {x['phase']:20s} {x['time']:10.4f} s {memory}")
+
+    for path in (args.out, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            messages = compare(results, json.load(f), args.tolerance)
+        for message in messages:
+            print('REGRESSION', message)
+        return 1 if messages else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
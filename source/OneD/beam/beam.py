@@ -15,16 +15,51 @@ from dataclasses import dataclass
 from typing import Tuple, Dict
 
 import numpy as np
-import matplotlib.pyplot as plt
 
-from source.utils import IDMixin
+from source.utils import IDMixin, CacheMixin, derived_property
 from source.node import Node
 from source.OneD.model import Model
 
 
+# Hermite shape functions in the natural coordinate ksi, element half length a.
+# ksi and a are broadcast against each other, the result has an extra last axis of length 4, e.g. ksi of shape
+# (n_points,) and a of shape (n_elements, 1) give (n_elements, n_points, 4).
+
+def hermite_functions(ksi, a) -> np.ndarray:
+    """Base functions for the beam element."""
+    ksi, a = np.broadcast_arrays(np.asarray(ksi, dtype=float), np.asarray(a, dtype=float))
+    return np.stack([
+        1/4 * (2 - 3 * ksi + ksi**3),
+        a/4 * (1 - ksi - ksi**2 + ksi**3),
+        1/4 * (2 + 3 * ksi - ksi**3),  # in some books this is written as 1/4 * (2 + 3 * ksi + ksi**3) wich is incorrect
+        a/4 * (-1 - ksi + ksi**2 + ksi**3)
+    ], axis=-1)
+
+
+def hermite_1st_derivatives(ksi, a) -> np.ndarray:
+    """First derivatives of the base functions by ksi."""
+    ksi, a = np.broadcast_arrays(np.asarray(ksi, dtype=float), np.asarray(a, dtype=float))
+    return np.stack([
+        -3/4 * (1 - ksi**2),
+        a/4 * (-1 - 2 * ksi + 3 * ksi**2),
+        -3/4 * (-1 + ksi**2),
+        a/4 * (-1 + 2 * ksi + 3 * ksi**2)
+    ], axis=-1)
+
+
+def hermite_2nd_derivatives(ksi, a) -> np.ndarray:
+    """Second derivatives of the base functions by ksi."""
+    ksi, a = np.broadcast_arrays(np.asarray(ksi, dtype=float), np.asarray(a, dtype=float))
+    return np.stack([
+        3/2 * ksi,
+        a/2 * (-1 + 3 * ksi),
+        -3/2 * ksi,  # sign error in the 2nd edition book
+        a/2 * (1 + 3 * ksi),
+    ], axis=-1)
+
 
 @dataclass
-class BeamElement(IDMixin):
+class BeamElement(CacheMixin, IDMixin):
 
     """
     A 2D beam element with two nodes in the x-y plane.
@@ -47,15 +82,12 @@ class BeamElement(IDMixin):
         if self.A <= 0:
             raise ValueError("Cross-sectional area must be positive.")
 
-    _length: float = None  # Length of the truss element, can be calculated
     _dof_indices: tuple = None  # DOF indices for the element in the model, to be set later by the model
 
-    @property
+    @derived_property
     def length(self) -> float:
-        """Calculate the length of the truss element."""
-        if self._length is None:
-            self._length = self.i.distance(self.j)
-        return self._length
+        """Calculate the length of the element."""
+        return self.i.distance(self.j)
 
     @property
     def dof_indices(self):
@@ -67,34 +99,16 @@ class BeamElement(IDMixin):
         return self.length / 2
 
     def base_functions(self, ksi):
-        """Base functions for the beam element."""
-        a = self.a
-        return np.array([
-            1/4 * (2 - 3 * ksi + ksi**3),
-            a/4 * (1 - ksi - ksi**2 + ksi**3),
-            1/4 * (2 + 3 * ksi - ksi**3),  # in some books this is written as 1/4 * (2 + 3 * ksi + ksi**3) wich is incorrect
-            a/4 * (-1 - ksi + ksi**2 + ksi**3)
-        ])
+        """Base functions for the beam element. ksi may be an array, the result then has an extra last axis."""
+        return hermite_functions(ksi, self.a)
 
     def base_function_1st_derivatives(self, ksi):
         """First derivatives of the base functions by ksi."""
-        a = self.a
-        return np.array([
-            3/4 * (1 + ksi**2),
-            a/4 * (-1 - 2 * ksi + 3 * ksi**2),
-            -3/4 * (-1 + ksi**2),
-            a/4 * (-1 + 2 * ksi + 3 * ksi**2)
-        ])
+        return hermite_1st_derivatives(ksi, self.a)
 
     def base_function_2nd_derivatives(self, ksi):
         """Second derivatives of the base functions by ksi."""
-        a = self.a
-        return np.array([
-            3/2 * ksi,
-            a/2 * (-1 + 3 * ksi),
-            -3/2 * ksi,  # sign error in the 2nd edition book
-            a/2 * (1 + 3 * ksi),
-        ])
+        return hermite_2nd_derivatives(ksi, self.a)
 
     def B(self, ksi: float, y: float) -> np.ndarray:
         """
@@ -106,7 +120,7 @@ class BeamElement(IDMixin):
         B = -(y / self.a ** 2) * self.base_function_2nd_derivatives(ksi)
         return B
 
-    @property
+    @derived_property
     def ke(self):
         """Local stiffness matrix for the beam element."""
         a = self.a
@@ -124,7 +138,7 @@ class BeamElement(IDMixin):
     def Ke(self):
         return self.ke
 
-    @property
+    @derived_property
     def me(self):
         """Local consistent mass matrix for the beam element."""
         a = self.a
@@ -224,14 +238,10 @@ class BeamElement(IDMixin):
         :param xs: Local coordinates along the beam element.
         :param u: Displacements vector for the beam element.
         """
+        import matplotlib.pyplot as plt
 
-        #c calculate the y values for the xs positions
-        ys = []
-        for x in xs:
-            # the ksi value for this x position
-            ksi = (x / self.a)
-            # the deflection at this point
-            ys.append(self.base_functions(ksi) @ u)
+        # the deflections at the xs positions
+        ys = self.base_functions(np.asarray(xs) / self.a) @ u
 
         # plot the elasic line
         plt.plot(xs, ys, label='Deflection')
@@ -266,6 +276,7 @@ class BeamModel(Model):
 
     # not checkd if all elements have the same number of DOF per node, but it is assumed that they do.
     ND: int = 2  # Number of DOF per node
+    DOF_NAMES = ('uy', 'rz')  # deflection and rotation
 
     def __post_init__(self):
         # Convert nodes and elements to dictionaries for easy access
@@ -279,40 +290,172 @@ class BeamModel(Model):
         # set the DOF indices for each element
         self.elements = self.set_element_dof_indices()
 
-    def plot_model(self, u: np.ndarray):
-        """Plots the beam model: original and deformed shape."""
-        # Plot the original beam structure
-        for element in self.elements.values():
-            x = [element.i.x, element.j.x]
-            y = [element.i.y, element.j.y]
-            plt.plot(x, y, 'b-', label='Original Beam')
-            for node in self.nodes.values():
-                plt.plot(node.x, node.y, 'bo')
-
-        # Plot the deformed shape
+    def element_stiffness_matrices(self) -> np.ndarray:
+        """The stiffness matrices of all elements computed in one batch, (n_elements, 4, 4) array."""
+        elements = tuple(self.elements.values())
+        a = np.array([x.a for x in elements])[:, None, None]
+        EI = np.array([x.E * x.I for x in elements])[:, None, None]
+        # same as BeamElement.ke
+        ke = np.array([[3, 3, -3, 3], [3, 4, -3, 2], [-3, -3, 3, -3], [3, 2, -3, 4]], dtype=float)
+        powers = np.array([[0, 1, 0, 1], [1, 2, 1, 2], [0, 1, 0, 1], [1, 2, 1, 2]])
+        return ke * a ** powers * EI / (2 * a ** 3)
+
+    @property
+    def half_bandwidth(self) -> int:
+        """Half bandwidth of the global stiffness matrix, the largest DOF index difference within an element."""
+        dofs = self.element_dof_indices
+        return int((dofs.max(axis=1) - dofs.min(axis=1)).max())
+
+    @property
+    def is_chain(self) -> bool:
+        """True if the elements connect consecutive nodes only, as in a continuous beam."""
+        return self.half_bandwidth == 2 * self.ND - 1
+
+    def assemble_banded_K(self) -> np.ndarray:
+        """
+        Global stiffness matrix in the LAPACK symmetric banded storage (upper form):
+        ab[u + i - j, j] = K[i, j] for i <= j, where u is the half bandwidth.
+
+        :return: (u + 1, n_dofs) array.
+        """
+        u = self.half_bandwidth
+        n_dofs = self.ND * len(self.nodes)
+        dofs = self.element_dof_indices
+        rows = np.broadcast_to(dofs[:, :, None], (len(dofs), dofs.shape[1], dofs.shape[1])).ravel()
+        cols = np.broadcast_to(dofs[:, None, :], (len(dofs), dofs.shape[1], dofs.shape[1])).ravel()
+        upper = rows <= cols
+
+        index = (u + rows[upper] - cols[upper]) * n_dofs + cols[upper]
+        values = self.element_stiffness_matrices().ravel()[upper]
+        return np.bincount(index, weights=values, minlength=(u + 1) * n_dofs).reshape(u + 1, n_dofs)
+
+    @staticmethod
+    def _banded_matvec(ab: np.ndarray, x: np.ndarray) -> np.ndarray:
+        """The product K @ x for K in symmetric banded storage, x may have several columns."""
+        u = len(ab) - 1
+        y = ab[u].reshape((-1, ) + (1, ) * (x.ndim - 1)) * x
+        for d in range(1, u + 1):
+            diagonal = ab[u - d, d:].reshape((-1, ) + (1, ) * (x.ndim - 1))  # K[j - d, j]
+            y[:-d] += diagonal * x[d:]
+            y[d:] += diagonal * x[:-d]
+        return y
+
+    def solve(self, F, backend: str = 'auto', memory_budget: float = None):
+        """
+        Solve the system for the given load.
+        Continuous beams (chains of elements) are solved with a banded Cholesky factorization in O(n) time and
+        memory, the global stiffness matrix is never formed. Other models, and other backends, use Model.solve.
+
+        :param F: Global force vector, or (n_dofs, n_cases) array with one force vector per column.
+        :param backend: 'auto' or a backend of Model.solve.
+        :param memory_budget: Memory budget in bytes, see Model.solve.
+        :return: displacements and reactions, both of the shape of F.
+        """
+        if not self.is_chain or backend != 'auto':
+            return super().solve(F, backend, memory_budget)
+
+        from scipy.linalg import solveh_banded
+
+        ab = self.assemble_banded_K()
+        u = len(ab) - 1
+        _F = np.array(F, dtype=float)
+
+        # penalty method as in Model.apply_boundary_conditions, on the band
+        _ab = ab.copy()
+        constrained = np.flatnonzero(~self.free_dofs())
+        _ab[:, constrained] = 0  # the columns above the diagonal
+        for d in range(1, u + 1):  # the rows right of the diagonal
+            right = constrained[constrained + d < _ab.shape[1]]
+            _ab[u - d, right + d] = 0
+        _ab[u, constrained] = 1e20
+        _F[constrained] = 0
+
+        _u = solveh_banded(_ab, _F)
+        _re = self._banded_matvec(ab, _u) - _F
+
+        return _u, _re
+
+    def shape_functions(self, ksi: np.ndarray, derivative: int = 0) -> np.ndarray:
+        """
+        The base functions (or their derivatives by ksi) of all elements at the points ksi.
+
+        :param ksi: Natural coordinates of the points, (n_points,) array with values between -1 and 1.
+        :param derivative: 0, 1 or 2.
+        :return: (n_elements, n_points, 4) array.
+        """
+        functions = (hermite_functions, hermite_1st_derivatives, hermite_2nd_derivatives)[derivative]
+        a = np.array([element.a for element in self.elements.values()])
+        return functions(np.asarray(ksi, dtype=float)[None, :], a[:, None])
+
+    def _sample(self, U: np.ndarray, n_points: int, derivatives: Tuple[int, ...]):
+        """
+        Positions of the sample points and the derivatives of the deflection by x there, for all elements and cases.
+        """
+        U = np.asarray(U, dtype=float)
+        ue = U.reshape(len(U), -1)[self.element_dof_indices]  # (n_elements, 4, n_cases)
+
+        ksi = np.linspace(-1, 1, n_points)
+        a = np.array([element.a for element in self.elements.values()])
+        x_i = np.array([element.i.x for element in self.elements.values()])
+        x = x_i[:, None] + (ksi[None, :] + 1) * a[:, None]
+
+        # d^n w / dx^n = (1 / a^n) d^n w / dksi^n
+        return x, [np.einsum('nps,nsc->cnp', self.shape_functions(ksi, n), ue) / a[None, :, None] ** n
+                   for n in derivatives]
+
+    def sample_deflections(self, U: np.ndarray, n_points: int = 20):
+        """
+        Deflections and slopes along every element, for one or more load cases.
+
+        :param U: Global displacement vector, or (n_dofs, n_cases) array with one displacement vector per column.
+        :param n_points: Number of equidistant points per element, including the nodes.
+        :return: x positions (n_elements, n_points), deflections and slopes, both (n_cases, n_elements, n_points).
+        """
+        x, (w, slope) = self._sample(U, n_points, (0, 1))
+        return x, w, slope
+
+    def sample_curvatures(self, U: np.ndarray, n_points: int = 20):
+        """
+        Curvatures and bending moments (M = EI w'') along every element, for one or more load cases.
+
+        :param U: Global displacement vector, or (n_dofs, n_cases) array with one displacement vector per column.
+        :param n_points: Number of equidistant points per element, including the nodes.
+        :return: x positions (n_elements, n_points), curvatures and moments, both (n_cases, n_elements, n_points).
+        """
+        x, (curvature, ) = self._sample(U, n_points, (2, ))
+        EI = np.array([element.E * element.I for element in self.elements.values()])
+        return x, curvature, curvature * EI[None, :, None]
+
+    def plot_model(self, u: np.ndarray, filename=None, ax=None, n_points: int = 20, show: bool = None):
+        """
+        Plots the beam model: original and deformed shape. The elements and the deflection curves are drawn as one
+        line collection each.
+
+        :param u: Global displacement vector, or None for the original shape only.
+        :param filename: If given, the plot is rendered headless and saved to this file instead of shown.
+        :param ax: Optional axes to draw into.
+        :param n_points: Number of points of the deflection curve of each element.
+        :param show: Whether to show the figure with pyplot, by default if no file name is given.
+        :return: The axes.
+        """
+        from source.plotting import add_lines, finish, new_axes, segments
+        arrays = self.to_arrays()
+        coords = arrays['coords'][:, :2]
+        ax = new_axes(2, ax, filename)
+
+        # the original beam structure
+        add_lines(ax, segments(coords, arrays['connectivity']), colors='b', label='Original Beam')
+        ax.plot(*coords.T, 'bo', ls='')
+
+        # the deformed shape
         if u is not None:
-            for element in self.elements.values():
-                xs = np.linspace(element.i.x, element.j.x, 20)
-                ys = []
-                for x in xs:
-                    ksi = (x - element.i.x) / element.length * 2 - 1  # Normalize ksi to [-1, 1]
-                    # Calculate the deflection at this point
-                    ys.append(element.base_functions(ksi) @ u[element.dof_indices])
-                plt.plot(xs, ys, 'r--', label='Deformed Beam')
-            # Plot the nodes
-            displ = u[::2]
-            for node, _u in zip(self.nodes.values(), displ):
-                plt.plot(node.x, node.y + _u, 'ro')
-
-            # adding the displacement values to the nodes
-            # for node, _u in zip(self.nodes.values(), displ):
-            #     plt.text(node.x, node.y + _u, f'{_u:.4g}', rotation=90)
-
-        plt.xlabel('X (m)')
-        plt.ylabel('Y (m)')
-        plt.title('Beam Model: Original and Deformed Shape')
-        plt.axhline(0, color='black', lw=0.5, ls='--')
-        plt.axvline(0, color='black', lw=0.5, ls='--')
-        plt.grid()
-        # plt.axis('equal')
-        plt.show()
\ No newline at end of file
+            xs, ys, _ = self.sample_deflections(u, n_points=n_points)
+            add_lines(ax, np.stack((xs, ys[0]), axis=-1), colors='r', linestyles='--', label='Deformed Beam')
+            ax.plot(coords[:, 0], coords[:, 1] + u[::2], 'ro', ls='')
+
+        ax.set_xlabel('X (m)')
+        ax.set_ylabel('Y (m)')
+        ax.axhline(0, color='black', lw=0.5, ls='--')
+        ax.axvline(0, color='black', lw=0.5, ls='--')
+        ax.grid()
+        return finish(ax, filename, 'Beam Model: Original and Deformed Shape', show)
@@ -38,7 +38,6 @@ print("Reaction forces:", R)
 
 # Deflections at a position along the x axis
 xs = np.linspace(-beam.a, beam.a, 15)  # Local coordinates along the beam element
-for x in xs:
-    y = beam.base_functions(x) @ u  # Calculate deflections using the B matrix
+ys = beam.base_functions(xs / beam.a) @ u  # Calculate deflections at all positions at once
 
 beam.plot_deflections(xs, u)
\ No newline at end of file
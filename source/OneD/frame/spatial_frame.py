@@ -16,13 +16,126 @@ from typing import Tuple, Dict
 
 import numpy as np
 
-from source.utils import IDMixin
+from source.utils import IDMixin, CacheMixin, derived_property
 from source.node import Node
 from source.OneD.model import Model
+from source.instrumentation import report
+
+
+# Batched kernels. These evaluate the element matrices for all elements at once, the inputs are arrays with one value
+# per element and the results are stacked along the first axis.
+
+def rotation_matrices(xi: np.array, xj: np.array) -> np.array:
+    """
+    The 3x3 rotation matrices of the elements, rows are the local axes in global coordinates.
+    Same convention as SpatialFrameElement.transformation_matrix.
+
+    :param xi: (n, 3) coordinates of the i nodes.
+    :param xj: (n, 3) coordinates of the j nodes.
+    :return: (n, 3, 3) array.
+    """
+    d = np.asarray(xj, dtype=float) - np.asarray(xi, dtype=float)
+    e1 = d / np.linalg.norm(d, axis=1)[:, None]
+
+    # elements parallel to the global Z-axis use the global Y-axis as auxiliary vector
+    vertical = np.all(np.isclose(np.abs(e1), [0, 0, 1]), axis=1)
+    e2 = np.cross([0, 0, 1], e1)
+    e3_vertical = np.cross(e1[vertical], [0, 1, 0])
+    e3_vertical /= np.linalg.norm(e3_vertical, axis=1)[:, None]
+    e2[vertical] = np.cross(e3_vertical, e1[vertical])
+    e2 /= np.linalg.norm(e2, axis=1)[:, None]
+    e3 = np.cross(e1, e2)
+    e3[vertical] = e3_vertical
+
+    return np.stack((e1, e2, e3), axis=1)
+
+
+def local_stiffness_matrices(L, A, Iy, Iz, J, E, G) -> np.array:
+    """
+    Local elastic stiffness matrices, same as SpatialFrameElement.ke.
+
+    :return: (n, 12, 12) array.
+    """
+    L, A, Iy, Iz, J, E, G = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (L, A, Iy, Iz, J, E, G)))
+    ke = np.zeros(L.shape + (12, 12))
+
+    lila = E * A / L
+    green_1, green_2, green_3, green_4 = 12 * E * Iz / L ** 3, 6 * E * Iz / L ** 2, 4 * E * Iz / L, 2 * E * Iz / L
+    blue_1, blue_2, blue_3, blue_4 = 12 * E * Iy / L ** 3, 6 * E * Iy / L ** 2, 4 * E * Iy / L, 2 * E * Iy / L
+    gray = G * J / L
+
+    # upper triangle, (row, column, value)
+    for r, c, value in (
+            (0, 0, lila), (0, 6, -lila),
+            (1, 1, green_1), (1, 5, green_2), (1, 7, -green_1), (1, 11, green_2),
+            (2, 2, blue_1), (2, 4, -blue_2), (2, 8, -blue_1), (2, 10, -blue_2),
+            (3, 3, gray), (3, 9, -gray),
+            (4, 4, blue_3), (4, 8, blue_2), (4, 10, blue_4),
+            (5, 5, green_3), (5, 7, -green_2), (5, 11, green_4),
+            (6, 6, lila),
+            (7, 7, green_1), (7, 11, -green_2),
+            (8, 8, blue_1), (8, 10, blue_2),
+            (9, 9, gray),
+            (10, 10, blue_3),
+            (11, 11, green_3),
+    ):
+        ke[..., r, c] = value
+        ke[..., c, r] = value
+
+    return ke
+
+
+def local_geometric_stiffness_matrices(L, N, A, Iy, Iz) -> np.array:
+    """
+    Local geometric stiffness matrices for the axial forces N, tension is positive.
+    Consistent with the cubic shape functions of the bending, the torsional term uses the polar moment Iy + Iz.
+    The contribution of the axial force to the axial DOFs is neglected.
+
+    :return: (n, 12, 12) array.
+    """
+    L, N, A, Iy, Iz = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (L, N, A, Iy, Iz)))
+    kg = np.zeros(L.shape + (12, 12))
+
+    a = 6 / 5
+    b = L / 10
+    c = 2 * L ** 2 / 15
+    d = -L ** 2 / 30
+    t = (Iy + Iz) / A
+
+    # upper triangle, (row, column, value)
+    for r, cc, value in (
+            (1, 1, a), (1, 5, b), (1, 7, -a), (1, 11, b),
+            (2, 2, a), (2, 4, -b), (2, 8, -a), (2, 10, -b),
+            (3, 3, t), (3, 9, -t),
+            (4, 4, c), (4, 8, b), (4, 10, d),
+            (5, 5, c), (5, 7, -b), (5, 11, d),
+            (7, 7, a), (7, 11, -b),
+            (8, 8, a), (8, 10, b),
+            (9, 9, t),
+            (10, 10, c),
+            (11, 11, c),
+    ):
+        kg[..., r, cc] = value
+        kg[..., cc, r] = value
+
+    return kg * (N / L)[..., None, None]
+
+
+def local_to_global(R: np.array, local: np.array) -> np.array:
+    """
+    Transforms stacked local 12x12 matrices to global coordinates, T.T @ local @ T with T = diag(R, R, R, R).
+
+    :param R: (n, 3, 3) rotation matrices.
+    :param local: (n, 12, 12) local matrices.
+    :return: (n, 12, 12) array.
+    """
+    n = len(R)
+    _local = local.reshape(n, 4, 3, 4, 3)
+    return np.einsum('nki,nakbl,nlj->naibj', R, _local, R, optimize=True).reshape(n, 12, 12)
 
 
 @dataclass
-class SpatialFrameElement(IDMixin):
+class SpatialFrameElement(CacheMixin, IDMixin):
 
     """
     A 3D beam-column element with two nodes.
@@ -38,7 +151,6 @@ class SpatialFrameElement(IDMixin):
     ro: float = 1.0  # Density
     nu: float = 0.3  # Poisson's ratio
 
-    _length: float = None  # Length of the truss element, can be calculated
     _dof_indices: tuple = None  # DOF indices for the element in the model, to be set later by the model
 
     def __post_init__(self):
@@ -49,16 +161,14 @@ class SpatialFrameElement(IDMixin):
         # setting the number of degrees of freedom for the truss element
         self.ND = 6
 
-    @property
+    @derived_property
     def G(self):
         return self.E / (2 * (1 + self.nu))  # Shear modulus, assuming isotropic material
 
-    @property
+    @derived_property
     def length(self) -> float:
-        """Calculate the length of the truss element."""
-        if self._length is None:
-            self._length = self.i.distance(self.j)
-        return self._length
+        """Calculate the length of the element."""
+        return self.i.distance(self.j)
 
     @property
     def dof_indices(self):
@@ -69,12 +179,12 @@ class SpatialFrameElement(IDMixin):
         """Half Length of the beam element."""
         return self.length / 2
 
-    @property
+    @derived_property
     def direction_vector(self) -> np.array:
         """The direction vector points from node i to node j."""
         return self.j.coords - self.i.coords
 
-    @property
+    @derived_property
     def transformation_matrix(self) -> np.array:
         """
         Transformation matrix for a 3D element.
@@ -114,7 +224,7 @@ class SpatialFrameElement(IDMixin):
 
         return T
 
-    @property
+    @derived_property
     def ke(self):
         """Local stiffness matrix for the beam element."""
         L = 2 * self.a
@@ -153,7 +263,7 @@ class SpatialFrameElement(IDMixin):
 
         return ke
 
-    @property
+    @derived_property
     def me(self):
         """Local mass matrix for the beam element."""
 
@@ -181,16 +291,29 @@ class SpatialFrameElement(IDMixin):
 
         return me
 
-    @property
+    @derived_property
     def Ke(self):
         """ Global stiffness matrix."""
         return self.lokal_to_global(self.ke)
 
-    @property
+    @derived_property
     def Me(self):
         """ Global mass matrix."""
         return self.lokal_to_global(self.me)
 
+    def kg(self, N: float) -> np.array:
+        """
+        Local geometric stiffness matrix for the axial force N, tension is positive.
+
+        :param N: Axial force in the element.
+        :return: 12x12 array.
+        """
+        return local_geometric_stiffness_matrices(self.length, N, self.A, self.Iy, self.Iz)
+
+    def Kg(self, N: float) -> np.array:
+        """ Global geometric stiffness matrix for the axial force N."""
+        return self.lokal_to_global(self.kg(N))
+
     def lokal_to_global(self, array: np.array):
         """
         Convert a local array to a global array using the transformation matrix.
@@ -221,6 +344,7 @@ class SpatialFrameModel(Model):
 
     # not checkd if all elements have the same number of DOF per node, but it is assumed that they do.
     ND: int = 6  # Number of DOF per node
+    DOF_NAMES = ('ux', 'uy', 'uz', 'rx', 'ry', 'rz')
 
     def __post_init__(self):
         # Convert nodes and elements to dictionaries for easy access
@@ -237,66 +361,362 @@ class SpatialFrameModel(Model):
     def member_forces(self, u: np.array) -> np.array:
         """
         Calculate the member internal actions in the elements.
+        For many elements or load cases, use end_forces or internal_actions instead.
 
         :param u: Global displacement vector.
         :return: Internal actions in a dict.
         """
+        nodal_forces = self.end_forces(u)[0]
+        ND = self.ND
+
         forces = {}
+        for f, (i, element) in zip(nodal_forces, self.elements.items()):
+            forces[i] = {element.i.ID: f[:ND], element.j.ID: f[ND:]}
 
-        # Iterate over each element and calculate the member force
-        for i, element in self.elements.items():
-            Du = u[element.dof_indices]  # global displacements of the nodes in the element
-            _T = element.transformation_matrix
-            # Transform the global displacements to local displacements
-            du = _T @ Du
-            # Calculate the member force using the local stiffness matrix.
-            nodal_forces = element.ke @ du  # Global stiffness matrix times the displacements
+        return forces
 
-            res = {element.i.ID: nodal_forces[:element.ND],
-                   element.j.ID: nodal_forces[element.ND:]}
+    def rotation_matrices(self) -> np.array:
+        """The 3x3 rotation matrices of all elements, (n_elements, 3, 3) array. Cached."""
+        def factory():
+            elements = self.elements.values()
+            return rotation_matrices(np.array([x.i.coords for x in elements]),
+                                     np.array([x.j.coords for x in elements]))
+        return self._cached('rotation_matrices', factory)
+
+    def _section_properties(self) -> Dict[str, np.array]:
+        """Length and section properties of the elements as arrays. Cached."""
+        def factory():
+            elements = tuple(self.elements.values())
+            props = {name: np.array([getattr(x, name) for x in elements], dtype=float)
+                     for name in ('length', 'A', 'Iy', 'Iz', 'J', 'E', 'G')}
+            props['L'] = props.pop('length')
+            return props
+        return self._cached('section_properties', factory)
+
+    def local_stiffness_matrices(self) -> np.array:
+        """The local stiffness matrices of all elements, (n_elements, 12, 12) array. Cached."""
+        return self._cached('local_stiffness_matrices',
+                            lambda: local_stiffness_matrices(**self._section_properties()))
+
+    def element_stiffness_matrices(self) -> np.array:
+        """The global stiffness matrices of all elements computed in one batch, (n_elements, 12, 12) array."""
+        return local_to_global(self.rotation_matrices(), self.local_stiffness_matrices())
+
+    def element_geometric_stiffness_matrices(self, N: np.array) -> np.array:
+        """
+        The global geometric stiffness matrices of all elements computed in one batch.
 
-            forces[i] = res  # Store the force at node i (the second node in the element)
+        :param N: Axial forces of the elements, tension is positive.
+        :return: (n_elements, 12, 12) array.
+        """
+        p = self._section_properties()
+        kg = local_geometric_stiffness_matrices(p['L'], N, p['A'], p['Iy'], p['Iz'])
+        return local_to_global(self.rotation_matrices(), kg)
 
-        return forces
+    def axial_forces(self, u: np.array) -> np.array:
+        """
+        Axial forces of all elements, tension is positive. Same as the axial component at node j of member_forces.
 
-    def plot_frame(self, u: np.array = None, disp_factor: float = None):
+        :param u: Global displacement vector.
+        :return: Array of the axial forces.
+        """
+        p = self._section_properties()
+        e1 = self.rotation_matrices()[:, 0, :]
+        du = u[self.element_dof_indices[:, 6:9]] - u[self.element_dof_indices[:, 0:3]]
+        return p['E'] * p['A'] / p['L'] * np.einsum('ni,ni->n', e1, du)
+
+    @staticmethod
+    def _as_cases(U: np.array) -> np.array:
+        """A displacement or force vector or an (n_dofs, n_cases) array as an (n_dofs, n_cases) array."""
+        U = np.asarray(U, dtype=float)
+        return U.reshape(len(U), -1)
+
+    @staticmethod
+    def _member_loads(q: np.array, n_elements: int) -> np.array:
+        """Member loads of shape (n_elements, 3) or (n_cases, n_elements, 3) as a (n_cases, n_elements, 3) array."""
+        q = np.asarray(q, dtype=float)
+        if q.shape[-2:] != (n_elements, 3):
+            raise ValueError("Member loads must be of shape (n_elements, 3) or (n_cases, n_elements, 3).")
+        return q.reshape(-1, n_elements, 3)
+
+    def fixed_end_forces(self, q: np.array, elements: slice = slice(None)) -> np.array:
         """
-        Plot the structure with optional displacements.
+        Local equivalent nodal forces of uniformly distributed member loads.
 
-        :param u: Global displacement vector. If provided, the truss will be plotted with displacements.
+        :param q: Uniform loads (qx, qy, qz) in the local coordinate system of the elements, force / length,
+            (n_elements, 3) or (n_cases, n_elements, 3) array.
+        :param elements: Slice of the elements to calculate.
+        :return: (n_cases, n_elements, 12) array.
         """
-        import matplotlib.pyplot as plt
-        fig = plt.figure()
+        q = self._member_loads(q, len(self.elements))[:, elements]
+        L = self._section_properties()['L'][elements]
+        qx, qy, qz = q[..., 0], q[..., 1], q[..., 2]
+
+        f = np.zeros(q.shape[:2] + (12,))
+        f[..., 0] = f[..., 6] = qx * L / 2
+        f[..., 1] = f[..., 7] = qy * L / 2
+        f[..., 2] = f[..., 8] = qz * L / 2
+        f[..., 4] = -qz * L ** 2 / 12
+        f[..., 10] = qz * L ** 2 / 12
+        f[..., 5] = qy * L ** 2 / 12
+        f[..., 11] = -qy * L ** 2 / 12
+        return f
+
+    def member_load_vector(self, q: np.array) -> np.array:
+        """
+        Global load vector of uniformly distributed member loads.
 
-        ax = fig.add_subplot(111, projection='3d')
+        :param q: Uniform loads (qx, qy, qz) in the local coordinate system of the elements, force / length,
+            (n_elements, 3) or (n_cases, n_elements, 3) array.
+        :return: (n_dofs,) vector or (n_dofs, n_cases) array.
+        """
+        f = self.fixed_end_forces(q)
+        R = self.rotation_matrices()
+        n_cases, n = f.shape[:2]
+        # T.T @ f for each element and case
+        f_global = np.einsum('nki,cnak->cnai', R, f.reshape(n_cases, n, 4, 3)).reshape(n_cases, n, 12)
+
+        F = np.zeros((self.ND * len(self.nodes), n_cases))
+        for c in range(n_cases):
+            F[:, c] = np.bincount(self.element_dof_indices.ravel(), weights=f_global[c].ravel(), minlength=len(F))
+        return F[:, 0] if np.ndim(q) == 2 else F
+
+    def end_forces(self, U: np.array, q: np.array = None, elements: slice = slice(None)) -> np.array:
+        """
+        Local end forces of the elements, the forces acting on the element at its nodes.
 
-        for element in self.elements.values():
-            x = [element.i.coords[0], element.j.coords[0]]
-            y = [element.i.coords[1], element.j.coords[1]]
-            z = [element.i.coords[2], element.j.coords[2]]
-            ax.plot(x, y, z, 'ko-')
+        :param U: Global displacement vector, or (n_dofs, n_cases) array with one displacement vector per column.
+        :param q: Optional uniform member loads, see fixed_end_forces.
+        :param elements: Slice of the elements to calculate.
+        :return: (n_cases, n_elements, 12) array.
+        """
+        cases = self._as_cases(U)
+        R = self.rotation_matrices()[elements]
+        ke = self.local_stiffness_matrices()[elements]
+        ue = cases[self.element_dof_indices[elements]]  # (n, 12, n_cases)
+
+        d = np.einsum('nkl,nalc->cnak', R, ue.reshape(len(R), 4, 3, -1)).reshape(cases.shape[1], len(R), 12)
+        f = np.einsum('nij,cnj->cni', ke, d)
+        if q is not None:
+            f -= self.fixed_end_forces(q, elements)
+        return f
+
+    def internal_actions(self, U: np.array, n_stations: int = 11, q: np.array = None, out=None,
+                         chunk_size: int = 10000) -> np.array:
+        """
+        Internal actions along the elements: N, Vy, Vz, T, My, Mz at equidistant stations including the end points.
+
+        The end forces are calculated from the displacements with the cached rotation and local stiffness matrices,
+        the values between the nodes follow from the equilibrium of the element part between node i and the station,
+        so uniformly distributed member loads are represented exactly. The internal actions are the forces of the
+        part beyond the station acting on the part towards node i, in the local system: N is positive in tension.
+
+        :param U: Global displacement vector, or (n_dofs, n_cases) array with one displacement vector per column.
+        :param n_stations: Number of stations per element.
+        :param q: Optional uniform member loads (qx, qy, qz), see fixed_end_forces.
+        :param out: Optional output: an array of the right shape or a file name, the results are then written to a
+            memory-mapped .npy file.
+        :param chunk_size: Number of elements processed at once.
+        :return: (n_cases, n_elements, n_stations, 6) array.
+        """
+        cases = self._as_cases(U)
+        n_cases, n_elements = cases.shape[1], len(self.elements)
+        shape = (n_cases, n_elements, n_stations, 6)
+
+        if out is None:
+            out = np.empty(shape)
+        elif isinstance(out, (str, bytes)) or hasattr(out, '__fspath__'):
+            out = np.lib.format.open_memmap(out, mode='w+', dtype=np.float64, shape=shape)
+        elif out.shape != shape:
+            raise ValueError(f"The output array must be of shape {shape}.")
+
+        L = self._section_properties()['L']
+        stations = np.linspace(0, 1, n_stations)
+        if q is not None:
+            q = np.broadcast_to(self._member_loads(q, n_elements), (n_cases, n_elements, 3))
+
+        for start in range(0, n_elements, chunk_size):
+            elements = slice(start, min(start + chunk_size, n_elements))
+            f = self.end_forces(cases, q=q, elements=elements)
+            fi, mi = f[..., None, 0:3], f[..., None, 3:6]  # forces and moments at node i, (c, n, 1, 3)
+            x = (L[elements, None] * stations)[None]  # (1, n, s)
+            _q = np.zeros((1, 1, 1, 3)) if q is None else q[:, elements, None, :]
+
+            chunk = out[:, elements]
+            chunk[..., 0:3] = -(fi + _q * x[..., None])  # N, Vy, Vz
+            chunk[..., 3] = -mi[..., 0]  # T
+            chunk[..., 4] = -mi[..., 1] - x * fi[..., 2] - x ** 2 / 2 * _q[..., 2]  # My
+            chunk[..., 5] = -mi[..., 2] + x * fi[..., 1] + x ** 2 / 2 * _q[..., 1]  # Mz
+
+        if isinstance(out, np.memmap):
+            out.flush()
+        return out
+
+    def solve_buckling(self, F: np.array, n_modes: int = 5, u: np.array = None, sigma: float = None):
+        """
+        Linear buckling analysis. The critical load factors are the eigenvalues of
+
+        (K + lambda * Kg) phi = 0
+
+        where Kg is the geometric stiffness matrix for the axial forces under the reference load F.
+        The matrices are assembled sparse for the free DOFs only, no dense matrix is formed.
+
+        By default the problem is solved in the inverted form -Kg phi = (1 / lambda) K phi for the largest
+        1 / lambda, i.e. shift-invert about zero: the sparse factorization of K, also used for the reference
+        solution, is the inverse operator. If sigma is given, the buckling mode shift-invert of ARPACK is used to find
+        the load factors nearest to sigma.
+
+        :param F: Global reference load vector.
+        :param n_modes: Number of buckling modes to calculate.
+        :param u: Displacements under F. If not given, they are calculated.
+        :param sigma: Optional shift, the load factors closest to it are calculated.
+        :return: buckling load factors (ascending, positive ones only if sigma is not given) and the modal shapes.
+        """
+        from scipy.sparse.linalg import eigsh, LinearOperator
+
+        n_dofs = self.ND * len(self.nodes)
+        free = self.free_dofs()
+        pattern = self.sparse_pattern(free)
+        K_data = pattern.assemble(self.element_stiffness_matrices())
+        K = pattern.matrix(K_data)
+        lu = pattern.factorize(K_data, spd=True)
+
+        if u is None:
+            u = np.zeros(n_dofs)
+            u[free] = lu.solve(np.asarray(F, dtype=float)[free])
+
+        Kg = pattern.matrix(pattern.assemble(self.element_geometric_stiffness_matrices(self.axial_forces(u))))
+        n_modes = min(n_modes, pattern.n - 1)
+
+        if sigma is None:
+            K_inv = LinearOperator(K.shape, matvec=lu.solve, dtype=float)
+            mu, phi = eigsh(-Kg, k=n_modes, M=K, Minv=K_inv, which='LA')
+            positive = mu > 0
+            factors, phi = 1 / mu[positive], phi[:, positive]
+        else:
+            factors, phi = eigsh(K.tocsc(), k=n_modes, M=-Kg.tocsc(), sigma=sigma, mode='buckling')
+
+        idx = np.argsort(factors)
+        shapes = np.zeros((n_dofs, len(idx)))
+        shapes[free] = phi[:, idx]
+        shapes /= np.abs(shapes).max(axis=0)
 
-            if u is not None:
+        return factors[idx], shapes
+
+    def solve_p_delta(self, F: np.array, tol: float = 1e-8, max_iterations: int = 50, refactor_rate: float = 0.5,
+                      max_workers: int = None):
+        """
+        Second order (P-Delta) analysis. The displacements are iterated until
 
-                if disp_factor is None:
-                    disp_factor = (max(x.length for x in self.elements.values()) / 10) / max(
-                        abs(x) for x in u)  # Default factor based on the longest element
+        (K + Kg(N(u))) u = F
 
-                # Apply displacements to the nodes
-                x_ = np.array([u[element.dof_indices[0]], u[element.dof_indices[self.ND + 0]]])
-                y_ = np.array([u[element.dof_indices[1]], u[element.dof_indices[self.ND + 1]]])
-                z_ = np.array([u[element.dof_indices[2]], u[element.dof_indices[self.ND + 2]]])
+        holds, where the axial forces N, and so the geometric stiffness Kg, follow from the displacements.
 
-                x_ = x_ * disp_factor
-                y_ = y_ * disp_factor
-                z_ = z_ * disp_factor
+        The iteration is a modified Newton scheme: the out-of-balance forces are solved with the last factorization,
+        starting with the factorization of the elastic K which is shared by all load combinations. K + Kg is only
+        refactorized when the convergence rate (ratio of consecutive out-of-balance force norms) exceeds refactor_rate.
 
-                x_ = x_[0] + element.i.coords[0], x_[1] + element.j.coords[0]
-                y_ = y_[0] + element.i.coords[1], y_[1] + element.j.coords[1]
-                z_ = z_[0] + element.i.coords[2], z_[1] + element.j.coords[2]
-                ax.plot(x_, y_, z_, 'ro-')
+        The load combinations are the columns of F, they are solved concurrently in a thread pool. A combination has
+        converged when the norm of the displacement increment is below tol times the norm of the displacements and the
+        norm of the out-of-balance forces below tol times the norm of the load.
 
-        plt.show()
+        :param F: Global load vector, or (n_dofs, n_combinations) array of load vectors.
+        :param tol: Relative tolerance of the displacement increments and the out-of-balance forces.
+        :param max_iterations: Maximum number of iterations per load combination.
+        :param refactor_rate: Convergence rate above which K + Kg is refactorized.
+        :param max_workers: Number of threads, see concurrent.futures.ThreadPoolExecutor.
+        :return: displacements, reactions (both of the shape of F) and a list with the iteration info per combination:
+                 dict with iterations, refactorizations, converged and residual, the relative out-of-balance forces.
+        :raises numpy.linalg.LinAlgError: If a load combination does not converge, e.g. above the critical load.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        F = np.asarray(F, dtype=float)
+        loads = F.reshape(len(F), -1)
+        n_dofs = self.ND * len(self.nodes)
+        free = self.free_dofs()
+
+        # everything not depending on the displacements is computed once for all combinations
+        R = self.rotation_matrices()
+        p = self._section_properties()
+        Ke = local_to_global(R, self.local_stiffness_matrices())
+        pattern = self.sparse_pattern(free)
+        full_pattern = self.sparse_pattern()
+        K_data = pattern.assemble(Ke)
+        lu_K = pattern.factorize(K_data)
+        EA_L = p['E'] * p['A'] / p['L']
+        dofs = self.element_dof_indices
+
+        def geometric_stiffness(u):
+            N = EA_L * np.einsum('ni,ni->n', R[:, 0, :], u[dofs[:, 6:9]] - u[dofs[:, 0:3]])
+            return local_to_global(R, local_geometric_stiffness_matrices(p['L'], N, p['A'], p['Iy'], p['Iz']))
+
+        def solve_combination(f):
+            f_free = f[free]
+            f_norm = max(np.linalg.norm(f_free), np.finfo(float).tiny)
+            u = np.zeros(n_dofs)
+            u[free] = lu_K.solve(f_free)
+            lu = lu_K
+            info = {'iterations': 0, 'refactorizations': 0, 'converged': False, 'residual': None}
+            r_norm_previous = None
+
+            for iteration in range(1, max_iterations + 1):
+                info['iterations'] = iteration
+                A_data = K_data + pattern.assemble(geometric_stiffness(u))
+                r = f_free - pattern.matrix(A_data) @ u[free]
+                r_norm = np.linalg.norm(r)
+
+                if r_norm_previous is not None and r_norm > refactor_rate * r_norm_previous:
+                    # the modified Newton iteration converges too slowly, update the factorization
+                    lu = pattern.factorize(A_data)
+                    info['refactorizations'] += 1
+                r_norm_previous = r_norm
+
+                du = lu.solve(r)
+                u[free] += du
+                info['residual'] = r_norm / f_norm
+                if np.linalg.norm(du) <= tol * np.linalg.norm(u) and r_norm <= tol * f_norm:
+                    info['converged'] = True
+                    break
+
+            Kg = geometric_stiffness(u)
+            reactions = full_pattern.matrix(full_pattern.assemble(Ke + Kg)) @ u - f
+            return u, reactions, info
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(solve_combination, loads.T))
+
+        u = np.stack([x[0] for x in results], axis=1).reshape(F.shape)
+        reactions = np.stack([x[1] for x in results], axis=1).reshape(F.shape)
+        info = [x[2] for x in results]
+        report(iterations=sum(x['iterations'] for x in info), refactorizations=sum(x['refactorizations'] for x in info))
+        failed = [n for n, x in enumerate(info) if not x['converged']]
+        if failed:
+            residuals = ', '.join(f"{info[n]['residual']:.1e}" for n in failed)
+            raise np.linalg.LinAlgError(
+                f"The P-Delta iteration of the load combination(s) {failed} did not converge in {max_iterations} "
+                f"iterations, relative out-of-balance forces {residuals}; the load may exceed the critical load.")
+        return u, reactions, info
+
+    def plot_frame(self, u: np.array = None, disp_factor: float = None, color_by_force: bool = False,
+                   filename=None, **kwargs):
+        """
+        Plot the structure with optional displacements. All elements are drawn as one line collection, the elements
+        are drawn straight between the displaced nodes.
+
+        :param u: Global displacement vector. If provided, the frame will be plotted with displacements.
+        :param disp_factor: Scale of the displacements, by default the largest one is a tenth of the longest element.
+        :param color_by_force: Color the elements by their axial forces, requires u.
+        :param filename: If given, the plot is rendered headless and saved to this file instead of shown.
+        :param kwargs: Passed to source.plotting.plot_lines, e.g. ax, title or max_segments.
+        :return: The axes.
+        """
+        from source.plotting import plot_lines
+        arrays = self.to_arrays()
+        displacements = None if u is None else np.asarray(u).reshape(-1, self.ND)[:, :3]
+        values = self.axial_forces(u) if color_by_force and u is not None else None
+        return plot_lines(arrays['coords'], arrays['connectivity'], displacements, disp_factor, values,
+                          filename=filename, **kwargs)
 
 
 if __name__ == '__main__':  # pragma: no cover
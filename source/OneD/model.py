@@ -1,9 +1,131 @@
+from dataclasses import fields
 
 import numpy as np
 from typing import Tuple
 
+from source.instrumentation import report
+from source.node import Node
+from source.sparse import SparsePattern
+from source.utils import CacheMixin, IDMixin
 
-class Model:
+
+def element_nodes(element) -> tuple:
+    """The nodes of an element: i and j of line elements, element_nodes of elements with more nodes."""
+    return getattr(element, 'element_nodes', None) or (element.i, element.j)
+
+
+class Model(CacheMixin):
+
+    # names of the model fields besides the nodes, elements and supports that change the matrices, e.g. an
+    # integration rule; they are part of to_arrays, so of the result cache keys and of the binary format
+    SETTINGS = ()
+
+    @classmethod
+    def from_arrays(cls, coords: np.array, connectivity: np.array, properties: np.array, supports=None,
+                    **settings) -> 'Model':
+        """
+        Creates a model from plain arrays, e.g. for models read from files or sent to another process.
+        The node IDs are the row numbers of coords, so the ID counters are reset.
+
+        :param coords: (n_nodes, 2 or 3) node coordinates.
+        :param connectivity: (n_elements, n_element_nodes) node numbers of the elements.
+        :param properties: (n_elements, n_properties) element properties in the order of the element tuples of the
+                           model, e.g. (A, E, ro) for a TrussModel; a single row is used for all elements.
+        :param supports: A dict with the node ID as key and the local DOFs as value, or a boolean (n_nodes, ND)
+                         array of the fixed DOFs.
+        :param settings: The values of the SETTINGS of the model class, see settings.
+        :return: The model.
+        """
+        IDMixin.reset()
+        nodes = tuple(Node(*x) for x in np.asarray(coords, dtype=float).tolist())
+        connectivity = np.asarray(connectivity, dtype=np.int64)
+        properties = np.asarray(properties, dtype=float)
+        properties = np.broadcast_to(properties, (len(connectivity), properties.shape[-1]))
+        elements = tuple((*nodes, *x) for nodes, x in zip(connectivity.tolist(), properties.tolist()))
+        if supports is not None and not isinstance(supports, dict):
+            supports = {node: tuple(np.flatnonzero(fixed).tolist())
+                        for node, fixed in enumerate(np.asarray(supports, dtype=bool)) if fixed.any()}
+        return cls(nodes_=nodes, elements_=elements, supports_=supports, **settings)
+
+    @classmethod
+    def load(cls, path) -> 'Model':
+        """
+        Loads a model saved in the binary model format, see source.io.binary.
+
+        :param path: The model directory.
+        :return: The model.
+        """
+        from source.io.binary import load_model
+        return load_model(path, cls)
+
+    def save(self, path, loads: np.array = None):
+        """
+        Saves the model in the binary model format, see source.io.binary.
+
+        :param path: The model directory.
+        :param loads: Optional global load vector or (n_cases, n_dofs) array of load vectors.
+        """
+        from source.io.binary import write_model
+        write_model(path, self, loads)
+
+    def to_arrays(self) -> dict:
+        """
+        The model as plain arrays, the inverse of from_arrays.
+
+        :return: dict with coords (n_nodes, 2 or 3), connectivity (n_elements, n_element_nodes), properties
+                 (n_elements, n_properties) in the order of the element fields, fixed, the (n_nodes, ND) boolean
+                 array of the supported DOFs, and the settings as 0-d arrays.
+        """
+        return {
+            'coords': self.node_coords(),
+            'connectivity': self.connectivity(),
+            'properties': self.element_properties(),
+            'fixed': ~self.free_dofs().reshape(len(self.nodes), self.ND),
+            **{name: np.asarray(value) for name, value in self.settings().items()},
+        }
+
+    def settings(self) -> dict:
+        """The values of the SETTINGS, the keyword arguments of from_arrays besides the arrays."""
+        return {name: getattr(self, name) for name in self.SETTINGS}
+
+    def node_coords(self) -> np.array:
+        """The (n_nodes, 2 or 3) node coordinates, the row numbers are the node IDs. Cached."""
+        return self._cached('node_coords',
+                            lambda: np.array([self.nodes[x].coords for x in sorted(self.nodes)], dtype=float))
+
+    def connectivity(self) -> np.array:
+        """The (n_elements, n_element_nodes) node numbers of the elements, from the element DOF indices."""
+        return self.element_dof_indices[:, ::self.ND] // self.ND
+
+    def element_properties(self) -> np.array:
+        """
+        The (n_elements, n_properties) element properties in the order of the element fields, e.g. (A, E, ro) for a
+        TrussModel. Cached.
+        """
+        def factory():
+            elements = tuple(self.elements.values())
+            # the element properties are the float fields after the nodes, the same order as in the element tuples
+            names = [x.name for x in fields(elements[0]) if x.init and x.type is float]
+            return np.array([[getattr(x, name) for name in names] for x in elements], dtype=float)
+
+        return self._cached('element_properties', factory)
+
+    def weld_nodes(self, tol: float = 1e-8, F: np.array = None) -> tuple:
+        """
+        A copy of the model with the coincident nodes merged, see source.mesh.weld_nodes. Elements whose nodes are all
+        merged into one are removed.
+
+        :param tol: Distance below which nodes are merged.
+        :param F: Optional global load vector(s), the welded loads are returned in the result.
+        :return: The welded model and the source.mesh.WeldResult reporting what was merged.
+        """
+        from source.mesh import weld_nodes
+
+        arrays = self.to_arrays()
+        result = weld_nodes(arrays['coords'], arrays['connectivity'], tol, arrays['fixed'], F)
+        model = type(self).from_arrays(result.coords, result.connectivity, arrays['properties'][result.elements],
+                                       result.fixed, **self.settings())
+        return model, result
 
     def assemble_lumped_M(self) -> np.array:
         """
@@ -16,7 +138,7 @@ class Model:
         for _id, element in self.elements.items():
             M_element = element.Me
             dof_indices = element.dof_indices
-            for i in range(2 * self.ND):
+            for i in range(len(dof_indices)):
                 M_global[dof_indices[i], dof_indices[i]] += M_element[i, i]  # Lumped mass matrix, only diagonal elements are non-zero
 
         return M_global
@@ -34,8 +156,8 @@ class Model:
             K_element = element.Ke  # Global stiffness matrix for the element
 
             dof_indices = element.dof_indices  # Use the pre-set DOF indices for the element
-            for i in range(2 * self.ND):
-                for j in range(2 * self.ND):
+            for i in range(len(dof_indices)):
+                for j in range(len(dof_indices)):
                     # add the i,j element of the local stiffness matrix to the element of the global stiffness matrix defined by the global dof indices.
                     K_global[dof_indices[i], dof_indices[j]] += K_element[i, j]
 
@@ -85,22 +207,162 @@ class Model:
         """
         ND = self.ND
         for element in self.elements.values():
-            # the _global_ DOF indices for this element
-            _i = [ND * element.i.ID + x for x in range(ND)]  # node i DOFs
-            _j = [ND * element.j.ID + x for x in range(ND)]  # node j DOFs
-            element._dof_indices = _i + _j
+            # the cached arrays of the model are derived from the elements
+            element.add_dependent(self)
+            # the _global_ DOF indices for this element, node by node (node i DOFs, node j DOFs, ...)
+            element._dof_indices = [ND * node.ID + x for node in element_nodes(element) for x in range(ND)]
+        # the same indices stacked into an array, one row per element, for the batched computations
+        self.element_dof_indices = np.array([element.dof_indices for element in self.elements.values()])
+        # the sparsity patterns and the element colors depend on the connectivity only
+        self._sparse_patterns = {}
+        self._element_colors = None
+        self._color_blocks = {}
         return self.elements
 
+    def sparse_pattern(self, free: np.array = None) -> SparsePattern:
+        """
+        The CSR sparsity pattern of the global matrices. It depends on the connectivity only, so it is computed once
+        from the element DOF indices (for each set of kept DOFs) and reused for every later assembly and factorization.
+
+        :param free: Optional boolean mask of the DOFs to keep, e.g. self.free_dofs().
+        :return: The sparsity pattern.
+        """
+        patterns = self.__dict__.setdefault('_sparse_patterns', {})
+        key = None if free is None else np.packbits(free).tobytes()
+        if key not in patterns:
+            patterns[key] = SparsePattern.from_dof_indices(self.element_dof_indices, self.ND * len(self.nodes), free)
+        return patterns[key]
+
+    def element_colors(self) -> np.array:
+        """
+        Coloring of the element connectivity graph: elements of the same color share no node, so no DOF.
+        Computed once per connectivity.
+
+        The colors are found one after another, vectorized over the elements: the elements get a random priority,
+        in each round the uncolored elements whose priority is the lowest at all their nodes take the color, and the
+        elements at their nodes are left for the next color. A color is complete when no element is left for it.
+
+        :return: The color of each element, in the order of self.elements.
+        """
+        if self.__dict__.get('_element_colors') is None:
+            nodes = self.element_dof_indices[:, ::self.ND] // self.ND
+            n_elements, n_element_nodes = nodes.shape
+            priority = np.random.default_rng(0).permutation(n_elements)
+            colors = np.full(n_elements, -1, dtype=np.int64)
+            lowest = np.full(len(self.nodes), n_elements)  # the lowest priority of the candidates at each node
+            taken = np.zeros(len(self.nodes), dtype=bool)  # the nodes of the elements of the current color
+            uncolored = np.arange(n_elements)
+            color = 0
+            while len(uncolored):
+                candidates = uncolored
+                while len(candidates):
+                    candidate_nodes = nodes[candidates]
+                    p = priority[candidates]
+                    np.minimum.at(lowest, candidate_nodes.ravel(), np.repeat(p, n_element_nodes))
+                    selected = (lowest[candidate_nodes] == p[:, None]).all(axis=1)
+                    lowest[candidate_nodes.ravel()] = n_elements
+                    colors[candidates[selected]] = color
+                    taken[candidate_nodes[selected].ravel()] = True
+                    candidates = candidates[~taken[candidate_nodes].any(axis=1)]
+                taken[:] = False
+                uncolored = uncolored[colors[uncolored] < 0]
+                color += 1
+            self._element_colors = colors
+        return self._element_colors
+
+    def element_color_blocks(self, n_blocks: int) -> list:
+        """
+        The element indices grouped by color, each color split into at most n_blocks blocks of similar size.
+
+        :param n_blocks: Number of blocks per color, usually the number of threads.
+        :return: One list of element index arrays per color.
+        """
+        blocks = self.__dict__.setdefault('_color_blocks', {})
+        if n_blocks not in blocks:
+            colors = self.element_colors()
+            order = np.argsort(colors, kind='stable')
+            split = np.cumsum(np.bincount(colors))[:-1]
+            blocks[n_blocks] = [[x for x in np.array_split(elements, n_blocks) if len(x)]
+                                for elements in np.split(order, split)]
+        return blocks[n_blocks]
+
+    def assemble_sparse_K(self, free: bool = True, max_workers: int = None):
+        """
+        Global stiffness matrix as a sparse matrix. Only the values are computed, the pattern is reused.
+
+        :param free: If True, the matrix is restricted to the free DOFs (the supported DOFs are eliminated).
+        :param max_workers: If given, the element colors are assembled in blocks by this many threads.
+        :return: scipy.sparse.csr_matrix
+        """
+        pattern = self.sparse_pattern(self.free_dofs() if free else None)
+        Ke = self.element_stiffness_matrices()
+        if max_workers is None:
+            return pattern.matrix(pattern.assemble(Ke))
+        colors = self.element_color_blocks(max_workers)
+        return pattern.matrix(pattern.assemble_colored(Ke, colors, max_workers=max_workers))
+
+    def element_stiffness_matrices(self) -> np.array:
+        """
+        The global stiffness matrices of all elements, stacked in the order of self.elements.
+        Models with a batched element kernel override this.
+
+        :return: (n_elements, n_element_dofs, n_element_dofs) array.
+        """
+        return np.array([element.Ke for element in self.elements.values()])
+
+    def stiffness_operator(self, Ke: np.array = None):
+        """
+        Matrix-free global stiffness matrix: the product K @ x is calculated element by element by gathering the
+        element DOFs, applying the stacked element matrices and scatter-adding the results, so no global matrix is
+        stored and a product costs O(n_elements).
+
+        :param Ke: Optional (n_elements, n_element_dofs, n_element_dofs) element matrices, by default the element
+                   stiffness matrices.
+        :return: scipy.sparse.linalg.LinearOperator of shape (n_dofs, n_dofs), without boundary conditions.
+        """
+        from scipy.sparse.linalg import LinearOperator
+
+        n_dofs = self.ND * len(self.nodes)
+        dof_indices = self.element_dof_indices
+        Ke = self.element_stiffness_matrices() if Ke is None else np.asarray(Ke)
+
+        def matmat(X: np.array) -> np.array:
+            X = np.asarray(X, dtype=float).reshape(n_dofs, -1)
+            k = X.shape[1]
+            Y_e = np.einsum('eij,ejk->eik', Ke, X[dof_indices])  # (n_elements, n_element_dofs, k)
+            # one bincount for all columns: the column is folded into the index
+            index = dof_indices[:, :, None] * k + np.arange(k)
+            return np.bincount(index.ravel(), weights=Y_e.ravel(), minlength=n_dofs * k).reshape(n_dofs, k)
+
+        def matvec(x: np.array) -> np.array:
+            return matmat(x)[:, 0]
+
+        # the element matrices are symmetric
+        return LinearOperator((n_dofs, n_dofs), matvec=matvec, rmatvec=matvec, matmat=matmat, dtype=float)
+
+    def free_dofs(self) -> np.array:
+        """
+        Boolean mask of the global DOFs that are not constrained by a support.
+
+        :return: Array of length n_dofs, True for free DOFs.
+        """
+        ND = self.ND
+        free = np.ones(ND * len(self.nodes), dtype=bool)
+        for node_id, local_dofs in dict(self.supports).items():
+            for local_dof in local_dofs:
+                free[ND * node_id + local_dof] = False
+        return free
+
     def reaction_forces(self, u: np.array, f_external: np.array) -> np.array:
         """
         Calculates the reaction forces at the supports.
-        The reaction forces are calculated using the formula R = K * u - F.
+        The reaction forces are calculated using the formula R = K * u - F, the product is computed element by element.
 
         :param u: The displacement vector.
         :param f_external: The original global external force vector.
         :return: The vector of reaction forces. Non-zero values exist only at supported DOFs.
         """
-        reactions = self.K @ u - f_external
+        reactions = self.stiffness_operator() @ u - f_external
 
         return reactions
 
@@ -109,19 +371,96 @@ class Model:
         """The global stiffness matrix should be assembled only once."""
         return self.assemble_global_K()
 
-    def solve(self, F):
+    def check_stability(self, tol: float = 1e-10, probe='auto', memory_budget: float = None):
         """
-        Solve the system for the given load
+        Checks the model for missing supports, mechanisms and free DOFs without stiffness before a solve, see
+        source.stability.check_stability.
 
-        :param F:
-        :return:
+        :param tol: Eigenvalues of the Jacobi scaled free DOF matrix below tol count as zero.
+        :param probe: Whether to run the nullspace probe, 'auto' runs it unless the planner chooses the iterative
+                      solver.
+        :param memory_budget: Memory budget of the planner in bytes, by default a share of the available memory.
+        :return: source.stability.StabilityReport naming the nodes and DOFs at fault.
+        """
+        from source.stability import check_stability
+        return check_stability(self, tol, probe, memory_budget)
+
+    def plan_solve(self, memory_budget: float = None, backend: str = 'auto', n_rhs: int = 1):
+        """
+        Estimates the memory and the time of a linear static solve and chooses the solver backend, see
+        source.planner.plan_solve. Nothing is assembled.
+
+        :param memory_budget: Memory budget in bytes, by default a share of the available memory.
+        :param backend: 'auto', 'dense', 'banded', 'sparse' or 'iterative'.
+        :param n_rhs: Number of load cases.
+        :return: source.planner.SolvePlan, print it for a report.
+        """
+        from source.planner import plan_solve
+        return plan_solve(self, memory_budget, backend, n_rhs)
+
+    def solve(self, F, backend: str = 'auto', memory_budget: float = None):
+        """
+        Solve the system for the given load.
+
+        The solver backend is planned first (see plan_solve): small models are solved with the dense global stiffness
+        matrix and the penalty method, large ones with a banded, sparse or iterative solver on the free DOFs. A solve
+        that does not fit into the memory budget is refused before anything is allocated.
+
+        :param F: Global force vector, or (n_dofs, n_cases) array with one force vector per column.
+        :param backend: 'auto', 'dense', 'banded', 'sparse' or 'iterative'.
+        :param memory_budget: Memory budget in bytes, by default a share of the available memory.
+        :return: displacements and reactions
+        :raises source.planner.InsufficientMemoryError: If no backend fits into the memory budget.
         """
-        _K, _F = self.apply_boundary_conditions(F)  # Apply boundary conditions
-        _u = np.linalg.solve(_K, _F)
+        from source.planner import InsufficientMemoryError
+
+        plan = self.plan_solve(memory_budget, backend, n_rhs=int(np.prod(np.shape(F)[1:], dtype=int)))
+        if plan.backend is None:
+            raise InsufficientMemoryError(plan)
+        report(backend=plan.backend)
+
+        if plan.backend == 'dense':
+            _K, _F = self.apply_boundary_conditions(F)  # Apply boundary conditions
+            _u = self._linear_solve(_K, _F)
+        else:
+            free = self.free_dofs()
+            _F = np.array(F, dtype=float)
+            _F[~free] = 0
+            _u = np.zeros_like(_F)
+            _u[free] = self._reduced_solve(plan.backend, free, _F[free])
         _re = self.reaction_forces(_u, _F)
 
         return _u, _re
 
+    def _reduced_solve(self, backend: str, free: np.array, F: np.array) -> np.array:
+        """
+        Solves the system of the free DOFs with a sparse backend.
+
+        :param backend: 'banded', 'sparse' or 'iterative'.
+        :param free: Boolean mask of the free DOFs.
+        :param F: Force vector of the free DOFs.
+        :return: The displacements of the free DOFs.
+        """
+        from source.planner import solve_banded, solve_iterative
+
+        pattern = self.sparse_pattern(free)
+        data = pattern.assemble(self.element_stiffness_matrices())
+        if backend == 'banded':
+            return solve_banded(pattern, data, F)
+        if backend == 'iterative':
+            return solve_iterative(pattern, data, F)
+        return pattern.factorize(data, spd=True).solve(F)
+
+    def _linear_solve(self, K: np.array, F: np.array) -> np.array:
+        """
+        Solves the system with the boundary conditions applied.
+
+        :param K: Global stiffness matrix with the boundary conditions applied.
+        :param F: Global force vector with the boundary conditions applied.
+        :return: The displacement vector.
+        """
+        return np.linalg.solve(K, F)
+
     def solve_modal(self):
         """
         Solve the system for the modal analysis.
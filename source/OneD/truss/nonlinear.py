@@ -0,0 +1,297 @@
+"""
+Geometrically nonlinear static analysis of trusses.
+
+Corotational truss formulation: the axial force is calculated from the engineering strain of the current length and
+acts along the current direction of the element, so large displacements and rotations are handled exactly while the
+material stays linear elastic.
+
+    N = EA (l - L) / L
+    f_int = N * [-e, e]
+    k = EA / L * e e^T + N / l * (I - e e^T)    (material + geometric part)
+    Kt = [[k, -k], [-k, k]]
+
+where L is the initial and l the current length and e is the current unit direction vector.
+
+Two solution strategies are provided, both stream their results as generators, one IncrementResult per load increment:
+- Newton-Raphson under load control with a line search,
+- Crisfield's cylindrical arc-length method which can follow the equilibrium path through limit points (snap-through).
+
+The tangent stiffness matrix is assembled over all elements at once into a sparse matrix with a fixed pattern, only
+the values are refilled in each iteration.
+"""
+from dataclasses import dataclass, field
+from typing import Iterator
+
+import numpy as np
+
+from source.sparse import SparsePattern, SparseFactorization
+
+
+@dataclass
+class IncrementResult:
+    """The state of the truss at the end of a load increment."""
+
+    step: int  # number of the increment, starting with 1
+    load_factor: float  # the load factor, the applied load is load_factor * F
+    u: np.ndarray  # global displacement vector
+    axial_forces: np.ndarray  # axial force in each element, tension is positive
+    iterations: int  # number of equilibrium iterations
+    residual: float  # norm of the out-of-balance force vector at the free DOFs
+    converged: bool
+
+
+@dataclass
+class NonlinearTrussSolver:
+    """
+    Large displacement static solver for a TrussModel.
+
+    Usage:
+    solver = NonlinearTrussSolver(model)
+    for result in solver.newton_raphson(F, n_steps=10):
+        print(result.load_factor, result.u)
+    """
+
+    model: 'TrussModel'
+    tol: float = 1e-8  # relative tolerance of the out-of-balance force norm
+    max_iterations: int = 30  # equilibrium iterations per increment
+
+    _pattern: SparsePattern = field(init=False, default=None, repr=False)
+
+    def __post_init__(self):
+        model = self.model
+        ND = model.ND
+        self.ND = ND
+        self.n_dofs = ND * len(model.nodes)
+
+        # the initial coordinates indexed by node ID
+        self.X = np.zeros((len(model.nodes), ND))
+        for node_id, node in model.nodes.items():
+            self.X[node_id] = node.coords
+
+        elements = tuple(model.elements.values())
+        self.node_i = np.array([x.i.ID for x in elements])
+        self.node_j = np.array([x.j.ID for x in elements])
+        self.EA = np.array([x.E * x.A for x in elements], dtype=float)
+        self.L0 = np.linalg.norm(self.X[self.node_j] - self.X[self.node_i], axis=1)
+        self.dof_indices = np.array([x.dof_indices for x in elements])
+
+        self.free = model.free_dofs()
+        self._pattern = model.sparse_pattern(self.free)
+        self._data = np.zeros(self._pattern.nnz)
+
+    def _kinematics(self, u: np.array):
+        """Current unit direction vectors, lengths and axial forces of all elements."""
+        U = u.reshape(-1, self.ND)
+        d = self.X[self.node_j] + U[self.node_j] - self.X[self.node_i] - U[self.node_i]
+        length = np.linalg.norm(d, axis=1)
+        e = d / length[:, None]
+        N = self.EA * (length - self.L0) / self.L0
+        return e, length, N
+
+    def internal_forces(self, u: np.array) -> np.array:
+        """
+        The global internal force vector and the axial forces for the displacement vector u.
+
+        :param u: Global displacement vector.
+        :return: internal force vector, axial forces
+        """
+        e, _, N = self._kinematics(u)
+        fe = N[:, None] * e
+        f_elements = np.hstack((-fe, fe))  # (n_elements, 2 * ND), ordered as the DOF indices
+        f_int = np.bincount(self.dof_indices.ravel(), weights=f_elements.ravel(), minlength=self.n_dofs)
+        return f_int, N
+
+    def element_tangents(self, u: np.array) -> np.array:
+        """
+        The tangent stiffness matrices of all elements in global coordinates.
+
+        :param u: Global displacement vector.
+        :return: (n_elements, 2 * ND, 2 * ND) array.
+        """
+        e, length, N = self._kinematics(u)
+        ee = e[:, :, None] * e[:, None, :]
+        k = (self.EA / self.L0)[:, None, None] * ee + (N / length)[:, None, None] * (np.eye(self.ND) - ee)
+        return np.concatenate((np.concatenate((k, -k), axis=2), np.concatenate((-k, k), axis=2)), axis=1)
+
+    def tangent_stiffness(self, u: np.array):
+        """
+        The tangent stiffness matrix at the free DOFs. The sparse pattern is fixed, only the values are refilled.
+
+        :param u: Global displacement vector.
+        :return: scipy.sparse.csc_matrix
+        """
+        from scipy.sparse import csc_matrix
+        self._pattern.assemble(self.element_tangents(u), out=self._data)
+        # the matrix is symmetric, so the CSR arrays can be used as CSC arrays directly
+        p = self._pattern
+        return csc_matrix((self._data, p.indices, p.indptr), shape=(p.n, p.n), copy=False)
+
+    def _factorize(self, u: np.array) -> SparseFactorization:
+        """Factorization of the tangent stiffness matrix, reusing the symbolic analysis of the pattern."""
+        self._pattern.assemble(self.element_tangents(u), out=self._data)
+        return self._pattern.factorize(self._data)
+
+    def _residual(self, u: np.array, load_factor: float, F: np.array):
+        """Out-of-balance forces at the free DOFs and the axial forces."""
+        f_int, N = self.internal_forces(u)
+        return (load_factor * F - f_int)[self.free], N
+
+    def _expand(self, du_free: np.array) -> np.array:
+        du = np.zeros(self.n_dofs)
+        du[self.free] = du_free
+        return du
+
+    def _line_search(self, u: np.array, du: np.array, load_factor: float, F: np.array, r0: np.array,
+                     max_steps: int = 5) -> float:
+        """
+        Scales the Newton step so that the out-of-balance forces become orthogonal to it.
+        The step length s is found by regula falsi on g(s) = du . R(u + s du).
+
+        :return: the step length
+        """
+        du_free = du[self.free]
+        g0 = du_free @ r0
+        s = 1.0
+        g = du_free @ self._residual(u + du, load_factor, F)[0]
+        if g0 <= 0 or abs(g) <= 0.5 * abs(g0):
+            return s
+
+        s_prev, g_prev = 0.0, g0
+        for _ in range(max_steps):
+            if g == g_prev:
+                break
+            s_new = s - g * (s - s_prev) / (g - g_prev)
+            s_new = min(max(s_new, 0.1), 1.0)
+            s_prev, g_prev = s, g
+            s = s_new
+            g = du_free @ self._residual(u + s * du, load_factor, F)[0]
+            if abs(g) <= 0.5 * abs(g0):
+                break
+        return s
+
+    def newton_raphson(self, F: np.array, n_steps: int = 10, line_search: bool = True,
+                       u0: np.array = None) -> Iterator[IncrementResult]:
+        """
+        Load controlled incremental Newton-Raphson solution. The load factor is increased in n_steps equal steps up
+        to 1.0. The iteration stops after a non-converged increment, e.g. when a limit point is passed.
+
+        :param F: Global reference load vector.
+        :param n_steps: Number of load increments.
+        :param line_search: Whether to use a line search in the iterations.
+        :param u0: Initial displacements, zero by default.
+        :return: Generator of IncrementResult, one per increment.
+        """
+        F = np.asarray(F, dtype=float)
+        u = np.zeros(self.n_dofs) if u0 is None else np.array(u0, dtype=float)
+
+        for step in range(1, n_steps + 1):
+            load_factor = step / n_steps
+            load_norm = max(np.linalg.norm(load_factor * F[self.free]), np.finfo(float).tiny)
+
+            r, N = self._residual(u, load_factor, F)
+            converged = np.linalg.norm(r) <= self.tol * load_norm
+            iterations = 0
+            while not converged and iterations < self.max_iterations:
+                du = self._expand(self._factorize(u).solve(r))
+                s = self._line_search(u, du, load_factor, F, r) if line_search else 1.0
+                u = u + s * du
+                iterations += 1
+                r, N = self._residual(u, load_factor, F)
+                converged = np.linalg.norm(r) <= self.tol * load_norm
+
+            yield IncrementResult(step=step, load_factor=load_factor, u=u.copy(), axial_forces=N,
+                                  iterations=iterations, residual=float(np.linalg.norm(r)), converged=converged)
+            if not converged:
+                return
+
+    def arc_length(self, F: np.array, arc_length: float, n_steps: int = 20, max_load_factor: float = None,
+                   max_cuts: int = 5) -> Iterator[IncrementResult]:
+        """
+        Crisfield's cylindrical arc-length method. The length of the displacement increment is constrained in each
+        step, the load factor is an unknown, so the solution can pass limit points.
+
+        The direction of the predictor follows the previous increment, so the path is not reversed after a limit
+        point. When an increment does not converge the arc-length is halved, at most max_cuts times.
+
+        :param F: Global reference load vector.
+        :param arc_length: Length of the displacement increment in each step.
+        :param n_steps: Maximum number of increments.
+        :param max_load_factor: Optional, the analysis stops when the load factor exceeds this value.
+        :param max_cuts: Maximum number of consecutive arc-length reductions.
+        :return: Generator of IncrementResult, one per increment.
+        """
+        F = np.asarray(F, dtype=float)
+        F_free = F[self.free]
+        u = np.zeros(self.n_dofs)
+        load_factor = 0.0
+        du_previous = None
+        ds = arc_length
+
+        for step in range(1, n_steps + 1):
+            for _ in range(max_cuts + 1):
+                result = self._arc_length_step(u, load_factor, F, F_free, ds, du_previous)
+                if result is not None:
+                    break
+                ds /= 2
+            else:
+                r, N = self._residual(u, load_factor, F)
+                yield IncrementResult(step=step, load_factor=load_factor, u=u.copy(), axial_forces=N,
+                                      iterations=self.max_iterations, residual=float(np.linalg.norm(r)),
+                                      converged=False)
+                return
+
+            u_new, load_factor, N, iterations, residual = result
+            du_previous = (u_new - u)[self.free]
+            u = u_new
+
+            yield IncrementResult(step=step, load_factor=load_factor, u=u.copy(), axial_forces=N,
+                                  iterations=iterations, residual=residual, converged=True)
+            if max_load_factor is not None and load_factor > max_load_factor:
+                return
+
+    def _arc_length_step(self, u: np.array, load_factor: float, F: np.array, F_free: np.array, ds: float,
+                         du_previous: np.array):
+        """
+        One increment of the arc-length method.
+
+        :return: (u, load factor, axial forces, iterations, residual norm) or None if the increment did not converge.
+        """
+        load_norm = max(np.linalg.norm(F_free), np.finfo(float).tiny)
+
+        # predictor along the tangent
+        du_t = self._factorize(u).solve(F_free)
+        sign = 1.0
+        if du_previous is not None and du_t @ du_previous < 0:
+            sign = -1.0
+        d_lambda = sign * ds / np.linalg.norm(du_t)
+        Du = d_lambda * du_t  # displacement increment of the step at the free DOFs
+        D_lambda = d_lambda
+
+        for iterations in range(1, self.max_iterations + 1):
+            u_trial = u + self._expand(Du)
+            lam = load_factor + D_lambda
+            r, N = self._residual(u_trial, lam, F)
+            residual = np.linalg.norm(r)
+            if residual <= self.tol * max(abs(lam), 1.0) * load_norm:
+                return u_trial, lam, N, iterations - 1, float(residual)
+
+            lu = self._factorize(u_trial)
+            du_r = lu.solve(r)
+            du_t = lu.solve(F_free)
+
+            # the constraint |Du + du_r + d_lambda * du_t| = ds gives a quadratic equation for d_lambda
+            w = Du + du_r
+            a = du_t @ du_t
+            b = 2 * du_t @ w
+            c = w @ w - ds ** 2
+            discriminant = b ** 2 - 4 * a * c
+            if discriminant < 0:
+                return None
+            roots = ((-b + discriminant ** 0.5) / (2 * a), (-b - discriminant ** 0.5) / (2 * a))
+            # the root keeping the increment closest to its previous direction
+            d_lambda = max(roots, key=lambda x: (w + x * du_t) @ Du)
+
+            Du = w + d_lambda * du_t
+            D_lambda += d_lambda
+
+        return None
@@ -3,14 +3,14 @@ from typing import Tuple, Dict
 
 import numpy as np
 
-from source.utils import IDMixin
+from source.utils import IDMixin, CacheMixin, derived_property
 from source.node import Node
 from source.OneD.model import Model
 # from source.utils import assemble_global_K, apply_boundary_conditions, set_element_dof_indices, reaction_forces
 
 
 @dataclass
-class TrussElement(IDMixin):
+class TrussElement(CacheMixin, IDMixin):
     """
     3D Truss element with two nodes i and j, both of type Node.
     Axial direction is the local x-axis.
@@ -27,7 +27,6 @@ class TrussElement(IDMixin):
     E: float = 1.0  # Young's modulus of the material
     ro: float = 1.0  # Density of the material
 
-    _length: float = None  # Length of the truss element, can be calculated
     _dof_indices: tuple = None  # DOF indices for the element in the model, to be set later by the model
 
     # # class variable to keep track of the ID of the truss element
@@ -48,18 +47,16 @@ class TrussElement(IDMixin):
         # todo: make clear: this is the number of DOFS per node or the number of the dimensions of the space the element is in?
         self.ND = len(self.i.coords)
 
-    @property
+    @derived_property
     def length(self) -> float:
-        """Calculate the length of the truss element."""
-        if self._length is None:
-            self._length = self.i.distance(self.j)
-        return self._length
+        """Calculate the length of the element."""
+        return self.i.distance(self.j)
 
     @property
     def dof_indices(self):
         return self._dof_indices
 
-    @property
+    @derived_property
     def direction_vector(self) -> np.array:
         """The direction vector points from node i to node j."""
         return self.j.coords - self.i.coords
@@ -78,7 +75,7 @@ class TrussElement(IDMixin):
         """Shape functions for the truss element."""
         return np.array((self._N1(x), self._N2(x)))
 
-    @property
+    @derived_property
     def B(self) -> np.array:
         """
         Strain in the truss element.
@@ -87,7 +84,7 @@ class TrussElement(IDMixin):
         """
         return np.array((-1 / self.length, 1 / self.length))
 
-    @property
+    @derived_property
     def ke(self) -> np.array:
         """
         Stiffness matrix of the truss element.
@@ -101,7 +98,7 @@ class TrussElement(IDMixin):
         """
         return (self.A * self.E / self.length) * np.array(((1, -1), (-1, 1)))
 
-    @property
+    @derived_property
     def me(self) -> np.array:
         """
         Consistent mass matrix of the truss element.
@@ -111,19 +108,19 @@ class TrussElement(IDMixin):
         """
         return (self.A * self.ro * self.length / 6) * np.array(((2, 1), (1, 2)))
 
-    @property
+    @derived_property
     def Ke(self):
         """ Global stiffness matrix for the truss element."""
         _T = self.transformation_matrix
         return _T.T @ self.ke @ _T
 
-    @property
+    @derived_property
     def Me(self):
         """ Global stiffness matrix for the truss element."""
         _T = self.transformation_matrix
         return _T.T @ self.me @ _T
 
-    @property
+    @derived_property
     def transformation_matrix(self) -> np.array:
         """
         Transformation matrix for a 3D element.
@@ -186,6 +183,9 @@ class TrussModel(Model):
 
     ND: int = None
 
+    # names of the DOFs of a node, the first ND are used
+    DOF_NAMES = ('ux', 'uy', 'uz')
+
     def __post_init__(self):
         """Post-initialization to ensure nodes and elements are valid."""
         if self.nodes_ is None or len(self.nodes_) == 0:
@@ -211,102 +211,115 @@ class TrussModel(Model):
         # set the DOF indices for each element
         self.elements = self.set_element_dof_indices()
 
-    def member_forces(self, u: np.array) -> np.array:
-        """
-        Calculate the member forces in the truss elements based on the displacements.
+    # dtype of the member force table, see member_force_table
+    MEMBER_FORCE_DTYPE = np.dtype([
+        ('element', np.int64),  # element ID
+        ('N', np.float64),  # axial force, tension is positive
+        ('stress', np.float64),  # axial stress, N / A
+        ('utilization', np.float64),  # |stress| / allowable stress, NaN if no allowable stress is given
+        ('state', np.int8),  # 1: tension, -1: compression, 0: no force
+    ])
 
-        :param u: Global displacement vector.
-        :return: Member forces in the truss elements.
-        """
-        forces = []
-
-        # Iterate over each element and calculate the member force
-        for i, element in self.elements.items():
-            Du = u[element.dof_indices]  # global displacements of the nodes in the element
-            _T = element.transformation_matrix
-            # Transform the global displacements to local displacements
-            du = _T @ Du
-            # Calculate the member force using the local stiffness matrix.
-            # This returns the nodal forces in the local coordinate system, one value for each node.
-            # The nodal forces are the same value but opposite sign.
-            # by convention, compression is negative.
-            nodal_forces = element.ke @ du  # Global stiffness matrix times the displacements
-
-            # If the j node is positive, the member is in tension.
-            res = [float(nodal_forces[1]), '']
-            if nodal_forces[1] < 0:
-                res[1] = 'compression'
-            elif nodal_forces[1] > 0:
-                res[1] = 'tension'
-            else:
-                res[1] = 'no force'
-
-            forces.append(res)  # Store the force at node i (the second node in the element)
-
-        return forces
-
-    def plot_truss(self, u: np.array = None, disp_factor: float = None):
+    def element_arrays(self) -> Dict[str, np.array]:
         """
-        Plot the truss structure with optional displacements.
+        Geometry and section data of all elements as arrays, in the order of self.elements.
 
-        :param u: Global displacement vector. If provided, the truss will be plotted with displacements.
+        :return: dict with the unit direction vectors 'e' (n_elements, ND), the lengths 'L', the areas 'A' and the
+            axial stiffnesses 'EA_L' = E * A / L. Cached.
         """
-        import matplotlib.pyplot as plt
-        fig = plt.figure()
-
-        if self.ND == 3:
-
-            ax = fig.add_subplot(111, projection='3d')
-
-            for element in self.elements.values():
-                x = [element.i.coords[0], element.j.coords[0]]
-                y = [element.i.coords[1], element.j.coords[1]]
-                z = [element.i.coords[2], element.j.coords[2]]
-                ax.plot(x, y, z, 'ko-')
+        def factory():
+            elements = tuple(self.elements.values())
+            d = np.array([x.direction_vector for x in elements], dtype=float)
+            L = np.linalg.norm(d, axis=1)
+            A = np.array([x.A for x in elements], dtype=float)
+            E = np.array([x.E for x in elements], dtype=float)
+            return {'e': d / L[:, None], 'L': L, 'A': A, 'EA_L': E * A / L}
 
-                if u is not None:
-                    if disp_factor is None:
-                        disp_factor = (max(x.length for x in self.elements.values()) / 10) / max(
-                            abs(x) for x in u)  # Default factor based on the longest element
+        return self._cached('element_arrays', factory)
 
-                    # Apply displacements to the nodes
-                    x_ = np.array([u[element.dof_indices[0]], u[element.dof_indices[self.ND + 0]]])
-                    y_ = np.array([u[element.dof_indices[1]], u[element.dof_indices[self.ND + 1]]])
-                    z_ = np.array([u[element.dof_indices[2]], u[element.dof_indices[self.ND + 2]]])
-
-                    x_ = x_ * disp_factor
-                    y_ = y_ * disp_factor
-                    z_ = z_ * disp_factor
+    def axial_forces(self, U: np.array) -> np.array:
+        """
+        Axial forces of all elements for one or more load cases, computed in one array operation.
 
-                    x_ = x_[0] + element.i.coords[0], x_[1] + element.j.coords[0]
-                    y_ = y_[0] + element.i.coords[1], y_[1] + element.j.coords[1]
-                    z_ = z_[0] + element.i.coords[2], z_[1] + element.j.coords[2]
-                    ax.plot(x_, y_, z_, 'ro-')
+        :param U: Global displacement vector, or (n_dofs, n_cases) array with one displacement vector per column.
+        :return: (n_elements,) or (n_cases, n_elements) array, tension is positive.
+        """
+        U = np.asarray(U, dtype=float)
+        cases = U.reshape(len(U), -1)
+        arrays = self.element_arrays()
+        ND = self.ND
+        dofs = self.element_dof_indices
+        # the displacements of the nodes projected on the element axis
+        du_i = np.einsum('ni,nic->cn', arrays['e'], cases[dofs[:, :ND]])
+        du_j = np.einsum('ni,nic->cn', arrays['e'], cases[dofs[:, ND:]])
+        N = arrays['EA_L'] * (du_j - du_i)
+        return N[0] if U.ndim == 1 else N
+
+    def member_force_table(self, U: np.array, allowable_stress: float = None) -> np.array:
+        """
+        Member forces of all elements and all load cases as a structured array, see MEMBER_FORCE_DTYPE.
 
+        :param U: Global displacement vector, or (n_dofs, n_cases) array with one displacement vector per column.
+        :param allowable_stress: Allowable stress for the utilization, a scalar or one value per element.
+        :return: Structured array of shape (n_elements,) or (n_cases, n_elements).
+        """
+        N = self.axial_forces(U)
+        A = self.element_arrays()['A']
+
+        table = np.empty(N.shape, dtype=self.MEMBER_FORCE_DTYPE)
+        table['element'] = np.fromiter(self.elements.keys(), dtype=np.int64, count=len(self.elements))
+        table['N'] = N
+        table['stress'] = N / A
+        if allowable_stress is None:
+            table['utilization'] = np.nan
         else:
+            table['utilization'] = np.abs(table['stress']) / allowable_stress
+        table['state'] = np.sign(N)
+        return table
 
-            ax = fig.add_subplot(111)
-
-            for element in self.elements.values():
-                x = [element.i.coords[0], element.j.coords[0]]
-                y = [element.i.coords[1], element.j.coords[1]]
-                ax.plot(x, y, 'ko-')
-
-                if u is not None:
-
-                    if disp_factor is None:
-                        disp_factor = (max(x.length for x in self.elements.values()) / 10) / max(
-                            abs(x) for x in u)  # Default factor based on the longest element
+    def member_forces(self, u: np.array) -> np.array:
+        """
+        Calculate the member forces in the truss elements based on the displacements.
+        For many elements or load cases, use member_force_table instead.
 
-                    # Apply displacements to the nodes
-                    x_ = np.array([u[element.dof_indices[0]], u[element.dof_indices[self.ND + 0]]])
-                    y_ = np.array([u[element.dof_indices[1]], u[element.dof_indices[self.ND + 1]]])
+        :param u: Global displacement vector.
+        :return: Member forces in the truss elements, a list of [force, 'tension' / 'compression' / 'no force'].
+        """
+        states = {1: 'tension', -1: 'compression', 0: 'no force'}
+        table = self.member_force_table(u)
+        return [[float(x['N']), states[int(x['state'])]] for x in table]
 
-                    x_ = x_ * disp_factor
-                    y_ = y_ * disp_factor
+    def solve_nonlinear(self, F: np.array, arc_length: float = None, **kwargs):
+        """
+        Geometrically nonlinear (large displacement) static analysis, see nonlinear.py.
+        Newton-Raphson under load control by default, the arc-length method if arc_length is given.
 
-                    x_ = x_[0] + element.i.coords[0], x_[1] + element.j.coords[0]
-                    y_ = y_[0] + element.i.coords[1], y_[1] + element.j.coords[1]
-                    ax.plot(x_, y_, 'ro-')
+        :param F: Global reference load vector.
+        :param arc_length: Length of the displacement increments for the arc-length method.
+        :param kwargs: Further arguments of NonlinearTrussSolver.newton_raphson or NonlinearTrussSolver.arc_length.
+        :return: Generator of IncrementResult, one per load increment.
+        """
+        from source.OneD.truss.nonlinear import NonlinearTrussSolver
+        solver = NonlinearTrussSolver(self)
+        if arc_length is None:
+            return solver.newton_raphson(F, **kwargs)
+        return solver.arc_length(F, arc_length, **kwargs)
+
+    def plot_truss(self, u: np.array = None, disp_factor: float = None, color_by_force: bool = False,
+                   filename=None, **kwargs):
+        """
+        Plot the truss structure with optional displacements. All elements are drawn as one line collection.
 
-        plt.show()
+        :param u: Global displacement vector. If provided, the truss will be plotted with displacements.
+        :param disp_factor: Scale of the displacements, by default the largest one is a tenth of the longest element.
+        :param color_by_force: Color the elements by their axial forces, requires u.
+        :param filename: If given, the plot is rendered headless and saved to this file instead of shown.
+        :param kwargs: Passed to source.plotting.plot_lines, e.g. ax, title or max_segments.
+        :return: The axes.
+        """
+        from source.plotting import plot_lines
+        arrays = self.to_arrays()
+        displacements = None if u is None else np.asarray(u).reshape(-1, self.ND)
+        values = self.axial_forces(u) if color_by_force and u is not None else None
+        return plot_lines(arrays['coords'], arrays['connectivity'], displacements, disp_factor, values,
+                          filename=filename, **kwargs)
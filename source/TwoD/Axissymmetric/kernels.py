@@ -0,0 +1,352 @@
+"""
+Numeric element kernels of the axisymmetric elements, generated from the symbolic derivation.
+
+The notebooks (isoparametric_axissymmetric.ipynb, general_axissymmetric.ipynb, tri_axissymmetric.ipynb) build the
+B matrices with sympy and substitute the coordinates for every element, which takes seconds per element. Here the
+derivation is done once per element type, analysis kind and quadrature order: sympy derives the shape functions, the
+Jacobian and the B matrices at each Gauss point as expressions of the node coordinates, and the common
+subexpressions are written out as a plain NumPy module. The generated module is cached on disk, loading it later
+does not import sympy. The kernel evaluates the B matrices of all elements at once, the stiffness matrices are then
+computed with einsum, in chunks of elements.
+
+Element types (node order as in the notebooks, counterclockwise in the r-z plane):
+- tri3: linear triangle, natural coordinates 0 <= xi, eta, xi + eta <= 1
+- quad4: linear quadrilateral
+- quad8: quadratic serendipity quadrilateral, the corner nodes first, then the midside nodes 1-2, 2-3, 3-4, 4-1
+
+Analysis kinds:
+- axisymmetric: 2 DOFs per node (u, w), strains (e_r, e_theta, e_z, g_zr), axisymmetric loads
+- harmonic: 3 DOFs per node (u, v, w), strains (e_r, e_theta, e_z, g_thetar, g_thetaz, g_zr), one harmonic n of a
+  Fourier series around the circumference. B = B_A + n B_B, so the stiffness of harmonic n is
+  c_n (K0 + n K1 + n^2 K2) with c_0 = 2 pi and c_n = pi otherwise (the integrals of cos^2 over theta).
+
+Usage:
+kernel = get_kernel('quad4', order=2)
+K = kernel.stiffness_matrices(coords[connectivity], E, nu)  # (n_elements, 8, 8)
+K_global = assemble_stiffness(coords, connectivity, E, nu)
+"""
+import importlib.util
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Tuple
+
+import numpy as np
+
+# part of the cache key, increase it when the generated code changes
+GENERATOR_VERSION = 1
+CACHE_DIRECTORY = Path('~/.cache/fem/kernels')
+
+# number of nodes of the element types
+ELEMENTS = {'tri3': 3, 'quad4': 4, 'quad8': 8}
+# the default quadrature order of the element types, without spurious zero energy modes
+DEFAULT_ORDERS = {'tri3': 3, 'quad4': 2, 'quad8': 3}
+# DOFs per node, strain components and number of B matrices of the analysis kinds
+KINDS = {'axisymmetric': (2, 4, 1), 'harmonic': (3, 6, 2)}
+
+# number of elements whose B matrices are evaluated at once
+CHUNK_SIZE = 2 ** 14
+
+_kernels = {}
+
+
+def _quadrature(element: str, order: int) -> Tuple[list, list]:
+    """
+    Exact (symbolic) Gauss points and weights on the reference element.
+
+    tri3: order 1 (centroid) or 3 points, quads: order x order Gauss-Legendre points.
+    """
+    import sympy as sp
+    from sympy.integrals.quadrature import gauss_legendre
+
+    if element == 'tri3':
+        if order == 1:
+            return [(sp.Rational(1, 3), sp.Rational(1, 3))], [sp.Rational(1, 2)]
+        if order == 3:
+            a, b = sp.Rational(1, 6), sp.Rational(2, 3)
+            return [(a, a), (b, a), (a, b)], [sp.Rational(1, 6)] * 3
+        raise ValueError(f'The quadrature order of tri3 elements must be 1 or 3, not {order}')
+    if not 1 <= order <= 6:
+        raise ValueError(f'The quadrature order of {element} elements must be 1 to 6, not {order}')
+    points, weights = gauss_legendre(order, 20)
+    return ([(p, q) for p in points for q in points],
+            [w_p * w_q for w_p in weights for w_q in weights])
+
+
+def _shape_functions(element: str, xi, eta) -> list:
+    import sympy as sp
+
+    if element == 'tri3':
+        return [1 - xi - eta, xi, eta]
+    quarter, half = sp.Rational(1, 4), sp.Rational(1, 2)
+    if element == 'quad4':
+        return [quarter * (1 - xi) * (1 - eta), quarter * (1 + xi) * (1 - eta),
+                quarter * (1 + xi) * (1 + eta), quarter * (1 - xi) * (1 + eta)]
+    if element == 'quad8':
+        return [quarter * (1 - xi) * (1 - eta) * (-xi - eta - 1), quarter * (1 + xi) * (1 - eta) * (xi - eta - 1),
+                quarter * (1 + xi) * (1 + eta) * (xi + eta - 1), quarter * (1 - xi) * (1 + eta) * (-xi + eta - 1),
+                half * (1 - xi ** 2) * (1 - eta), half * (1 + xi) * (1 - eta ** 2),
+                half * (1 - xi ** 2) * (1 + eta), half * (1 - xi) * (1 - eta ** 2)]
+    raise ValueError(f'Unknown element type {element!r}, expected one of {tuple(ELEMENTS)}')
+
+
+def _strain_entries(kind: str, N: list, dN_dr: list, dN_dz: list, radius) -> list:
+    """
+    The non-zero entries of the B matrices at a point.
+
+    :return: list of (matrix, strain, DOF, expression), matrix 0 is B (or B_A), matrix 1 is B_B.
+    """
+    entries = []
+    for i in range(len(N)):
+        N_r = N[i] / radius
+        if kind == 'axisymmetric':
+            u, w = 2 * i, 2 * i + 1
+            entries += [(0, 0, u, dN_dr[i]), (0, 1, u, N_r), (0, 2, w, dN_dz[i]),
+                        (0, 3, u, dN_dz[i]), (0, 3, w, dN_dr[i])]
+        else:
+            u, v, w = 3 * i, 3 * i + 1, 3 * i + 2
+            entries += [(0, 0, u, dN_dr[i]), (0, 1, u, N_r), (0, 2, w, dN_dz[i]), (0, 3, v, dN_dr[i] - N_r),
+                        (0, 4, v, dN_dz[i]), (0, 5, u, dN_dz[i]), (0, 5, w, dN_dr[i]),
+                        (1, 1, v, N_r), (1, 3, u, -N_r), (1, 4, w, -N_r)]
+    return entries
+
+
+def generate_source(element: str, kind: str, order: int) -> str:
+    """
+    Derives the B matrices of an element type at the Gauss points with sympy and writes them as NumPy code.
+
+    The generated function kernel(r, z) takes the (n_elements, n_nodes) node coordinates and returns the B matrices
+    (n_points, n_matrices, n_elements, n_strains, n_element_dofs) and the integration weights w |J| r at the points
+    (n_points, n_elements).
+
+    :param element: 'tri3', 'quad4' or 'quad8'.
+    :param kind: 'axisymmetric' or 'harmonic'.
+    :param order: The quadrature order.
+    :return: Python source of the kernel module.
+    """
+    import sympy as sp
+
+    if kind not in KINDS:
+        raise ValueError(f'Unknown analysis kind {kind!r}, expected one of {tuple(KINDS)}')
+    ND, n_strains, n_matrices = KINDS[kind]
+    xi, eta = sp.symbols('xi eta')
+    N = sp.Matrix(_shape_functions(element, xi, eta))
+    n_nodes = len(N)
+    r = sp.symbols(f'r0:{n_nodes}')
+    z = sp.symbols(f'z0:{n_nodes}')
+    dN_dxi, dN_deta = N.diff(xi), N.diff(eta)
+    points, weights = _quadrature(element, order)
+
+    lines = [
+        f'"""Generated by source.TwoD.Axissymmetric.kernels from the symbolic derivation, do not edit."""',
+        'import numpy as np',
+        '',
+        f"ELEMENT = '{element}'",
+        f"KIND = '{kind}'",
+        f'ORDER = {order}',
+        f'GENERATOR_VERSION = {GENERATOR_VERSION}',
+        f'N_POINTS = {len(points)}',
+        '',
+        '',
+        'def kernel(r, z):',
+        '    n = r.shape[0]',
+        f'    B = np.zeros(({len(points)}, {n_matrices}, n, {n_strains}, {ND * n_nodes}))',
+        f'    dV = np.empty(({len(points)}, n))',
+    ]
+    lines += [f'    r{i} = r[:, {i}]' for i in range(n_nodes)]
+    lines += [f'    z{i} = z[:, {i}]' for i in range(n_nodes)]
+
+    for g, ((p, q), w) in enumerate(zip(points, weights)):
+        at = {xi: p, eta: q}
+        N_g = [x.subs(at) for x in N]
+        dxi = [x.subs(at) for x in dN_dxi]
+        deta = [x.subs(at) for x in dN_deta]
+        # the Jacobian [[dr/dxi, dz/dxi], [dr/deta, dz/deta]] and its inverse applied to the derivatives
+        dr_dxi, dz_dxi = sum(a * b for a, b in zip(dxi, r)), sum(a * b for a, b in zip(dxi, z))
+        dr_deta, dz_deta = sum(a * b for a, b in zip(deta, r)), sum(a * b for a, b in zip(deta, z))
+        det = dr_dxi * dz_deta - dz_dxi * dr_deta
+        radius = sum(a * b for a, b in zip(N_g, r))
+        dN_dr = [(dz_deta * dxi[i] - dz_dxi * deta[i]) / det for i in range(n_nodes)]
+        dN_dz = [(dr_dxi * deta[i] - dr_deta * dxi[i]) / det for i in range(n_nodes)]
+
+        entries = _strain_entries(kind, N_g, dN_dr, dN_dz, radius)
+        # equal expressions are computed once
+        unique = list(dict.fromkeys([w * radius * det] + [x[3] for x in entries]))
+        replacements, reduced = sp.cse(unique, symbols=sp.numbered_symbols('x'))
+        lines.append(f'    # point {g}: xi = {sp.N(p, 17)}, eta = {sp.N(q, 17)}')
+        lines += [f'    {name} = {sp.pycode(value)}' for name, value in replacements]
+        lines += [f'    e{k} = {sp.pycode(value)}' for k, value in enumerate(reduced)]
+        lines.append(f'    dV[{g}] = e0')
+        index = {x: k for k, x in enumerate(unique)}
+        lines += [f'    B[{g}, {m}, :, {s}, {d}] = e{index[x]}' for m, s, d, x in entries]
+    lines.append('    return B, dV')
+    return '\n'.join(lines) + '\n'
+
+
+def _load(path: Path) -> Callable:
+    spec = importlib.util.spec_from_file_location(f'_{path.stem}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.kernel
+
+
+def elasticity_matrices(E, nu, n_strains: int = 4) -> np.array:
+    """
+    The isotropic elasticity matrices, the normal strains first, then the engineering shear strains.
+
+    :param E: Young's modulus, scalar or one value per element.
+    :param nu: Poisson ratio, scalar or one value per element.
+    :param n_strains: 4 for the axisymmetric, 6 for the harmonic strains.
+    :return: (..., n_strains, n_strains) array.
+    """
+    E, nu = np.broadcast_arrays(np.asarray(E, dtype=float), np.asarray(nu, dtype=float))
+    D = np.zeros(E.shape + (n_strains, n_strains))
+    D[..., :3, :3] = nu[..., None, None]
+    for i in range(3):
+        D[..., i, i] = 1 - nu
+    for i in range(3, n_strains):
+        D[..., i, i] = (1 - 2 * nu) / 2
+    return (E / ((1 + nu) * (1 - 2 * nu)))[..., None, None] * D
+
+
+def harmonic_stiffness(K: np.array, n: int) -> np.array:
+    """
+    The stiffness matrices of harmonic n from the harmonic independent ones.
+
+    :param K: (3, ...) K0, K1 and K2 of Kernel.stiffness_matrices of a harmonic kernel.
+    :param n: The harmonic.
+    :return: c_n (K0 + n K1 + n^2 K2).
+    """
+    return (2 * np.pi if n == 0 else np.pi) * (K[0] + n * K[1] + n ** 2 * K[2])
+
+
+@dataclass
+class Kernel:
+    """A generated element kernel, see get_kernel."""
+
+    element: str  # element type
+    kind: str  # analysis kind
+    order: int  # quadrature order
+    function: Callable  # the generated kernel(r, z)
+    path: Path  # the generated module
+
+    @property
+    def ND(self) -> int:
+        """DOFs per node."""
+        return KINDS[self.kind][0]
+
+    @property
+    def n_nodes(self) -> int:
+        return ELEMENTS[self.element]
+
+    def strain_matrices(self, coords: np.array) -> Tuple[np.array, np.array]:
+        """
+        The B matrices of the elements at the Gauss points.
+
+        :param coords: (n_elements, n_nodes, 2) node coordinates (r, z).
+        :return: B (n_points, n_matrices, n_elements, n_strains, n_element_dofs) and the integration weights
+                 w |J| r (n_points, n_elements).
+        """
+        coords = np.asarray(coords, dtype=float)
+        if coords.shape[1:] != (self.n_nodes, 2):
+            raise ValueError(f'{self.element} elements need (n_elements, {self.n_nodes}, 2) coordinates, '
+                             f'got {coords.shape}')
+        return self.function(np.ascontiguousarray(coords[..., 0]), np.ascontiguousarray(coords[..., 1]))
+
+    def stiffness_matrices(self, coords: np.array, E, nu) -> np.array:
+        """
+        The element stiffness matrices, integrated over the cross-section with the Gauss rule of the kernel.
+
+        :param coords: (n_elements, n_nodes, 2) node coordinates (r, z).
+        :param E: Young's modulus, scalar or one value per element.
+        :param nu: Poisson ratio, scalar or one value per element.
+        :return: axisymmetric: (n_elements, n_element_dofs, n_element_dofs) including the factor 2 pi,
+                 harmonic: (3, n_elements, n_element_dofs, n_element_dofs) K0, K1 and K2, see harmonic_stiffness.
+        """
+        coords = np.asarray(coords, dtype=float)
+        n = len(coords)
+        _, n_strains, n_matrices = KINDS[self.kind]
+        D = elasticity_matrices(np.broadcast_to(E, (n, )), np.broadcast_to(nu, (n, )), n_strains)
+        n_dofs = self.ND * self.n_nodes
+        K = np.empty((2 * n_matrices - 1, n, n_dofs, n_dofs))
+        for start in range(0, n, CHUNK_SIZE):
+            chunk = slice(start, start + CHUNK_SIZE)
+            B, dV = self.strain_matrices(coords[chunk])
+            if np.any(dV <= 0):
+                elements = start + np.flatnonzero((dV <= 0).any(axis=0))
+                raise ValueError(f'Elements {elements[:10].tolist()} are distorted, not numbered counterclockwise '
+                                 f'or not at r > 0.')
+            # D B weighted with w |J| r, the sums over the points and strains are then one product per element
+            DB = np.einsum('est,gmetb->gmesb', D[chunk], B) * dV[:, None, :, None, None]
+            K[0, chunk] = np.einsum('gesa,gesb->eab', B[:, 0], DB[:, 0])
+            if n_matrices == 2:
+                K_AB = np.einsum('gesa,gesb->eab', B[:, 0], DB[:, 1])
+                K[1, chunk] = K_AB + K_AB.transpose(0, 2, 1)
+                K[2, chunk] = np.einsum('gesa,gesb->eab', B[:, 1], DB[:, 1])
+        return 2 * np.pi * K[0] if n_matrices == 1 else K
+
+
+def get_kernel(element: str, kind: str = 'axisymmetric', order: int = None, directory=None) -> Kernel:
+    """
+    The kernel of an element type, analysis kind and quadrature order. It is generated with sympy on the first use
+    and cached on disk; later calls (and later processes) load the generated module without sympy.
+
+    :param element: 'tri3', 'quad4' or 'quad8'.
+    :param kind: 'axisymmetric' or 'harmonic'.
+    :param order: The quadrature order, by default DEFAULT_ORDERS.
+    :param directory: The cache directory, by default CACHE_DIRECTORY.
+    :return: The kernel.
+    """
+    if element not in ELEMENTS:
+        raise ValueError(f'Unknown element type {element!r}, expected one of {tuple(ELEMENTS)}')
+    if kind not in KINDS:
+        raise ValueError(f'Unknown analysis kind {kind!r}, expected one of {tuple(KINDS)}')
+    order = DEFAULT_ORDERS[element] if order is None else int(order)
+    directory = Path(CACHE_DIRECTORY if directory is None else directory).expanduser()
+    key = (element, kind, order, directory)
+    if key not in _kernels:
+        path = directory / f'{element}_{kind}_{order}_v{GENERATOR_VERSION}.py'
+        if not path.exists():
+            source = generate_source(element, kind, order)
+            directory.mkdir(parents=True, exist_ok=True)
+            # write to a temporary file first, so a concurrent process never loads a partial module
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                f.write(source)
+            os.replace(tmp, path)
+        _kernels[key] = Kernel(element=element, kind=kind, order=order, function=_load(path), path=path)
+    return _kernels[key]
+
+
+def assemble_stiffness(coords: np.array, connectivity: np.array, E, nu, order: int = None, harmonic: int = None,
+                       free: np.array = None, directory=None):
+    """
+    The global stiffness matrix of an axisymmetric mesh of one element type, assembled with a sparse pattern.
+
+    :param coords: (n_nodes, 2) node coordinates (r, z).
+    :param connectivity: (n_elements, 3, 4 or 8) node numbers, the element type follows from the number of nodes.
+    :param E: Young's modulus, scalar or one value per element.
+    :param nu: Poisson ratio, scalar or one value per element.
+    :param order: The quadrature order, by default DEFAULT_ORDERS.
+    :param harmonic: None for axisymmetric loads (2 DOFs per node), otherwise the harmonic n (3 DOFs per node).
+    :param free: Optional boolean mask of the DOFs to keep.
+    :param directory: The kernel cache directory.
+    :return: scipy.sparse.csr_matrix, the DOFs are numbered node by node.
+    """
+    from source.sparse import SparsePattern
+
+    coords = np.asarray(coords, dtype=float)
+    connectivity = np.asarray(connectivity, dtype=np.int64)
+    element = {n: name for name, n in ELEMENTS.items()}.get(connectivity.shape[1])
+    if element is None:
+        raise ValueError(f'Elements with {connectivity.shape[1]} nodes are not supported')
+    kernel = get_kernel(element, 'axisymmetric' if harmonic is None else 'harmonic', order, directory)
+    K = kernel.stiffness_matrices(coords[connectivity], E, nu)
+    if harmonic is not None:
+        K = harmonic_stiffness(K, harmonic)
+
+    ND = kernel.ND
+    dof_indices = (ND * connectivity[:, :, None] + np.arange(ND)).reshape(len(connectivity), -1)
+    pattern = SparsePattern.from_dof_indices(dof_indices, ND * len(coords), free)
+    return pattern.matrix(pattern.assemble(K))
@@ -0,0 +1,397 @@
+"""
+2D Quadrilateral elements
+
+4 node isoparametric Reissner-Mindlin plate element in the x-y plane and a model of such elements. The derivation is
+in plane_quad_derivations.ipynb, the sign convention of the shear strains in errors.md.
+
+The element matrices are evaluated for all elements at once: the shape functions and their derivatives by the
+natural coordinates are computed once per Gauss rule (gauss_data), the Jacobians, the B matrices and the element
+stiffness matrices of all elements are then computed with einsum, in chunks of elements to bound the memory.
+
+The shear part is integrated with one Gauss point by default (selective reduced integration), the full 2 x 2 rule
+makes thin plates lock in shear.
+"""
+import pprint
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Tuple, Dict
+
+import numpy as np
+
+from source.utils import IDMixin, CacheMixin
+from source.node import Node
+from source.OneD.model import Model
+
+# number of elements whose B matrices are evaluated at once
+CHUNK_SIZE = 2 ** 14
+
+
+def shape_functions(xi, eta) -> np.array:
+    """
+    The shape functions, node numbering is CCW, starting at (-1, -1).
+
+    :param xi: Natural coordinate(s).
+    :param eta: Natural coordinate(s).
+    :return: (..., 4) array.
+    """
+    xi, eta = np.broadcast_arrays(np.asarray(xi, dtype=float), np.asarray(eta, dtype=float))
+    return 0.25 * np.stack(((1 - xi) * (1 - eta), (1 + xi) * (1 - eta), (1 + xi) * (1 + eta), (1 - xi) * (1 + eta)),
+                           axis=-1)
+
+
+def shape_function_derivatives(xi, eta) -> np.array:
+    """
+    The derivatives of the shape functions by the natural coordinates.
+
+    :return: (..., 2, 4) array, the rows are d/dxi and d/deta.
+    """
+    xi, eta = np.broadcast_arrays(np.asarray(xi, dtype=float), np.asarray(eta, dtype=float))
+    dN_dxi = 0.25 * np.stack((-(1 - eta), 1 - eta, 1 + eta, -(1 + eta)), axis=-1)
+    dN_deta = 0.25 * np.stack((-(1 - xi), -(1 + xi), 1 + xi, 1 - xi), axis=-1)
+    return np.stack((dN_dxi, dN_deta), axis=-2)
+
+
+@dataclass(frozen=True)
+class GaussData:
+    """A Gauss rule and the shape functions evaluated at its points."""
+
+    points: np.ndarray  # (n_gp, 2) natural coordinates
+    weights: np.ndarray  # (n_gp,)
+    N: np.ndarray  # (n_gp, 4) shape functions
+    dN: np.ndarray  # (n_gp, 2, 4) derivatives by xi and eta
+
+
+@lru_cache(maxsize=None)
+def gauss_data(n: int) -> GaussData:
+    """
+    The n x n Gauss rule on the square [-1, 1] x [-1, 1], computed once per rule.
+
+    :param n: Number of points in each direction.
+    :return: The rule and the shape functions at its points, read-only arrays.
+    """
+    p, w = np.polynomial.legendre.leggauss(n)
+    xi, eta = np.meshgrid(p, p, indexing='ij')
+    data = GaussData(points=np.column_stack((xi.ravel(), eta.ravel())), weights=np.outer(w, w).ravel(),
+                     N=shape_functions(xi.ravel(), eta.ravel()), dN=shape_function_derivatives(xi.ravel(), eta.ravel()))
+    for array in (data.points, data.weights, data.N, data.dN):
+        array.flags.writeable = False
+    return data
+
+
+def jacobians(coords: np.array, dN: np.array) -> Tuple[np.array, np.array]:
+    """
+    The Jacobians of the isoparametric mapping and the derivatives of the shape functions by x and y.
+
+    J = [[dx/dxi, dy/dxi], [dx/deta, dy/deta]] and [d/dxi, d/deta] = J [d/dx, d/dy].
+
+    :param coords: (n_elements, 4, 2) node coordinates.
+    :param dN: (n_gp, 2, 4) derivatives of the shape functions by the natural coordinates.
+    :return: determinants (n_elements, n_gp) and derivatives by x and y (n_elements, n_gp, 2, 4).
+    """
+    J = np.einsum('gai,eib->egab', dN, coords)
+    det = J[..., 0, 0] * J[..., 1, 1] - J[..., 0, 1] * J[..., 1, 0]
+    if np.any(det <= 0):
+        elements = np.flatnonzero((det <= 0).any(axis=1))
+        raise ValueError(f"Elements {elements[:10].tolist()} are distorted or not numbered counterclockwise.")
+    # the inverse of the 2 x 2 matrices
+    J_inv = np.stack((np.stack((J[..., 1, 1], -J[..., 0, 1]), axis=-1),
+                      np.stack((-J[..., 1, 0], J[..., 0, 0]), axis=-1)), axis=-2) / det[..., None, None]
+    return det, np.einsum('egba,gai->egbi', J_inv, dN)
+
+
+def bending_B(dN_xy: np.array) -> np.array:
+    """
+    The B^I matrices relating the nodal DOFs (w, thetaX, thetaY per node) to the curvatures
+    (kx, ky, kxy) = (dthetaY/dx, -dthetaX/dy, dthetaY/dy - dthetaX/dx).
+
+    :param dN_xy: (..., 2, 4) derivatives of the shape functions by x and y.
+    :return: (..., 3, 12) array.
+    """
+    dx, dy = dN_xy[..., 0, :], dN_xy[..., 1, :]
+    B = np.zeros(dN_xy.shape[:-2] + (3, 4, 3))
+    B[..., 0, :, 2] = dx
+    B[..., 1, :, 1] = -dy
+    B[..., 2, :, 1] = -dx
+    B[..., 2, :, 2] = dy
+    return B.reshape(dN_xy.shape[:-2] + (3, 12))
+
+
+def shear_B(N: np.array, dN_xy: np.array) -> np.array:
+    """
+    The B^O matrices relating the nodal DOFs to the shear strains (gxz, gyz) = (dw/dx + thetaY, dw/dy - thetaX).
+
+    :param N: (n_gp, 4) shape functions.
+    :param dN_xy: (..., n_gp, 2, 4) derivatives of the shape functions by x and y.
+    :return: (..., n_gp, 2, 12) array.
+    """
+    N = np.broadcast_to(N, dN_xy.shape[:-2] + (4, ))
+    B = np.zeros(dN_xy.shape[:-2] + (2, 4, 3))
+    B[..., 0, :, 0] = dN_xy[..., 0, :]
+    B[..., 0, :, 2] = N
+    B[..., 1, :, 0] = dN_xy[..., 1, :]
+    B[..., 1, :, 1] = -N
+    return B.reshape(dN_xy.shape[:-2] + (2, 12))
+
+
+def bending_rigidities(t, E, nu) -> np.array:
+    """The bending material matrices D_b = E t^3 / (12 (1 - nu^2)) [[1, nu, 0], [nu, 1, 0], [0, 0, (1 - nu) / 2]]."""
+    t, E, nu = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (t, E, nu)))
+    D = np.zeros(t.shape + (3, 3))
+    D[..., 0, 0] = D[..., 1, 1] = 1
+    D[..., 0, 1] = D[..., 1, 0] = nu
+    D[..., 2, 2] = (1 - nu) / 2
+    return (E * t ** 3 / (12 * (1 - nu ** 2)))[..., None, None] * D
+
+
+def shear_rigidities(t, E, nu, kappa: float = 5 / 6) -> np.array:
+    """The shear rigidities kappa G t of the shear material matrices D_s = kappa G t I."""
+    t, E, nu = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (t, E, nu)))
+    return kappa * E / (2 * (1 + nu)) * t
+
+
+def plate_stiffness_matrices(coords: np.array, t, E, nu, kappa: float = 5 / 6, rule: int = 2,
+                             shear_rule: int = 1) -> np.array:
+    """
+    The stiffness matrices of Reissner-Mindlin plate elements,
+
+    K = sum_g w_g |J| (B^I.T D_b B^I + B^O.T D_s B^O).
+
+    :param coords: (n_elements, 4, 2) node coordinates.
+    :param t: Thickness, scalar or one value per element.
+    :param E: Young's modulus, scalar or one value per element.
+    :param nu: Poisson ratio, scalar or one value per element.
+    :param kappa: Shear correction factor.
+    :param rule: Gauss points per direction of the bending part.
+    :param shear_rule: Gauss points per direction of the shear part, 1 for selective reduced integration.
+    :return: (n_elements, 12, 12) array.
+    """
+    coords = np.asarray(coords, dtype=float)
+    n = len(coords)
+    t, E, nu = (np.broadcast_to(np.asarray(x, dtype=float), (n, )) for x in (t, E, nu))
+    bending, shear = gauss_data(rule), gauss_data(shear_rule)
+    K = np.empty((n, 12, 12))
+    for start in range(0, n, CHUNK_SIZE):
+        chunk = slice(start, start + CHUNK_SIZE)
+        det, dN_xy = jacobians(coords[chunk], bending.dN)
+        B = bending_B(dN_xy)
+        DB = np.einsum('eij,egjb->egib', bending_rigidities(t[chunk], E[chunk], nu[chunk]), B)
+        K[chunk] = np.einsum('eg,egia,egib->eab', det * bending.weights, B, DB)
+
+        det, dN_xy = jacobians(coords[chunk], shear.dN)
+        B = shear_B(shear.N, dN_xy)
+        factor = det * shear.weights * shear_rigidities(t[chunk], E[chunk], nu[chunk], kappa)[:, None]
+        K[chunk] += np.einsum('eg,egia,egib->eab', factor, B, B)
+    return K
+
+
+def rectangle(a: float, b: float, nx: int, ny: int) -> Tuple[np.array, np.array]:
+    """
+    A structured mesh of a rectangle [0, a] x [0, b].
+
+    :return: coords ((nx + 1) * (ny + 1), 2), connectivity (nx * ny, 4), the nodes are numbered row by row.
+    """
+    x, y = np.meshgrid(np.linspace(0, a, nx + 1), np.linspace(0, b, ny + 1))
+    ids = np.arange((nx + 1) * (ny + 1)).reshape(ny + 1, nx + 1)
+    connectivity = np.stack((ids[:-1, :-1], ids[:-1, 1:], ids[1:, 1:], ids[1:, :-1]), axis=-1).reshape(-1, 4)
+    return np.column_stack((x.ravel(), y.ravel())), connectivity
+
+
+@dataclass
+class RM2DPlate(CacheMixin, IDMixin):
+
+    """
+    2D 4 node isoparametric Reissner-Mindlin plate in the x-y plane
+    3 DOFs each node:
+    - w: deflection in the z direction
+    - thex: rotation about x
+    - they: rotation about y
+
+    Node order: wi, thexi, theyi with i=1, 2, 3, 4
+
+    """
+
+    i: Node
+    j: Node
+    k: Node
+    l: Node
+    t: float  # thickness
+    E: float  # Youngs module
+    nu: float  # Poisson ratio
+
+    _dof_indices: tuple = None  # DOF indices for the element in the model, to be set later by the model
+
+    ND: int = field(init=False, default=3)  # w, thex, they
+    NNODE = 4  # number of nodes
+    kappa: float = field(init=False, default=5 / 6)  # shear correction factor, set by the model
+    shear_rule: int = field(init=False, default=1)  # Gauss points per direction of the shear part, set by the model
+
+    def __post_init__(self):
+        super().__init__(self.__class__.__name__)  # Call the IDMixin constructor to set the ID
+
+    @property
+    def element_nodes(self) -> tuple:
+        return self.i, self.j, self.k, self.l
+
+    @property
+    def dof_indices(self):
+        return self._dof_indices
+
+    @property
+    def coords(self) -> np.array:
+        """(4, 2) node coordinates."""
+        return np.array([node.coords[:2] for node in self.element_nodes], dtype=float)
+
+    def _N(self, xi, eta) -> np.array:
+        """shape functions"""
+        return shape_functions(xi, eta)
+
+    def _dNdxi(self, xi, eta) -> np.array:
+        """derivative of the shape functions by xi"""
+        return shape_function_derivatives(xi, eta)[..., 0, :]
+
+    def _dNdeta(self, xi, eta) -> np.array:
+        """derivative of the shape functions by eta"""
+        return shape_function_derivatives(xi, eta)[..., 1, :]
+
+    def N(self, xi: float, eta: float) -> np.array:
+        """shape function matrix, (3, 12) with N_i on the diagonal of the block of node i"""
+        return np.kron(self._N(xi, eta)[None, :], np.eye(self.ND))
+
+    def B(self, xi: float, eta: float) -> Tuple[np.array, np.array]:
+        """
+        The strain matrices, composed of the partial derivatives of the shape functions.
+
+        :return: B^I (3, 12) of the curvatures and B^O (2, 12) of the shear strains.
+        """
+        _, dN_xy = jacobians(self.coords[None], shape_function_derivatives(xi, eta)[None])
+        return bending_B(dN_xy)[0, 0], shear_B(self._N(xi, eta)[None], dN_xy)[0, 0]
+
+    @property
+    def Ke(self) -> np.array:
+        """Stiffness matrix of the element, with the shear correction factor and the shear rule of the model."""
+        return self._cached('Ke', lambda: plate_stiffness_matrices(self.coords[None], self.t, self.E, self.nu,
+                                                                   kappa=self.kappa, shear_rule=self.shear_rule)[0])
+
+
+@dataclass
+class PlaneQuadModel(Model):
+
+    nodes_: Tuple[Node, ...] = None  # Nodes in the model
+    elements_: Tuple[Tuple[
+        int, int, int, int, float, float, float], ...] = None  # A nested tuple. For each element four nodes, the thickness, E and nu.
+    supports_: Dict[int, Tuple[int, ...]] = None  # Supports. Node ID: local dof numbers e.g. {0: (0, 1, 2)}
+
+    ND: int = 3  # DOF per node
+    kappa: float = 5 / 6  # shear correction factor
+    shear_rule: int = 1  # Gauss points per direction of the shear part, 1: selective reduced integration, 2: full
+
+    DOF_NAMES = ('w', 'rx', 'ry')
+    SETTINGS = ('kappa', 'shear_rule')
+
+    def __post_init__(self):
+        if self.nodes_ is None or len(self.nodes_) == 0:
+            raise ValueError("At least one node must be defined in the plate model")
+        if self.elements_ is None or len(self.elements_) == 0:
+            raise ValueError("At least one element must be defined in the plate model")
+
+        # Convert nodes and elements to dictionaries for easy access
+        # This allows for quick lookups by node ID and element ID
+        self.nodes = {node.ID: node for node in self.nodes_}  # Convert nodes to a dictionary for easy access
+        elements_ = tuple(
+            RM2DPlate(i=self.nodes[x[0]], j=self.nodes[x[1]], k=self.nodes[x[2]], l=self.nodes[x[3]], t=x[4], E=x[5], nu=x[6]) for x in self.elements_)
+        self.elements = {x.ID: x for x in elements_}  # Convert elements to a dictionary for easy access
+        self.supports = self.supports_ if self.supports_ is not None else tuple()  # Supports, a tuple of (node_id, direction)
+
+        # set the DOF indices for each element
+        self.elements = self.set_element_dof_indices()
+        for element in self.elements.values():
+            element.kappa, element.shear_rule = self.kappa, self.shear_rule
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        # the elements use the settings of the model, setting them clears the element caches too
+        if name in self.SETTINGS and 'elements' in self.__dict__:
+            for element in self.elements.values():
+                setattr(element, name, value)
+
+    def element_arrays(self) -> Dict[str, np.array]:
+        """
+        The node coordinates and the properties of all elements as arrays, in the order of self.elements. Cached.
+
+        :return: dict with 'coords' (n_elements, 4, 2), 't', 'E' and 'nu'.
+        """
+        def factory():
+            coords = np.array([self.nodes[x].coords[:2] for x in sorted(self.nodes)], dtype=float)
+            arrays = self.to_arrays()
+            t, E, nu = arrays['properties'].T
+            return {'coords': coords[arrays['connectivity']], 't': t, 'E': E, 'nu': nu}
+
+        return self._cached('element_arrays', factory)
+
+    def element_stiffness_matrices(self) -> np.array:
+        """The stiffness matrices of all elements computed in batches, (n_elements, 12, 12) array."""
+        arrays = self.element_arrays()
+        return plate_stiffness_matrices(arrays['coords'], arrays['t'], arrays['E'], arrays['nu'], kappa=self.kappa,
+                                        shear_rule=self.shear_rule)
+
+    def assemble_global_K(self) -> np.array:
+        """The global stiffness matrix as a dense array, assembled from the batched element matrices."""
+        pattern = self.sparse_pattern()
+        return pattern.matrix(pattern.assemble(self.element_stiffness_matrices())).toarray()
+
+    def pressure_load(self, q) -> np.array:
+        """
+        The consistent nodal loads of a uniform pressure in the z direction.
+
+        :param q: Pressure, scalar or one value per element.
+        :return: Global load vector.
+        """
+        arrays = self.element_arrays()
+        rule = gauss_data(2)
+        det, _ = jacobians(arrays['coords'], rule.dN)
+        q = np.broadcast_to(np.asarray(q, dtype=float), (len(det), ))
+        f = np.einsum('eg,gi->ei', det * rule.weights * q[:, None], rule.N)
+        n_dofs = self.ND * len(self.nodes)
+        return np.bincount(self.element_dof_indices[:, 0::3].ravel(), weights=f.ravel(), minlength=n_dofs)
+
+    def stress_resultants(self, u: np.array) -> Dict[str, np.array]:
+        """
+        The moments and the shear forces at the element centres.
+
+        :param u: Global displacement vector.
+        :return: dict with 'M' (n_elements, 3): mx, my, mxy and 'Q' (n_elements, 2): qx, qy.
+        """
+        arrays = self.element_arrays()
+        centre = gauss_data(1)
+        ue = np.asarray(u, dtype=float)[self.element_dof_indices]
+        _, dN_xy = jacobians(arrays['coords'], centre.dN)
+        kappa = np.einsum('eij,ej->ei', bending_B(dN_xy)[:, 0], ue)
+        gamma = np.einsum('eij,ej->ei', shear_B(centre.N, dN_xy)[:, 0], ue)
+        return {
+            'M': np.einsum('eij,ej->ei', bending_rigidities(arrays['t'], arrays['E'], arrays['nu']), kappa),
+            'Q': shear_rigidities(arrays['t'], arrays['E'], arrays['nu'], self.kappa)[:, None] * gamma,
+        }
+
+
+if __name__ == '__main__':
+    n1 = Node(-1, -1, 0)
+    n2 = Node(1, -1, 0)
+    n3 = Node(1, 1, 0)
+    n4 = Node(-1, 1, 0)
+
+    model = PlaneQuadModel(
+        nodes_=(n1, n2, n3, n4),
+        elements_=(
+            (n1.ID, n2.ID, n3.ID, n4.ID, 1.2, 210, 0.3),
+        ),
+        supports_={
+            n1.ID: (0, 1, 2,),
+            n2.ID: (0, 1, 2,),
+            n3.ID: (0, 1, 2,),
+            n4.ID: (0, 1, 2,),
+        }
+    )
+
+    element = model.elements[0]
+    pprint.pprint(element.N(0, 0))
+    pprint.pprint(np.linalg.eigvalsh(element.Ke))
@@ -0,0 +1,229 @@
+"""
+Opt-in instrumentation of the model phases.
+
+instrument(model, sink, ...) replaces the phase methods of one model (or of a model class, e.g. to include the
+construction) by wrappers that measure each call and send an Event to the sinks; uninstrument restores them. Models
+that are not instrumented run the original methods, so there is no overhead at all when the instrumentation is off.
+
+Each event holds the wall time, optionally the peak of the memory allocated during the phase (tracemalloc), the size
+of the result (shape, nnz) and whatever the phase reports itself with report(), e.g. the fill-in of a factorization or
+the number of solver iterations. Nested phases (e.g. apply_boundary_conditions within solve) are reported with their
+depth.
+
+Usage:
+collector = MemorySink()
+with instrumented(model, collector, LoggingSink()):
+    model.solve(F)
+for event in collector.events:
+    print(event.phase, event.time)
+"""
+import json
+import logging
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from functools import wraps
+
+import numpy as np
+
+PHASES = (
+    'set_element_dof_indices',
+    'assemble_global_K',
+    'assemble_sparse_K',
+    'assemble_lumped_M',
+    'apply_boundary_conditions',
+    '_linear_solve',
+    '_reduced_solve',
+    'reaction_forces',
+    'member_forces',
+    'axial_forces',
+    'end_forces',
+    'internal_actions',
+    'solve',
+    'solve_modal',
+    'solve_buckling',
+    'solve_p_delta',
+)
+
+
+@dataclass
+class Event:
+    """The measurements of one phase call."""
+
+    model: str  # class name of the model
+    phase: str  # name of the method
+    time: float  # wall time in seconds
+    memory: int = None  # peak of the memory allocated during the phase in bytes, None if not traced
+    depth: int = 0  # nesting level, 0 for the outermost phase
+    info: dict = field(default_factory=dict)  # sizes and reported values, see report
+
+
+# the events of the phases running at the moment, innermost last
+_active = []
+# whether tracemalloc was started by the instrumentation
+_tracing = False
+
+
+def active() -> bool:
+    """Whether an instrumented phase is running; use it to skip expensive measurements otherwise."""
+    return bool(_active)
+
+
+def report(**info):
+    """Adds values to the event of the innermost running phase, does nothing if no phase is instrumented."""
+    if _active:
+        _active[-1][0].info.update(info)
+
+
+def _describe(result) -> dict:
+    """Shape and number of stored entries of a matrix result."""
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if hasattr(result, 'nnz'):  # scipy sparse matrix
+        return {'shape': list(result.shape), 'nnz': int(result.nnz)}
+    if isinstance(result, np.ndarray):
+        info = {'shape': list(result.shape)}
+        if result.ndim == 2 and result.shape[0] == result.shape[1]:
+            info['nnz'] = int(np.count_nonzero(result))
+        return info
+    return {}
+
+
+class LoggingSink:
+    """Logs the events."""
+
+    def __init__(self, logger: logging.Logger = None, level: int = logging.INFO):
+        self.logger = logger or logging.getLogger('source.instrumentation')
+        self.level = level
+
+    def __call__(self, event: Event):
+        memory = '' if event.memory is None else f' {event.memory / 2 ** 20:.2f} MiB'
+        self.logger.log(self.level, '%s%s.%s %.6f s%s %s', '  ' * event.depth, event.model, event.phase,
+                        event.time, memory, event.info)
+
+
+class MemorySink:
+    """Collects the events in a list."""
+
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, event: Event):
+        self.events.append(event)
+
+    def totals(self) -> dict:
+        """Total time per phase."""
+        totals = {}
+        for event in self.events:
+            totals[event.phase] = totals.get(event.phase, 0.0) + event.time
+        return totals
+
+
+class JsonLinesSink:
+    """Appends the events to a JSON lines file."""
+
+    def __init__(self, path):
+        self.file = open(path, 'a')
+
+    def __call__(self, event: Event):
+        self.file.write(json.dumps(asdict(event)) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def _wrap(method, phase: str, sinks: tuple, memory: bool):
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        global _tracing
+        # bound method of an instrumented model, or function of an instrumented class
+        model = method.__self__ if hasattr(method, '__self__') else args[0]
+        event = Event(model=type(model).__name__, phase=phase, time=0.0, depth=len(_active))
+        traced = 0
+        if memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracing = True
+            current, peak = tracemalloc.get_traced_memory()
+            if _active:
+                # keep the peak of the enclosing phase before resetting it
+                outer = _active[-1]
+                outer[2] = max(outer[2], peak)
+            tracemalloc.reset_peak()
+            traced = current
+        frame = [event, traced, 0]  # event, traced memory at the start, peak of the nested phases
+        _active.append(frame)
+        start = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            event.time = time.perf_counter() - start
+            _active.pop()
+            if memory:
+                peak = max(tracemalloc.get_traced_memory()[1], frame[2])
+                event.memory = peak - traced
+                if _active:
+                    _active[-1][2] = max(_active[-1][2], peak)
+        event.info = {**_describe(result), **event.info}
+        for sink in sinks:
+            sink(event)
+        return result
+
+    wrapper.__instrumented__ = method
+    return wrapper
+
+
+def instrument(target, *sinks, memory: bool = False, phases: tuple = PHASES):
+    """
+    Instruments the phase methods of a model or of a model class.
+
+    :param target: A model, or a model class to instrument all its models including their construction.
+    :param sinks: Callables receiving the events, e.g. LoggingSink, MemorySink or JsonLinesSink.
+    :param memory: Trace the memory with tracemalloc; this slows down the phases.
+    :param phases: Names of the methods to instrument.
+    :return: The target.
+    """
+    uninstrument(target)
+    for phase in phases:
+        method = getattr(target, phase, None)
+        if method is None:
+            continue
+        wrapper = _wrap(method, phase, sinks, memory)
+        if isinstance(target, type):
+            wrapper.__inherited__ = phase not in vars(target)
+            setattr(target, phase, wrapper)
+        else:
+            # bypasses the cache invalidation of CacheMixin.__setattr__, the methods are no model data
+            target.__dict__[phase] = wrapper
+    return target
+
+
+def uninstrument(target):
+    """Restores the original phase methods and stops the memory tracing started by the instrumentation."""
+    global _tracing
+    if isinstance(target, type):
+        for name, value in list(vars(target).items()):
+            if hasattr(value, '__instrumented__'):
+                if value.__inherited__:
+                    delattr(target, name)
+                else:
+                    setattr(target, name, value.__instrumented__)
+    else:
+        for name in [x for x, value in target.__dict__.items() if hasattr(value, '__instrumented__')]:
+            del target.__dict__[name]
+    if _tracing and not _active:
+        tracemalloc.stop()
+        _tracing = False
+    return target
+
+
+@contextmanager
+def instrumented(target, *sinks, memory: bool = False, phases: tuple = PHASES):
+    """Instruments the target within the with block, see instrument."""
+    instrument(target, *sinks, memory=memory, phases=phases)
+    try:
+        yield target
+    finally:
+        uninstrument(target)
@@ -0,0 +1,330 @@
+"""
+Streaming importer of ANSYS APDL input decks for truss and frame models.
+
+The deck is read line by line, the nodes, elements, supports and loads are collected in numpy buffers that grow in
+chunks, so the memory is bounded by the size of the final arrays and no Python object is kept per line. The node
+numbers of the deck are mapped to node IDs 0..n-1 in ascending order.
+
+Supported commands (abbreviations of 4 characters are accepted for the long ones, '!' starts a comment, '$' separates
+commands, other commands are ignored):
+
+    N, NODE, X, Y, Z                node, NODE is required (no automatic numbering)
+    E, I, J                         element with the current TYPE, MAT, SECNUM and REAL attributes
+    ET, ITYPE, Ename                LINK180, LINK8, LINK1 (truss) or BEAM188, BEAM4 (frame)
+    TYPE / MAT / SECNUM / REAL, N   current element attributes
+    MP, Lab, MAT, C0                EX, DENS, PRXY or NUXY, GXY
+    SECTYPE, SECID, Type, Subtype   LINK, or BEAM with the subtypes ASEC, RECT, CSOLID, CTUBE
+    SECDATA, VAL1, VAL2, ...        LINK: A; ASEC: A, Iyy, Iyz, Izz, Iw, J; RECT: B, H; CSOLID: R; CTUBE: Ri, Ro
+    R, NSET, R1                     real constant set, the area of LINK elements without a section
+    D, NODE, Lab, 0                 fixed DOF, Lab is UX, UY, UZ, ROTX, ROTY, ROTZ or ALL; only zero values
+    F, NODE, Lab, VALUE             nodal force, Lab is FX, FY, FZ, MX, MY, MZ; a repeated force replaces the old one
+
+The node fields of N, E, D and F must be node numbers, ALL and component names are not supported.
+
+Usage:
+model, F = load_apdl('truss.inp')
+u, reactions = model.solve(F)
+"""
+from typing import Iterable, Iterator, Tuple
+
+import numpy as np
+
+DOF_LABELS = {'UX': 0, 'UY': 1, 'UZ': 2, 'ROTX': 3, 'ROTY': 4, 'ROTZ': 5, 'ALL': -1}
+FORCE_LABELS = {'FX': 0, 'FY': 1, 'FZ': 2, 'MX': 3, 'MY': 4, 'MZ': 5}
+ELEMENT_TYPES = {'LINK1': 'truss', 'LINK8': 'truss', 'LINK180': 'truss', 'BEAM4': 'frame', 'BEAM188': 'frame'}
+
+# commands that may be abbreviated, by their first 4 characters
+_ABBREVIATIONS = {'SECT': 'SECTYPE', 'SECD': 'SECDATA', 'SECN': 'SECNUM', 'TYPE': 'TYPE', 'REAL': 'REAL'}
+
+
+def iter_commands(lines: Iterable[str]) -> Iterator[Tuple[str, list]]:
+    """
+    Splits the lines of a deck into commands.
+
+    :param lines: The lines, e.g. an open file.
+    :return: Generator of (command name in upper case, list of the field strings).
+    """
+    for line in lines:
+        line = line.split('!', 1)[0]
+        for command in line.split('$'):
+            command = command.strip()
+            if not command or command[0] in '/*':
+                continue
+            fields = [x.strip() for x in command.split(',')]
+            name = fields[0].upper()
+            yield _ABBREVIATIONS.get(name[:4], name), fields[1:]
+
+
+def _float(fields: list, i: int, default: float = 0.0) -> float:
+    """The i-th field as a number, blank and missing fields are the default like in APDL."""
+    return float(fields[i]) if i < len(fields) and fields[i] else default
+
+
+def _int(fields: list, i: int, default: int = 0) -> int:
+    return int(float(fields[i])) if i < len(fields) and fields[i] else default
+
+
+def _node(fields: list, i: int, command: str) -> int:
+    """
+    The i-th field as a node number. Blank fields (automatic numbering), ALL (the selected nodes) and component names
+    are not supported.
+    """
+    value = fields[i] if i < len(fields) else ''
+    try:
+        return int(float(value))
+    except ValueError:
+        node = f'the node {value}' if value else 'a blank node number'
+        raise ValueError(f"APDL: {command} with {node} is not supported, only explicit node numbers.") from None
+
+
+class _Buffer:
+    """Rows of fixed length collected in chunks of preallocated arrays."""
+
+    def __init__(self, n_columns: int, dtype, chunk_size: int):
+        self.n_columns = n_columns
+        self.dtype = dtype
+        self.chunk_size = chunk_size
+        self._chunks = []
+        self._chunk = np.empty((chunk_size, n_columns), dtype=dtype)
+        self._n = 0
+
+    def append(self, row: tuple):
+        if self._n == self.chunk_size:
+            self._chunks.append(self._chunk)
+            self._chunk = np.empty((self.chunk_size, self.n_columns), dtype=self.dtype)
+            self._n = 0
+        self._chunk[self._n] = row
+        self._n += 1
+
+    def array(self) -> np.array:
+        return np.concatenate(self._chunks + [self._chunk[:self._n]])
+
+
+def _section_properties(section: dict) -> dict:
+    """A, Iy, Iz and J of a BEAM section."""
+    data = section['data'] + [0.0] * 6
+    subtype = section['subtype']
+    if subtype == 'ASEC':
+        A, Iyy, _, Izz, _, J = data[:6]
+        return {'A': A, 'Iy': Iyy, 'Iz': Izz, 'J': J}
+    if subtype == 'RECT':
+        B, H = data[:2]
+        a, b = max(B, H), min(B, H)
+        J = a * b ** 3 * (1 / 3 - 0.21 * b / a * (1 - b ** 4 / (12 * a ** 4)))
+        return {'A': B * H, 'Iy': B * H ** 3 / 12, 'Iz': H * B ** 3 / 12, 'J': J}
+    if subtype in ('CSOLID', 'CTUBE'):
+        Ri, Ro = (0.0, data[0]) if subtype == 'CSOLID' else data[:2]
+        I = np.pi * (Ro ** 4 - Ri ** 4) / 4
+        return {'A': np.pi * (Ro ** 2 - Ri ** 2), 'Iy': I, 'Iz': I, 'J': 2 * I}
+    raise ValueError(f"APDL: BEAM section subtype {subtype} is not supported.")
+
+
+class ApdlReader:
+    """
+    Collects the model data of one or more APDL decks.
+
+    :param chunk_size: Number of rows of each buffer chunk.
+    """
+
+    def __init__(self, chunk_size: int = 65536):
+        self._nodes = _Buffer(1, np.int64, chunk_size)
+        self._coords = _Buffer(3, np.float64, chunk_size)
+        self._elements = _Buffer(6, np.int64, chunk_size)  # I, J, TYPE, MAT, SECNUM, REAL
+        self._supports = _Buffer(2, np.int64, chunk_size)  # node, DOF
+        self._force_dofs = _Buffer(2, np.int64, chunk_size)  # node, DOF
+        self._forces = _Buffer(1, np.float64, chunk_size)
+
+        self.element_types = {}  # ITYPE: element name
+        self.materials = {}  # MAT: {label: value}
+        self.sections = {}  # SECID: {'type', 'subtype', 'data'}
+        self.real_constants = {}  # NSET: values
+        self.attributes = {'TYPE': 1, 'MAT': 1, 'SECNUM': 1, 'REAL': 1}
+        self._section = None  # the section of SECDATA, the last one defined
+
+    def feed(self, lines: Iterable[str]) -> 'ApdlReader':
+        """
+        Reads the lines of a deck.
+
+        :param lines: The lines, e.g. an open file.
+        :return: self
+        """
+        nodes, coords, elements = self._nodes.append, self._coords.append, self._elements.append
+        attributes = self.attributes
+        for name, fields in iter_commands(lines):
+            # the frequent commands first
+            if name == 'N':
+                nodes((_node(fields, 0, 'N'),))
+                coords((_float(fields, 1), _float(fields, 2), _float(fields, 3)))
+            elif name == 'E':
+                elements((_node(fields, 0, 'E'), _node(fields, 1, 'E'), attributes['TYPE'], attributes['MAT'],
+                          attributes['SECNUM'], attributes['REAL']))
+            elif name == 'D':
+                label = fields[1].upper()
+                if label not in DOF_LABELS:
+                    raise ValueError(f"APDL: D label {label} is not supported.")
+                if _float(fields, 2) != 0:
+                    raise ValueError("APDL: only zero displacements are supported by D.")
+                self._supports.append((_node(fields, 0, 'D'), DOF_LABELS[label]))
+            elif name == 'F':
+                label = fields[1].upper()
+                if label not in FORCE_LABELS:
+                    raise ValueError(f"APDL: F label {label} is not supported.")
+                self._force_dofs.append((_node(fields, 0, 'F'), FORCE_LABELS[label]))
+                self._forces.append((_float(fields, 2),))
+            elif name in attributes:
+                attributes[name] = _int(fields, 0)
+            elif name == 'ET':
+                self.element_types[_int(fields, 0)] = self._element_name(fields[1])
+            elif name == 'MP':
+                self.materials.setdefault(_int(fields, 1, 1), {})[fields[0].upper()] = _float(fields, 2)
+            elif name == 'SECTYPE':
+                self._section = _int(fields, 0)
+                self.sections[self._section] = {'type': fields[1].upper(),
+                                                'subtype': fields[2].upper() if len(fields) > 2 else '', 'data': []}
+            elif name == 'SECDATA':
+                if self._section is None:
+                    raise ValueError("APDL: SECDATA without SECTYPE.")
+                self.sections[self._section]['data'] = [_float(fields, i) for i in range(len(fields))]
+            elif name == 'R':
+                self.real_constants[_int(fields, 0)] = [_float(fields, i) for i in range(1, len(fields))]
+        return self
+
+    @staticmethod
+    def _element_name(name: str) -> str:
+        name = name.upper()
+        if name.isdigit():
+            # element type given by its number, e.g. ET,1,180
+            name = next((x for x in ELEMENT_TYPES if x.endswith(name) and x[-len(name) - 1].isalpha()), name)
+        if name not in ELEMENT_TYPES:
+            raise ValueError(f"APDL: element type {name} is not supported.")
+        return name
+
+    def _element_properties(self, model_type: str, attributes: np.array) -> list:
+        """The element properties in the order of the element tuples of the model for one attribute combination."""
+        _, mat, sec, real = attributes.tolist()
+        material = self.materials.get(mat, {})
+        E = material.get('EX', 0.0)
+        ro = material.get('DENS', 0.0)
+        section = self.sections.get(sec)
+        if model_type == 'truss':
+            if section is not None and section['type'] == 'LINK':
+                A = section['data'][0]
+            elif real in self.real_constants:
+                A = self.real_constants[real][0]
+            else:
+                raise ValueError(f"APDL: no area for the LINK elements with SECNUM {sec} and REAL {real}.")
+            return [A, E, ro]
+
+        if section is None or section['type'] != 'BEAM':
+            raise ValueError(f"APDL: BEAM section {sec} is not defined.")
+        p = _section_properties(section)
+        nu = material.get('PRXY', material.get('NUXY'))
+        if nu is None:
+            nu = E / (2 * material['GXY']) - 1 if 'GXY' in material else 0.3
+        return [p['A'], p['Iy'], p['Iz'], p['J'], E, ro, nu]
+
+    def arrays(self, dim: int = 3) -> dict:
+        """
+        The collected model as arrays, see Model.from_arrays.
+
+        :param dim: Number of coordinates, 2 for plane trusses (Z and UZ are dropped).
+        :return: dict with model_type, coords, connectivity, properties, fixed, loads (n_dofs,) and node_numbers,
+                 the APDL number of each node.
+        """
+        # nodes: the last definition of a node number counts
+        numbers = self._nodes.array()[:, 0]
+        node_numbers, last = np.unique(numbers[::-1], return_index=True)
+        coords = self._coords.array()[len(numbers) - 1 - last]
+
+        elements = self._elements.array()
+        if len(elements) == 0:
+            raise ValueError("APDL: the deck has no elements.")
+        types = {ELEMENT_TYPES[self.element_types[x]] for x in np.unique(elements[:, 2]).tolist()
+                 if x in self.element_types}
+        if len(types) != 1 or not set(np.unique(elements[:, 2]).tolist()) <= set(self.element_types):
+            raise ValueError("APDL: all elements must have the same, defined, element type.")
+        model_type = types.pop()
+        if model_type == 'frame' and dim != 3:
+            raise ValueError("APDL: frame models are three dimensional.")
+        ND = dim if model_type == 'truss' else 6
+
+        def node_ids(x: np.array) -> np.array:
+            ids = np.searchsorted(node_numbers, x)
+            undefined = (ids == len(node_numbers)) | (node_numbers[np.minimum(ids, len(node_numbers) - 1)] != x)
+            if undefined.any():
+                raise ValueError(f"APDL: node {x[undefined][0]} is not defined.")
+            return ids
+
+        connectivity = node_ids(elements[:, :2])
+        # the properties are computed once for each combination of the attributes
+        combinations, inverse = np.unique(elements[:, 2:], axis=0, return_inverse=True)
+        table = np.array([self._element_properties(model_type, x) for x in combinations], dtype=float)
+        properties = table[inverse.ravel()]
+
+        fixed = np.zeros((len(node_numbers), ND), dtype=bool)
+        supports = self._supports.array()
+        ids = node_ids(supports[:, 0])
+        all_dofs = supports[:, 1] == -1
+        fixed[ids[all_dofs]] = True
+        kept = ~all_dofs & (supports[:, 1] < ND)
+        fixed[ids[kept], supports[kept, 1]] = True
+
+        loads = np.zeros(len(node_numbers) * ND)
+        force_dofs = self._force_dofs.array()
+        forces = self._forces.array()[:, 0]
+        if len(forces):
+            keys = node_ids(force_dofs[:, 0]) * 6 + force_dofs[:, 1]
+            # a repeated force replaces the previous one
+            keys, last = np.unique(keys[::-1], return_index=True)
+            forces = forces[len(forces) - 1 - last]
+            dofs = keys % 6
+            if (forces[dofs >= ND] != 0).any():
+                raise ValueError("APDL: forces on DOFs the model does not have.")
+            kept = dofs < ND
+            loads[keys[kept] // 6 * ND + dofs[kept]] = forces[kept]
+
+        return {
+            'model_type': model_type,
+            'coords': coords[:, :dim],
+            'connectivity': connectivity,
+            'properties': properties,
+            'fixed': fixed,
+            'loads': loads,
+            'node_numbers': node_numbers,
+        }
+
+
+def read_apdl(path, dim: int = 3, chunk_size: int = 65536) -> dict:
+    """
+    Reads an APDL deck into arrays, see ApdlReader.arrays.
+
+    :param path: The deck file.
+    :param dim: Number of coordinates, 2 for plane trusses.
+    :param chunk_size: Number of rows of each buffer chunk.
+    :return: dict of arrays.
+    """
+    with open(path) as f:
+        return ApdlReader(chunk_size).feed(f).arrays(dim)
+
+
+def load_apdl(path, dim: int = 3, weld: float = None) -> tuple:
+    """
+    Reads an APDL deck into a TrussModel or SpatialFrameModel.
+
+    :param path: The deck file.
+    :param dim: Number of coordinates, 2 for plane trusses.
+    :param weld: If given, nodes closer than this distance are merged, see source.mesh.weld_nodes.
+    :return: model, global load vector
+    """
+    from source.io.binary import model_classes
+
+    data = read_apdl(path, dim)
+    if weld is not None:
+        from source.mesh import weld_nodes
+
+        result = weld_nodes(data['coords'], data['connectivity'], weld, data['fixed'], data['loads'])
+        data.update(coords=result.coords, connectivity=result.connectivity, fixed=result.fixed, loads=result.loads,
+                    properties=data['properties'][result.elements])
+    model = model_classes()[data['model_type']].from_arrays(
+        data['coords'], data['connectivity'], data['properties'], data['fixed'])
+    return model, data['loads']
@@ -0,0 +1,248 @@
+"""
+Binary model format.
+
+A model is stored in a directory of .npy files and a header.json:
+
+    header.json         model type, number of DOFs per node, the settings of the model (see Model.SETTINGS) and the
+                        shapes and dtypes of the arrays
+    coords.npy          (n_nodes, 2 or 3) float64 node coordinates, the node IDs are the row numbers
+    fixed.npy           (n_nodes, ND) bool, the supported DOFs
+    connectivity.npy    (n_elements, n_element_nodes) int64 node numbers of the elements
+    sections.npy        (n_sections, n_properties) float64 table of the element properties, in the order of the
+                        element tuples of the model, e.g. (A, E, ro) for trusses
+    section.npy         (n_elements,) int64 row of the section table of each element
+    loads.npy           (n_cases, n_dofs) float64 global load vectors, optional
+
+The arrays are read with numpy memory mapping, so opening a model costs nothing and the arrays are not copied.
+ModelWriter writes the arrays in chunks; the .npy headers have a fixed size and are completed when the writer is closed.
+
+Usage:
+with ModelWriter('model', 'truss', ND=3) as writer:
+    writer.add_nodes(coords, fixed)
+    writer.set_sections([[A, E, ro]])
+    writer.add_elements(connectivity, section)
+model = load_model('model')
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+
+FORMAT = 'fem-model'
+VERSION = 1
+
+HEADER_SIZE = 128  # bytes of each .npy header, large enough for any final shape
+
+ARRAYS = ('coords', 'fixed', 'connectivity', 'sections', 'section', 'loads')
+
+
+def model_classes() -> dict:
+    """The model classes by type name."""
+    from source.OneD.truss.truss import TrussModel
+    from source.OneD.beam.beam import BeamModel
+    from source.OneD.frame.spatial_frame import SpatialFrameModel
+    from source.TwoD.PlaneQuad.plane_quad import PlaneQuadModel
+    return {'truss': TrussModel, 'beam': BeamModel, 'frame': SpatialFrameModel, 'plate': PlaneQuadModel}
+
+
+def model_type(model) -> str:
+    """The type name of a model, see model_classes."""
+    for name, cls in model_classes().items():
+        if type(model) is cls:
+            return name
+    raise ValueError(f"Unknown model class {type(model).__name__}.")
+
+
+def _npy_header(dtype: np.dtype, shape: tuple) -> bytes:
+    """A version 1.0 .npy header padded to HEADER_SIZE bytes."""
+    header = repr({'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': tuple(shape)})
+    # magic string (6), version (2) and header length (2) are followed by the header, ended with a newline
+    n = HEADER_SIZE - 10
+    if len(header) + 1 > n:
+        raise ValueError(f"The shape {shape} does not fit into the .npy header.")
+    header = header.ljust(n - 1) + '\n'
+    return np.lib.format.MAGIC_PREFIX + bytes([1, 0]) + n.to_bytes(2, 'little') + header.encode('latin1')
+
+
+class _ArrayStream:
+    """An .npy file written row block by row block, the number of rows is completed on close."""
+
+    def __init__(self, path: Path, dtype, row_shape: tuple):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.row_shape = tuple(row_shape)
+        self.n_rows = 0
+        self.file = open(path, 'wb')
+        self.file.write(_npy_header(self.dtype, (0, *self.row_shape)))
+
+    def append(self, rows: np.array):
+        rows = np.ascontiguousarray(rows, dtype=self.dtype)
+        if rows.shape[1:] != self.row_shape:
+            raise ValueError(f"{self.path.stem}: rows of shape {self.row_shape} expected, got {rows.shape[1:]}.")
+        self.file.write(rows.tobytes())
+        self.n_rows += len(rows)
+
+    @property
+    def shape(self) -> tuple:
+        return (self.n_rows, *self.row_shape)
+
+    def close(self):
+        self.file.seek(0)
+        self.file.write(_npy_header(self.dtype, self.shape))
+        self.file.close()
+
+
+class ModelWriter:
+    """
+    Streaming writer of the binary model format.
+
+    :param path: The model directory, created if it does not exist.
+    :param model_type: 'truss', 'beam', 'frame' or 'plate'.
+    :param ND: Number of DOFs per node.
+    :param dim: Number of coordinates per node.
+    :param n_element_nodes: Number of nodes per element.
+    :param settings: The settings of the model, see Model.SETTINGS, numbers only.
+    """
+
+    def __init__(self, path, model_type: str, ND: int, dim: int = 3, n_element_nodes: int = 2,
+                 settings: dict = None):
+        if model_type not in model_classes():
+            raise ValueError(f"Unknown model type {model_type}.")
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.model_type = model_type
+        self.ND = ND
+        self.dim = dim
+        self.n_element_nodes = n_element_nodes
+        self.settings = {} if settings is None else settings
+        self._streams = {}
+
+    def _stream(self, name: str, dtype, row_shape: tuple) -> _ArrayStream:
+        if name not in self._streams:
+            self._streams[name] = _ArrayStream(self.path / f'{name}.npy', dtype, row_shape)
+        return self._streams[name]
+
+    def add_nodes(self, coords: np.array, fixed: np.array = None):
+        """
+        Appends nodes, their IDs continue the row numbers.
+
+        :param coords: (n, dim) node coordinates.
+        :param fixed: Optional (n, ND) boolean array of the supported DOFs, no supports by default.
+        """
+        coords = np.asarray(coords, dtype=float).reshape(-1, self.dim)
+        fixed = np.zeros((len(coords), self.ND), dtype=bool) if fixed is None else fixed
+        self._stream('coords', np.float64, (self.dim,)).append(coords)
+        self._stream('fixed', np.bool_, (self.ND,)).append(fixed)
+
+    def set_sections(self, sections: np.array):
+        """
+        Sets the table of element properties.
+
+        :param sections: (n_sections, n_properties) array, see the module docstring.
+        """
+        sections = np.atleast_2d(np.asarray(sections, dtype=float))
+        self._stream('sections', np.float64, sections.shape[1:]).append(sections)
+
+    def add_elements(self, connectivity: np.array, section: np.array = 0):
+        """
+        Appends elements.
+
+        :param connectivity: (n, n_element_nodes) node numbers.
+        :param section: Row of the section table of each element, or one row for all.
+        """
+        connectivity = np.asarray(connectivity, dtype=np.int64).reshape(-1, self.n_element_nodes)
+        section = np.broadcast_to(np.asarray(section, dtype=np.int64), (len(connectivity),))
+        self._stream('connectivity', np.int64, (self.n_element_nodes,)).append(connectivity)
+        self._stream('section', np.int64, ()).append(section)
+
+    def add_load_case(self, F: np.array):
+        """
+        Appends a load case.
+
+        :param F: Global load vector, or (n_cases, n_dofs) array.
+        """
+        F = np.asarray(F, dtype=float)
+        self._stream('loads', np.float64, F.shape[-1:]).append(F.reshape(-1, F.shape[-1]))
+
+    def close(self):
+        for name in ('coords', 'connectivity', 'sections'):
+            if name not in self._streams:
+                raise ValueError(f"The model has no {name}.")
+        for stream in self._streams.values():
+            stream.close()
+        header = {
+            'format': FORMAT,
+            'version': VERSION,
+            'model_type': self.model_type,
+            'ND': self.ND,
+            'settings': self.settings,
+            'arrays': {name: {'dtype': x.dtype.str, 'shape': list(x.shape)} for name, x in self._streams.items()},
+        }
+        with open(self.path / 'header.json', 'w') as f:
+            json.dump(header, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.close()
+        else:
+            for stream in self._streams.values():
+                stream.file.close()
+
+
+def write_model(path, model, loads: np.array = None):
+    """
+    Writes a model in the binary format. Every element gets its own row in the section table.
+
+    :param path: The model directory.
+    :param model: The model.
+    :param loads: Optional global load vector or (n_cases, n_dofs) array.
+    """
+    arrays = model.to_arrays()
+    with ModelWriter(path, model_type(model), model.ND, dim=arrays['coords'].shape[1],
+                     n_element_nodes=arrays['connectivity'].shape[1],
+                     settings={name: np.asarray(x).item() for name, x in model.settings().items()}) as writer:
+        writer.add_nodes(arrays['coords'], arrays['fixed'])
+        writer.set_sections(arrays['properties'])
+        writer.add_elements(arrays['connectivity'], np.arange(len(arrays['connectivity'])))
+        if loads is not None:
+            writer.add_load_case(loads)
+
+
+def read_model(path, mmap_mode: str = 'r') -> dict:
+    """
+    Opens a model in the binary format.
+
+    :param path: The model directory.
+    :param mmap_mode: See numpy.load, None reads the arrays into memory.
+    :return: dict with the header and the arrays (memory mapped by default).
+    """
+    path = Path(path)
+    with open(path / 'header.json') as f:
+        header = json.load(f)
+    if header.get('format') != FORMAT or header.get('version', 0) > VERSION:
+        raise ValueError(f"{path} is not a model in a supported binary format.")
+    arrays = {name: np.load(path / f'{name}.npy', mmap_mode=mmap_mode) for name in header['arrays']}
+    return {'header': header, **arrays}
+
+
+def load_model(path, model_class=None):
+    """
+    Creates a model from the binary format.
+
+    :param path: The model directory.
+    :param model_class: Optional, by default the class of the model type in the header.
+    :return: The model.
+    """
+    data = read_model(path)
+    if model_class is None:
+        model_class = model_classes()[data['header']['model_type']]
+    return model_class.from_arrays(
+        coords=data['coords'],
+        connectivity=data['connectivity'],
+        properties=data['sections'][data['section']],
+        supports=data['fixed'],
+        **data['header'].get('settings', {}),
+    )
@@ -0,0 +1,229 @@
+"""
+Export of models and results to VTK unstructured grid files (.vtu) for ParaView and other VTK viewers.
+
+The elements are written as VTK line cells. All arrays are stored as raw binary appended data, the XML header only
+holds their offsets. As the sizes of the arrays are known from their shapes, the offsets are computed first and the
+data is then streamed in chunks of rows straight from the arrays, which can be numpy memmaps. The mesh arrays are the
+cached arrays of the model, built once per model. A result history is read in blocks of steps: only one block and
+the results of one step (displacements and member forces) are in memory at a time.
+
+Time histories and mode shapes are written as one .vtu file per step and a .pvd collection file that indexes them.
+
+Usage:
+write_vtu('model.vtu', coords, connectivity, point_data={'displacement': u.reshape(-1, 3)})
+export_model('results', model, U, times=t)  # results/model.pvd and results/model_0000.vtu, ...
+"""
+from pathlib import Path
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+
+VTK_LINE = 3
+
+_VTK_TYPES = {
+    np.dtype(np.float32): 'Float32', np.dtype(np.float64): 'Float64',
+    np.dtype(np.int32): 'Int32', np.dtype(np.int64): 'Int64', np.dtype(np.uint8): 'UInt8',
+}
+
+
+class _Array:
+    """An array of the appended data, produced in chunks of rows."""
+
+    def __init__(self, name: str, array, n_components: int, dtype, n_rows: int):
+        self.name = name
+        self.array = array  # array like or a function (start, stop) -> rows
+        self.n_components = n_components
+        self.dtype = np.dtype(dtype)
+        self.n_rows = n_rows
+
+    @property
+    def nbytes(self) -> int:
+        return self.n_rows * self.n_components * self.dtype.itemsize
+
+    def chunks(self, chunk_size: int):
+        for start in range(0, self.n_rows, chunk_size):
+            stop = min(start + chunk_size, self.n_rows)
+            rows = self.array(start, stop) if callable(self.array) else self.array[start:stop]
+            rows = np.asarray(rows, dtype=self.dtype).reshape(stop - start, -1)
+            if rows.shape[1] < self.n_components:
+                # e.g. 2D coordinates, VTK points always have 3 components
+                rows = np.pad(rows, ((0, 0), (0, self.n_components - rows.shape[1])))
+            yield np.ascontiguousarray(rows, dtype=self.dtype.newbyteorder('<'))
+
+    def xml(self, offset: int) -> str:
+        name = f' Name={quoteattr(self.name)}' if self.name else ''
+        return (f'<DataArray type="{_VTK_TYPES[self.dtype]}"{name} NumberOfComponents="{self.n_components}" '
+                f'format="appended" offset="{offset}"/>')
+
+
+def _data_array(name: str, array, n_rows: int) -> _Array:
+    shape = np.shape(array)
+    if shape[0] != n_rows:
+        raise ValueError(f"{name}: {n_rows} rows expected, got {shape[0]}.")
+    n_components = int(np.prod(shape[1:], dtype=int))
+    dtype = np.float64 if np.issubdtype(np.asarray(array[:0]).dtype, np.floating) else np.int64
+    return _Array(name, array, n_components, dtype, n_rows)
+
+
+def write_vtu(path, coords, connectivity, point_data: dict = None, cell_data: dict = None,
+              chunk_size: int = 2 ** 18):
+    """
+    Writes a line element mesh with point and cell data to a binary .vtu file.
+
+    :param path: The file name.
+    :param coords: (n_nodes, 2 or 3) node coordinates.
+    :param connectivity: (n_elements, 2) node numbers of the elements, the row numbers of coords.
+    :param point_data: Arrays with one row per node, (n_nodes,) or (n_nodes, n_components).
+    :param cell_data: Arrays with one row per element, (n_elements,) or (n_elements, n_components).
+    :param chunk_size: Number of rows written at once.
+    """
+    n_nodes, n_elements = len(coords), len(connectivity)
+    point_data = {name: _data_array(name, x, n_nodes) for name, x in (point_data or {}).items()}
+    cell_data = {name: _data_array(name, x, n_elements) for name, x in (cell_data or {}).items()}
+
+    points = _Array('', coords, 3, np.float64, n_nodes)
+    cells = [
+        _Array('connectivity', connectivity, 2, np.int64, n_elements),
+        _Array('offsets', lambda start, stop: 2 * np.arange(start + 1, stop + 1), 1, np.int64, n_elements),
+        _Array('types', lambda start, stop: np.full(stop - start, VTK_LINE), 1, np.uint8, n_elements),
+    ]
+    arrays = [points, *cells, *point_data.values(), *cell_data.values()]
+
+    # each array in the appended data is preceded by its size as UInt64
+    offsets = np.cumsum([0] + [8 + x.nbytes for x in arrays[:-1]]).tolist()
+    offset = dict(zip(map(id, arrays), offsets))
+
+    def section(tag: str, items: dict) -> str:
+        if not items:
+            return ''
+        return f'<{tag}>\n' + ''.join(f'  {x.xml(offset[id(x)])}\n' for x in items.values()) + f'</{tag}>\n'
+
+    header = (
+        '<?xml version="1.0"?>\n'
+        '<VTKFile type="UnstructuredGrid" version="1.0" byte_order="LittleEndian" header_type="UInt64">\n'
+        '<UnstructuredGrid>\n'
+        f'<Piece NumberOfPoints="{n_nodes}" NumberOfCells="{n_elements}">\n'
+        f'<Points>\n  {points.xml(offset[id(points)])}\n</Points>\n'
+        + section('Cells', {x.name: x for x in cells})
+        + section('PointData', point_data)
+        + section('CellData', cell_data)
+        + '</Piece>\n</UnstructuredGrid>\n<AppendedData encoding="raw">\n_'
+    )
+
+    with open(path, 'wb') as f:
+        f.write(header.encode())
+        for array in arrays:
+            f.write(np.uint64(array.nbytes).astype('<u8').tobytes())
+            for chunk in array.chunks(chunk_size):
+                f.write(chunk.tobytes())
+        f.write(b'\n</AppendedData>\n</VTKFile>\n')
+
+
+def write_pvd(path, files: list, times: list):
+    """
+    Writes a .pvd collection of .vtu files, e.g. the steps of a time history.
+
+    :param path: The file name.
+    :param files: The .vtu file names, relative to the .pvd file.
+    :param times: The time (or e.g. the frequency) of each file.
+    """
+    lines = ['<?xml version="1.0"?>',
+             '<VTKFile type="Collection" version="1.0" byte_order="LittleEndian">',
+             '<Collection>']
+    lines += [f'  <DataSet timestep="{t!r}" part="0" file={quoteattr(str(x))}/>' for x, t in zip(files, times)]
+    lines += ['</Collection>', '</VTKFile>', '']
+    Path(path).write_text('\n'.join(lines))
+
+
+def nodal_results(model, u: np.array) -> dict:
+    """
+    The displacement vector u as point data: the translations as 'displacement' (n_nodes, 3) and, for frames and beams,
+    the rotations as 'rotation' (n_nodes, 3).
+
+    :param model: A TrussModel, BeamModel or SpatialFrameModel.
+    :param u: Global displacement vector.
+    :return: dict of arrays.
+    """
+    from source.io.binary import model_type
+
+    U = np.asarray(u, dtype=float).reshape(len(model.nodes), model.ND)
+    kind = model_type(model)
+    if kind == 'truss':
+        return {'displacement': np.pad(U, ((0, 0), (0, 3 - model.ND)))}
+    if kind == 'frame':
+        return {'displacement': U[:, :3], 'rotation': U[:, 3:]}
+    # beams: deflection in y and rotation about z
+    zeros = np.zeros(len(U))
+    return {'displacement': np.column_stack((zeros, U[:, 0], zeros)),
+            'rotation': np.column_stack((zeros, zeros, U[:, 1]))}
+
+
+def member_results(model, u: np.array) -> dict:
+    """
+    The axial forces of truss and frame elements as cell data 'N', an empty dict for other models.
+
+    :param model: The model.
+    :param u: Global displacement vector.
+    :return: dict of arrays.
+    """
+    if hasattr(model, 'end_forces'):
+        # the axial force at node j, tension is positive
+        return {'N': model.end_forces(u)[0, :, 6]}
+    if hasattr(model, 'axial_forces'):
+        return {'N': model.axial_forces(u)}
+    return {}
+
+
+def export_model(directory, model, U: np.array = None, times=None, name: str = 'model',
+                 chunk_size: int = 2 ** 18, block_bytes: int = 2 ** 27) -> Path:
+    """
+    Writes a model and its results to .vtu files.
+
+    The mesh arrays are the cached arrays of the model, the connectivity follows from the element DOF indices. A
+    history U is read in blocks of steps, so a memmap is read once and at most one block is in memory. For the
+    fastest export store the history step-major, one displacement vector per row of an (n_steps, n_dofs) file, and
+    pass its transpose: each step is then one contiguous read.
+
+    :param directory: The output directory, created if it does not exist.
+    :param model: The model.
+    :param U: Optional global displacement vector, or (n_dofs, n_steps) array with one displacement vector per
+              column, e.g. a time history or the mode shapes (may be a memmap).
+    :param times: The time of each column of U, e.g. the times or the frequencies; a .pvd file is written if given.
+    :param name: Base name of the files.
+    :param chunk_size: Number of rows written at once.
+    :param block_bytes: Size of the blocks of steps read from U at once.
+    :return: The path of the .vtu file, or of the .pvd file for several steps.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    coords, connectivity = model.node_coords(), model.connectivity()
+    cell_data = {'properties': model.element_properties()}
+
+    if U is None or np.ndim(U) == 1 and times is None:
+        point_data = {} if U is None else nodal_results(model, U)
+        member_data = {} if U is None else member_results(model, U)
+        path = directory / f'{name}.vtu'
+        write_vtu(path, coords, connectivity, point_data, {**cell_data, **member_data}, chunk_size)
+        return path
+
+    if np.ndim(U) == 1:
+        U = np.asarray(U)[:, None]
+    n_dofs, n_steps = U.shape
+    times = np.arange(n_steps) if times is None else np.asarray(times)
+    # a step-major history (the transpose of a C ordered array) is read step by step, each step is contiguous;
+    # otherwise the steps are read in blocks, every row of the file is then read once per block
+    step_major = U.strides[0] < U.strides[1] if isinstance(U, np.ndarray) else False
+    block = 1 if step_major else int(np.clip(block_bytes // (8 * n_dofs), 1, n_steps))
+    files = []
+    for start in range(0, n_steps, block):
+        stop = min(start + block, n_steps)
+        # one copy of the block, step by step in rows
+        steps = np.array(U[:, start:stop], dtype=float).T
+        for step, u in zip(range(start, stop), steps):
+            file = f'{name}_{step:04d}.vtu'
+            write_vtu(directory / file, coords, connectivity, nodal_results(model, u),
+                      {**cell_data, **member_results(model, u)}, chunk_size)
+            files.append(file)
+    path = directory / f'{name}.pvd'
+    write_pvd(path, files, times.tolist())
+    return path
@@ -0,0 +1,126 @@
+"""
+Merging of coincident nodes, e.g. after stitching imported sub-meshes together.
+
+Sub-meshes that share a boundary usually each have their own copy of the boundary nodes. Unless the copies are merged
+the parts are not connected: the model has duplicate nodes and hidden mechanisms. weld_nodes finds all node pairs
+closer than a tolerance with a KD-tree over the coordinate array (O(n log n), no Python loop over the nodes), merges
+each group of coincident nodes into its lowest numbered node and renumbers the connectivity, the supports and the loads.
+
+Usage:
+result = weld_nodes(coords, connectivity, tol=1e-6, fixed=fixed)
+print(result)
+model = TrussModel.from_arrays(result.coords, result.connectivity, properties[result.elements], result.fixed)
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class WeldResult:
+    """The welded mesh and what was merged."""
+
+    coords: np.ndarray  # (n_welded, dim) node coordinates
+    connectivity: np.ndarray  # (n_kept, n_element_nodes) node numbers of the welded mesh
+    node_map: np.ndarray  # (n_nodes,) the welded node number of each original node
+    elements: np.ndarray  # original numbers of the kept elements, use it to select the element properties
+    collapsed_elements: np.ndarray  # original numbers of the removed elements, all their nodes were merged into one
+    duplicate_elements: np.ndarray  # original numbers of kept elements with the same nodes as an earlier element
+    fixed: np.ndarray = None  # (n_welded, ND) supported DOFs, a DOF is fixed if it is fixed at any merged node
+    loads: np.ndarray = None  # global load vector(s) of the welded mesh, the loads of merged nodes are summed
+
+    @property
+    def merged(self) -> np.ndarray:
+        """The original nodes merged into another node."""
+        keep = np.zeros(len(self.node_map), dtype=bool)
+        # the first (lowest numbered) node of each group is kept
+        _, index = np.unique(self.node_map, return_index=True)
+        keep[index] = True
+        return np.flatnonzero(~keep)
+
+    def groups(self) -> list:
+        """The original node numbers of each group of merged nodes, only groups of two or more nodes."""
+        counts = np.bincount(self.node_map, minlength=len(self.coords))
+        nodes = np.flatnonzero(counts[self.node_map] > 1)
+        order = np.argsort(self.node_map[nodes], kind='stable')
+        nodes = nodes[order]
+        return np.split(nodes, np.flatnonzero(np.diff(self.node_map[nodes])) + 1) if len(nodes) else []
+
+    def __str__(self) -> str:
+        n_nodes = len(self.node_map)
+        return (f'{n_nodes} nodes welded to {len(self.coords)} ({n_nodes - len(self.coords)} merged), '
+                f'{len(self.collapsed_elements)} collapsed element(s) removed, '
+                f'{len(self.duplicate_elements)} duplicate element(s)')
+
+
+def _sum_by_node(values: np.array, node_map: np.array, n_nodes: int) -> np.array:
+    """Sums the rows of (n_nodes, ...) values by the welded node."""
+    flat = values.reshape(len(values), -1)
+    out = np.empty((n_nodes, flat.shape[1]))
+    for column in range(flat.shape[1]):
+        out[:, column] = np.bincount(node_map, weights=flat[:, column], minlength=n_nodes)
+    return out.reshape((n_nodes, ) + values.shape[1:])
+
+
+def weld_nodes(coords: np.array, connectivity: np.array, tol: float = 1e-8, fixed: np.array = None,
+               loads: np.array = None) -> WeldResult:
+    """
+    Merges the nodes closer than tol. Nodes are merged transitively: a chain of nodes with gaps below tol becomes one
+    node. The merged node keeps the coordinates of the lowest numbered node of its group, the order of the remaining
+    nodes is kept.
+
+    :param coords: (n_nodes, dim) node coordinates.
+    :param connectivity: (n_elements, n_element_nodes) node numbers of the elements.
+    :param tol: Distance below which nodes are merged.
+    :param fixed: Optional (n_nodes, ND) boolean array of the supported DOFs.
+    :param loads: Optional global load vector (n_nodes * ND,) or (n_nodes * ND, n_cases) array of load vectors.
+    :return: The welded mesh.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+    from scipy.spatial import cKDTree
+
+    coords = np.asarray(coords, dtype=float)
+    connectivity = np.asarray(connectivity, dtype=np.int64)
+    n = len(coords)
+
+    pairs = cKDTree(coords).query_pairs(tol, output_type='ndarray')
+    if len(pairs):
+        graph = coo_matrix((np.ones(len(pairs), dtype=bool), (pairs[:, 0], pairs[:, 1])), shape=(n, n))
+        _, labels = connected_components(graph, directed=False)
+    else:
+        labels = np.arange(n)
+
+    # the lowest node of each group represents it, the new numbers follow the order of the representatives
+    _, first = np.unique(labels, return_index=True)
+    order = np.argsort(first)
+    number = np.empty(len(first), dtype=np.int64)
+    number[order] = np.arange(len(first))
+    node_map = number[labels]
+    n_welded = len(first)
+
+    elements = node_map[connectivity]
+    sorted_nodes = np.sort(elements, axis=1)
+    collapsed = (sorted_nodes[:, 1:] == sorted_nodes[:, :-1]).all(axis=1)
+    kept = np.flatnonzero(~collapsed)
+    # elements with the same set of nodes as an earlier one
+    _, unique = np.unique(sorted_nodes[kept], axis=0, return_index=True)
+    duplicate = np.ones(len(kept), dtype=bool)
+    duplicate[unique] = False
+
+    result = WeldResult(
+        coords=coords[first[order]],
+        connectivity=elements[kept],
+        node_map=node_map,
+        elements=kept,
+        collapsed_elements=np.flatnonzero(collapsed),
+        duplicate_elements=kept[duplicate],
+    )
+    if fixed is not None:
+        fixed = np.asarray(fixed, dtype=bool)
+        result.fixed = _sum_by_node(fixed.astype(float), node_map, n_welded) > 0
+    if loads is not None:
+        loads = np.asarray(loads, dtype=float)
+        by_node = loads.reshape((n, -1) + loads.shape[1:])
+        result.loads = _sum_by_node(by_node, node_map, n_welded).reshape((-1, ) + loads.shape[1:])
+    return result
@@ -2,11 +2,11 @@ from dataclasses import dataclass
 
 import numpy as np
 
-from source.utils import IDMixin
+from source.utils import IDMixin, CacheMixin, derived_property
 
 
 @dataclass
-class Node(IDMixin):
+class Node(CacheMixin, IDMixin):
 
     x: float = 0
     y: float = 0
@@ -36,9 +36,9 @@ class Node(IDMixin):
 
         return ((self.x - other.x) ** 2 + (self.y - other.y) ** 2 + (self.z - other.z) ** 2) ** 0.5
 
-    @property
+    @derived_property
     def coords(self) -> np.array:
-        """Return the coordinates of the node as a numpy array."""
+        """Return the coordinates of the node as a (read-only) numpy array."""
         if self.z is None:
             return np.array([self.x, self.y])
         else:
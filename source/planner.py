@@ -0,0 +1,272 @@
+"""
+Planning of linear static solves: estimates of the memory and the time of the solver backends before anything large
+is allocated, and the choice of the backend.
+
+The estimates follow from the number of DOFs and the sparsity pattern of the free DOFs (so from the connectivity
+only, no stiffness matrix is assembled):
+
+- dense: Model.solve with the full n_dofs x n_dofs matrix, LU factorization in 2/3 n^3 flops,
+- banded: Cholesky factorization of the band of the reverse Cuthill-McKee reordered matrix, n b^2 flops,
+- sparse: sparse LU of the reordered matrix, the factors fill the envelope (profile) of the reordered matrix,
+- iterative: preconditioned conjugate gradients, only the sparse matrix and a few vectors are stored.
+
+The estimates are rough (the flop rates are constants of this module), they are meant to choose a backend and to
+refuse a solve that cannot fit into memory, not to predict the run time exactly.
+
+Usage:
+plan = model.plan_solve(memory_budget=2 ** 30)
+print(plan)
+u, reactions = model.solve(F)  # plans itself, raises InsufficientMemoryError if no backend fits
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Dict
+
+import numpy as np
+
+BACKENDS = ('dense', 'banded', 'sparse', 'iterative')
+
+# models up to this number of DOFs are always solved dense, the planning would cost more than it saves
+DENSE_LIMIT = 500
+# the share of the available memory used by default
+MEMORY_FRACTION = 0.5
+# rough flop rates of the dense LAPACK kernels, of the sparse and banded factorizations and of the sparse products
+DENSE_FLOPS = 2e10
+FACTOR_FLOPS = 5e9
+PRODUCT_FLOPS = 1e9
+# assumed number of conjugate gradient iterations per sqrt(n), the true number depends on the conditioning
+CG_ITERATIONS = 10
+
+
+class InsufficientMemoryError(MemoryError):
+    """No backend fits into the memory budget; the plan holds the estimates."""
+
+    def __init__(self, plan: 'SolvePlan'):
+        super().__init__(f"The solve needs more memory than the budget allows, it is not started.\n{plan}")
+        self.plan = plan
+
+
+@dataclass
+class Estimate:
+    """The estimated resources of a backend."""
+
+    memory: float  # peak memory in bytes
+    time: float  # wall time in seconds
+
+
+@dataclass
+class SolvePlan:
+    """The estimates of all backends and the chosen one."""
+
+    n_dofs: int  # number of DOFs of the model
+    n_free: int  # number of free DOFs
+    n_rhs: int  # number of load cases
+    memory_budget: float  # in bytes, None for no limit
+    backend: str = None  # the chosen backend, None if none fits
+    reason: str = ''  # why the backend was chosen
+    nnz: int = None  # stored entries of the free DOF matrix, None if the pattern was not analysed
+    bandwidth: int = None  # half bandwidth after the reordering
+    envelope: int = None  # entries of the lower envelope after the reordering, the predicted Cholesky fill
+    estimates: Dict[str, Estimate] = field(default_factory=dict)
+
+    def fits(self, backend: str) -> bool:
+        """Whether the estimated memory of the backend is within the budget."""
+        return self.memory_budget is None or self.estimates[backend].memory <= self.memory_budget
+
+    def __str__(self) -> str:
+        def size(x):
+            return 'no limit' if x is None else f'{x / 2 ** 20:.1f} MiB'
+
+        lines = [f'{self.n_dofs} DOFs ({self.n_free} free), {self.n_rhs} load case(s), '
+                 f'memory budget {size(self.memory_budget)}']
+        if self.nnz is not None:
+            lines.append(f'nnz {self.nnz}, bandwidth {self.bandwidth}, predicted fill {self.envelope}')
+        for name, estimate in self.estimates.items():
+            mark = '*' if name == self.backend else ' ' if self.fits(name) else 'x'
+            lines.append(f' {mark} {name:<10} {size(estimate.memory):>14} {estimate.time:12.3g} s')
+        lines.append(f'backend: {self.backend} ({self.reason})')
+        return '\n'.join(lines)
+
+
+def available_memory() -> int:
+    """The available physical memory in bytes, None if it cannot be determined."""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def profile(pattern) -> tuple:
+    """
+    The half bandwidth and the row widths of the lower envelope of the reordered pattern.
+
+    :param pattern: source.sparse.SparsePattern
+    :return: bandwidth, (n,) array of the number of entries left of the diagonal within the envelope of each row
+    """
+    _, indptr, indices, _ = pattern.ordering
+    n = pattern.n
+    widths = np.zeros(n, dtype=np.int64)
+    rows = np.flatnonzero(np.diff(indptr))
+    if len(rows):
+        # the column indices are sorted, so the first one of a row is its leftmost entry
+        widths[rows] = np.maximum(rows - indices[indptr[rows]], 0)
+    return int(widths.max(initial=0)), widths
+
+
+def estimate(n_dofs: int, n_rhs: int = 1, pattern=None) -> Dict[str, Estimate]:
+    """
+    The estimates of the backends, the sparse backends only if the pattern of the free DOFs is given.
+
+    :param n_dofs: Number of DOFs of the model.
+    :param n_rhs: Number of load cases.
+    :param pattern: Optional source.sparse.SparsePattern of the free DOFs.
+    :return: dict backend -> Estimate
+    """
+    # load, displacement and reaction vectors
+    vectors = 3 * 8 * n_dofs * n_rhs
+    # the full matrix and the copy factorized by LAPACK
+    estimates = {'dense': Estimate(memory=2 * 8 * n_dofs ** 2 + vectors,
+                                   time=(2 / 3 * n_dofs ** 3 + 2 * n_dofs ** 2 * n_rhs) / DENSE_FLOPS)}
+    if pattern is None:
+        return estimates
+
+    n, nnz = pattern.n, pattern.nnz
+    bandwidth, widths = profile(pattern)
+    envelope = int(widths.sum())
+    # the pattern (data, indices, assembly slots) and the element matrix stack, needed by all sparse backends
+    matrix = 8 * nnz + 8 * nnz + 8 * len(pattern.slots) * 2
+    estimates['banded'] = Estimate(
+        memory=matrix + 8 * (bandwidth + 1) * n + vectors,
+        time=(n * bandwidth ** 2 + 4 * n * bandwidth * n_rhs) / FACTOR_FLOPS)
+    # L and U, values and row indices, within the envelope
+    factors = 2 * (envelope + n)
+    estimates['sparse'] = Estimate(
+        memory=matrix + 12 * factors + vectors,
+        time=(2 * float(np.square(widths + 1.0).sum()) + 2 * factors * n_rhs) / FACTOR_FLOPS)
+    iterations = min(n, CG_ITERATIONS * np.sqrt(n))
+    estimates['iterative'] = Estimate(
+        memory=matrix + 5 * 8 * n + vectors,
+        time=iterations * (2 * nnz + 10 * n) * n_rhs / PRODUCT_FLOPS)
+    return estimates
+
+
+def plan_solve(model, memory_budget: float = None, backend: str = 'auto', n_rhs: int = 1) -> SolvePlan:
+    """
+    Estimates the resources of a linear static solve of the model and chooses the backend: the fastest one within
+    the memory budget. Small models are always solved dense.
+
+    :param model: The model.
+    :param memory_budget: Memory budget in bytes, by default MEMORY_FRACTION of the available memory.
+    :param backend: 'auto' or one of BACKENDS to force a backend, it still has to fit into the budget.
+    :param n_rhs: Number of load cases.
+    :return: The plan, its backend is None if no backend fits.
+    """
+    if backend != 'auto' and backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, use 'auto' or one of {BACKENDS}.")
+    if memory_budget is None:
+        available = available_memory()
+        memory_budget = None if available is None else MEMORY_FRACTION * available
+
+    n_dofs = model.ND * len(model.nodes)
+    free = model.free_dofs()
+    plan = SolvePlan(n_dofs=n_dofs, n_free=int(free.sum()), n_rhs=n_rhs, memory_budget=memory_budget)
+
+    if backend in ('auto', 'dense') and n_dofs <= DENSE_LIMIT:
+        plan.estimates = estimate(n_dofs, n_rhs)
+        if plan.fits('dense'):
+            plan.backend, plan.reason = 'dense', 'small model' if backend == 'auto' else 'requested'
+            return plan
+
+    pattern = model.sparse_pattern(free)
+    plan.estimates = estimate(n_dofs, n_rhs, pattern)
+    plan.nnz = pattern.nnz
+    plan.bandwidth, widths = profile(pattern)
+    plan.envelope = int(widths.sum())
+
+    candidates = BACKENDS if backend == 'auto' else (backend, )
+    fitting = [x for x in candidates if plan.fits(x)]
+    if fitting:
+        plan.backend = min(fitting, key=lambda x: plan.estimates[x].time)
+        plan.reason = 'requested' if backend != 'auto' else 'fastest within the memory budget'
+    else:
+        plan.reason = 'no backend fits into the memory budget'
+    return plan
+
+
+class BandedCholesky:
+    """The banded Cholesky factorization of a reordered symmetric positive definite matrix."""
+
+    def __init__(self, pattern, data: np.array):
+        """
+        :param pattern: source.sparse.SparsePattern of the matrix.
+        :param data: The CSR data array of the matrix.
+        """
+        from scipy.linalg import cholesky_banded
+
+        perm, indptr, indices, data_map = pattern.ordering
+        rows = np.repeat(np.arange(pattern.n), np.diff(indptr))
+        upper = indices >= rows
+        bandwidth = int((indices - rows).max(initial=0))
+        # upper form of the symmetric band storage: ab[bandwidth + i - j, j] = A[i, j] for i <= j
+        ab = np.zeros((bandwidth + 1, pattern.n))
+        ab[bandwidth + rows[upper] - indices[upper], indices[upper]] = np.asarray(data)[data_map][upper]
+        self.perm = perm
+        self.factor = cholesky_banded(ab, overwrite_ab=True, check_finite=False)
+
+    def solve(self, F: np.array) -> np.array:
+        """
+        :param F: Right hand side, a vector or one right hand side per column.
+        :return: The solution, same shape as F.
+        """
+        from scipy.linalg import cho_solve_banded
+
+        F = np.asarray(F, dtype=float)
+        x = np.empty_like(F)
+        x[self.perm] = cho_solve_banded((self.factor, False), F[self.perm], check_finite=False)
+        return x
+
+
+def solve_banded(pattern, data: np.array, F: np.array) -> np.array:
+    """
+    Solves A x = F by a banded Cholesky factorization of the reordered matrix.
+
+    :param pattern: source.sparse.SparsePattern of A.
+    :param data: The CSR data array of A.
+    :param F: Right hand side, a vector or one right hand side per column.
+    :return: The solution, same shape as F.
+    """
+    return BandedCholesky(pattern, data).solve(F)
+
+
+def solve_iterative(pattern, data: np.array, F: np.array, rtol: float = 1e-10, maxiter: int = None) -> np.array:
+    """
+    Solves A x = F by conjugate gradients with a Jacobi preconditioner.
+
+    :param pattern: source.sparse.SparsePattern of A.
+    :param data: The CSR data array of A.
+    :param F: Right hand side, a vector or one right hand side per column.
+    :param rtol: Relative tolerance of the residual.
+    :param maxiter: Maximum number of iterations per right hand side, by default 10 n.
+    :return: The solution, same shape as F.
+    """
+    from scipy.sparse.linalg import LinearOperator, cg
+
+    A = pattern.matrix(data)
+    inverse_diagonal = 1 / A.diagonal()
+    M = LinearOperator(A.shape, matvec=lambda x: inverse_diagonal * x, dtype=float)
+
+    F = np.asarray(F, dtype=float)
+    b = F.reshape(len(F), -1)
+    x = np.empty_like(b)
+    for k in range(b.shape[1]):
+        x[:, k], info = cg(A, b[:, k], rtol=rtol, maxiter=maxiter or 10 * pattern.n, M=M)
+        if info > 0:
+            raise np.linalg.LinAlgError(f"Conjugate gradients did not converge in {info} iterations.")
+    return x.reshape(F.shape)
@@ -0,0 +1,149 @@
+"""
+Plotting of line element models with matplotlib collections.
+
+All elements are drawn by one LineCollection (2D) or Line3DCollection (3D), the segment coordinates are built as one
+(n_elements, 2, dim) array, so the plotting time hardly depends on the number of elements. Very large models are
+decimated to max_segments elements.
+
+If a file name is given, the figure is rendered without pyplot (and so without a GUI backend) and saved, otherwise it
+is shown with pyplot.
+
+matplotlib is imported on first use only.
+"""
+import numpy as np
+
+
+def segments(coords: np.array, connectivity: np.array) -> np.array:
+    """
+    The end point coordinates of the elements.
+
+    :param coords: (n_nodes, dim) node coordinates.
+    :param connectivity: (n_elements, 2) node numbers.
+    :return: (n_elements, 2, dim) array.
+    """
+    return np.asarray(coords)[np.asarray(connectivity)]
+
+
+def decimate(n: int, max_count: int) -> slice:
+    """A slice selecting at most max_count of n items evenly."""
+    if max_count is None or n <= max_count:
+        return slice(None)
+    return slice(None, None, -(-n // max_count))
+
+
+def displacement_factor(coords: np.array, connectivity: np.array, displacements: np.array) -> float:
+    """The default scale of the displacements: the largest displacement is a tenth of the longest element."""
+    d = np.diff(segments(coords, connectivity), axis=1)
+    longest = np.sqrt((d ** 2).sum(axis=-1)).max()
+    largest = np.abs(displacements).max()
+    return longest / 10 / largest if largest > 0 else 1.0
+
+
+def new_axes(dim: int, ax=None, filename=None):
+    """
+    The axes to draw into: the given one, a new figure without pyplot if a file name is given or a pyplot figure.
+    """
+    if ax is not None:
+        return ax
+    if filename is not None:
+        from matplotlib.figure import Figure
+        fig = Figure()
+    else:
+        import matplotlib.pyplot as plt
+        fig = plt.figure()
+    return fig.add_subplot(111, projection='3d' if dim == 3 else None)
+
+
+def add_lines(ax, lines: np.array, values: np.array = None, cmap: str = 'coolwarm', **kwargs):
+    """
+    Adds the lines as one collection.
+
+    :param ax: The axes, 3D axes for 3D lines.
+    :param lines: (n_lines, n_points, 2 or 3) coordinates.
+    :param values: Optional value of each line, the lines are colored by it.
+    :param cmap: The colormap of the values.
+    :param kwargs: Passed to the collection, e.g. colors or linestyles.
+    :return: The collection.
+    """
+    if lines.shape[-1] == 3:
+        from mpl_toolkits.mplot3d.art3d import Line3DCollection
+        collection = Line3DCollection(lines, **kwargs)
+        ax.add_collection3d(collection)
+        lo, hi = lines.reshape(-1, 3).min(axis=0), lines.reshape(-1, 3).max(axis=0)
+        ax.auto_scale_xyz(*zip(lo, hi), had_data=True)
+    else:
+        from matplotlib.collections import LineCollection
+        collection = LineCollection(lines, **kwargs)
+        ax.add_collection(collection)
+        ax.autoscale_view()
+
+    if values is not None:
+        collection.set_array(np.asarray(values, dtype=float))
+        collection.set_cmap(cmap)
+        lim = np.abs(values).max() if len(values) else 1.0
+        # symmetric limits, so tension and compression get the colors of the two ends of a diverging colormap
+        collection.set_clim(-lim or -1.0, lim or 1.0)
+        ax.figure.colorbar(collection, ax=ax)
+    return collection
+
+
+def finish(ax, filename=None, title: str = None, show: bool = None):
+    """Saves the figure if a file name is given, otherwise shows it with pyplot (unless show is False)."""
+    if title is not None:
+        ax.set_title(title)
+    if filename is not None:
+        ax.figure.savefig(filename)
+    elif show is None or show:
+        import matplotlib.pyplot as plt
+        plt.show()
+    return ax
+
+
+def plot_lines(coords: np.array, connectivity: np.array, displacements: np.array = None, disp_factor: float = None,
+               values: np.array = None, ax=None, filename=None, title: str = None, max_segments: int = 200000,
+               max_nodes: int = 10000, cmap: str = 'coolwarm', show: bool = None):
+    """
+    Plots a line element model: the undeformed elements in black and, if displacements are given, the deformed
+    elements in red or colored by the values.
+
+    :param coords: (n_nodes, 2 or 3) node coordinates.
+    :param connectivity: (n_elements, 2) node numbers.
+    :param displacements: Optional (n_nodes, 2 or 3) nodal translations.
+    :param disp_factor: Scale of the displacements, see displacement_factor for the default.
+    :param values: Optional value of each element, e.g. the axial forces, the elements are colored by it.
+    :param ax: Optional axes to draw into.
+    :param filename: If given, the figure is rendered headless and saved to this file.
+    :param title: Optional title.
+    :param max_segments: Maximum number of elements drawn, larger models are decimated.
+    :param max_nodes: The nodes are marked only up to this number of nodes.
+    :param cmap: The colormap of the values.
+    :param show: Whether to show the figure with pyplot, by default if no file name is given.
+    :return: The axes.
+    """
+    coords = np.asarray(coords, dtype=float)
+    connectivity = np.asarray(connectivity)
+    dim = coords.shape[1]
+    ax = new_axes(dim, ax, filename)
+
+    selected = decimate(len(connectivity), max_segments)
+    connectivity = connectivity[selected]
+    if values is not None:
+        values = np.asarray(values)[selected]
+
+    deformed = values is not None and displacements is not None
+    add_lines(ax, segments(coords, connectivity), values=None if deformed else values, cmap=cmap,
+              colors='k' if values is None or deformed else None, linewidths=0.8)
+    if len(coords) <= max_nodes:
+        ax.scatter(*coords.T, c='k', s=4)
+
+    if displacements is not None:
+        displacements = np.asarray(displacements, dtype=float)
+        if disp_factor is None:
+            disp_factor = displacement_factor(coords, connectivity, displacements)
+        coords = coords + disp_factor * displacements
+        add_lines(ax, segments(coords, connectivity), values=values, cmap=cmap,
+                  colors='r' if values is None else None, linewidths=1.2)
+        if len(coords) <= max_nodes:
+            ax.scatter(*coords.T, c='r', s=4)
+
+    return finish(ax, filename, title, show)
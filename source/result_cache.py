@@ -0,0 +1,192 @@
+"""
+Content-addressed on-disk cache of analysis results.
+
+The key of a result is the SHA-256 of the canonical model content (the model class and the arrays of
+Model.to_arrays: coordinates, connectivity, element properties and supports), the analysis type and the analysis
+inputs, e.g. the loads. Any change of an input gives a different key, so the cache never has to be invalidated.
+
+Each result is one uncompressed .npz file named by its key. Reading a cached result loads the arrays without assembling
+anything. The total size of the cache directory is bounded, the least recently used results are removed first.
+
+Several processes may share a cache directory: results are written to a temporary file that is renamed when complete,
+a result removed or replaced by another process meanwhile, or a truncated or corrupt file, is a miss. Temporary files
+left by killed writers are removed by evict after TMP_MAX_AGE seconds, and by clear.
+
+Usage:
+cache = ResultCache('~/.cache/fem', max_bytes=2 ** 30)
+u, reactions = cache.solve(model, F)
+"""
+import hashlib
+import os
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+# age in seconds after which a temporary file is taken to be left by a killed writer
+TMP_MAX_AGE = 3600
+
+
+class ResultCache:
+    """
+    Size bounded LRU cache of result arrays in a directory.
+
+    :param directory: The cache directory, created if it does not exist.
+    :param max_bytes: Maximum total size of the cached files.
+    """
+
+    suffix = '.npz'
+    tmp_suffix = '.tmp'
+
+    def __init__(self, directory, max_bytes: int = 2 ** 30):
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model, analysis: str, **inputs) -> str:
+        """
+        The content hash of a model, an analysis type and the analysis inputs.
+
+        :param model: The model.
+        :param analysis: Name of the analysis, e.g. 'static'.
+        :param inputs: The input arrays (or numbers) of the analysis, e.g. F=F.
+        :return: Hex digest.
+        """
+        h = hashlib.sha256(f'{type(model).__name__}:{analysis}'.encode())
+        arrays = model.to_arrays()
+        arrays.update((f'input:{name}', inputs[name]) for name in sorted(inputs))
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            h.update(f'{name}{array.dtype.str}{array.shape}'.encode())
+            h.update(array.tobytes())
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / (key + self.suffix)
+
+    def get(self, key: str) -> dict:
+        """
+        The cached arrays for the key.
+
+        :return: dict of arrays, or None if the key is not cached.
+        """
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                result = {name: data[name] for name in data.files}
+        except (FileNotFoundError, zipfile.BadZipFile, ValueError, EOFError):
+            # not cached, or a truncated or corrupt file, put replaces it
+            self.misses += 1
+            return None
+        try:
+            # the modification time is the time of the last use
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # evicted by another process meanwhile, the result read is still valid
+        self.hits += 1
+        return result
+
+    def put(self, key: str, **arrays):
+        """
+        Stores the arrays under the key and removes the least recently used results if the cache is too large.
+        """
+        # write to a temporary file first, so a concurrent reader never sees a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=self.tmp_suffix)
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        try:
+            os.replace(tmp, self._path(key))
+        except FileNotFoundError:
+            return  # removed by a concurrent clear, the result is not cached
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used results until the total size is within max_bytes, and the temporary files
+        older than TMP_MAX_AGE seconds.
+        """
+        expired = time.time() - TMP_MAX_AGE
+        for path in self.directory.glob('*' + self.tmp_suffix):
+            try:
+                if path.stat().st_mtime < expired:
+                    path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                continue
+        entries = []
+        for path in self.directory.glob('*' + self.suffix):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(x[1] for x in entries)
+        for _, size, path in sorted(entries, key=lambda x: x[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    @property
+    def size(self) -> int:
+        """Total size of the cached files in bytes."""
+        return sum(x.stat().st_size for x in self.directory.glob('*' + self.suffix))
+
+    def clear(self):
+        """Removes all results and temporary files."""
+        for pattern in ('*' + self.suffix, '*' + self.tmp_suffix):
+            for path in self.directory.glob(pattern):
+                path.unlink(missing_ok=True)
+
+    def solve(self, model, F: np.array) -> tuple:
+        """
+        Cached linear static solution, see Model.solve. The member forces are cached with the displacements, see
+        member_forces.
+
+        :param model: The model.
+        :param F: Global load vector.
+        :return: displacements, reactions
+        """
+        result = self.static(model, F)
+        return result['u'], result['reactions']
+
+    def static(self, model, F: np.array) -> dict:
+        """
+        Cached linear static solution with member forces.
+
+        :param model: The model.
+        :param F: Global load vector.
+        :return: dict with u, reactions and, for trusses and frames, member_forces (see TrussModel.axial_forces and
+                 SpatialFrameModel.end_forces).
+        """
+        F = np.asarray(F, dtype=float)
+        key = self.key(model, 'static', F=F)
+        result = self.get(key)
+        if result is None:
+            u, reactions = model.solve(F.copy())
+            result = {'u': u, 'reactions': reactions}
+            if hasattr(model, 'end_forces'):
+                result['member_forces'] = model.end_forces(u)
+            elif hasattr(model, 'axial_forces'):
+                result['member_forces'] = model.axial_forces(u)
+            self.put(key, **result)
+        return result
+
+    def solve_modal(self, model) -> tuple:
+        """
+        Cached modal analysis, see Model.solve_modal.
+
+        :param model: The model.
+        :return: frequencies and modal shapes
+        """
+        key = self.key(model, 'modal')
+        result = self.get(key)
+        if result is None:
+            freqs, shapes = model.solve_modal()
+            result = {'freqs': freqs, 'shapes': shapes}
+            self.put(key, **result)
+        return result['freqs'], result['shapes']
@@ -0,0 +1,251 @@
+"""
+Local solve service for many independent linear static analyses.
+
+The models are sent as plain arrays (ModelSpec), not as Node and element objects. An asyncio front end (SolveService)
+dispatches the jobs to a pool of worker processes:
+
+- the input and result arrays are passed through multiprocessing.shared_memory, only the small layout descriptions
+  are pickled,
+- the workers stay alive and keep the assembled models and the factorized stiffness matrices in a cache keyed by the
+  hash of the model arrays; every model is always sent to the same worker, so repeated jobs for the same model (e.g.
+  new load cases) only solve with the cached factorization and the model arrays are not even sent again,
+- the results are returned as views into shared memory, they are not copied.
+
+Usage:
+with SolveService(n_workers=4) as service:
+    result = asyncio.run(service.solve(spec, F))
+    print(result.u, result.reactions)
+    result.release()
+"""
+import asyncio
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+def _model_types() -> dict:
+    from source.OneD.truss.truss import TrussModel
+    from source.OneD.frame.spatial_frame import SpatialFrameModel
+    return {'truss': TrussModel, 'frame': SpatialFrameModel}
+
+
+@dataclass
+class ModelSpec:
+    """A model as plain arrays, see Model.from_arrays."""
+
+    model_type: str  # 'truss' or 'frame'
+    coords: np.ndarray  # (n_nodes, 2 or 3) node coordinates
+    connectivity: np.ndarray  # (n_elements, 2) node numbers
+    properties: np.ndarray  # (n_elements, n_properties) in the order of the element tuples of the model
+    fixed: np.ndarray  # (n_nodes, ND) boolean array of the supported DOFs
+
+    _key: str = field(default=None, init=False, repr=False)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            'coords': np.asarray(self.coords, dtype=float),
+            'connectivity': np.asarray(self.connectivity, dtype=np.int64),
+            'properties': np.atleast_2d(np.asarray(self.properties, dtype=float)),
+            'fixed': np.asarray(self.fixed, dtype=bool),
+        }
+
+    @property
+    def key(self) -> str:
+        """SHA-256 of the model type and the arrays, identifies the model in the worker caches."""
+        if self._key is None:
+            h = hashlib.sha256(self.model_type.encode())
+            for name, array in self.arrays().items():
+                array = np.ascontiguousarray(array)
+                h.update(f'{name}{array.dtype.str}{array.shape}'.encode())
+                h.update(array.tobytes())
+            self._key = h.hexdigest()
+        return self._key
+
+    @property
+    def n_dofs(self) -> int:
+        return int(np.prod(np.shape(self.fixed)))
+
+
+# name, dtype, shape and byte offset of each array in a shared memory block
+Layout = Tuple[str, Tuple[Tuple[str, str, tuple, int], ...]]
+
+
+def _share(arrays: Dict[str, np.ndarray]) -> Tuple[shared_memory.SharedMemory, Layout]:
+    """Copies the arrays into a new shared memory block."""
+    entries = []
+    offset = 0
+    for name, array in arrays.items():
+        entries.append((name, array.dtype.str, array.shape, offset))
+        offset += -(-array.nbytes // 8) * 8  # keep the arrays aligned
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    layout = (shm.name, tuple(entries))
+    for (name, array), view in zip(arrays.items(), _views(shm, layout).values()):
+        view[...] = array
+    return shm, layout
+
+
+def _views(shm: shared_memory.SharedMemory, layout: Layout) -> Dict[str, np.ndarray]:
+    return {name: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            for name, dtype, shape, offset in layout[1]}
+
+
+# worker process state: the cached models as (model, free DOFs, factorization, stiffness operator), least recently
+# used first
+_models = OrderedDict()
+_cache_size = 16
+
+
+def _init_worker(cache_size: int):
+    global _cache_size
+    _cache_size = cache_size
+
+
+def _solve_job(model_type: str, key: str, inputs: Layout, outputs: Layout) -> bool:
+    """
+    Solves one job in a worker process, the results are written into the shared output block.
+
+    :return: False if the model is not cached and its arrays were not sent, nothing is solved then.
+    """
+    shm_in = shared_memory.SharedMemory(name=inputs[0])
+    shm_out = shared_memory.SharedMemory(name=outputs[0])
+    try:
+        arrays = _views(shm_in, inputs)
+        if key in _models:
+            _models.move_to_end(key)
+        elif 'coords' not in arrays:
+            return False
+        else:
+            model = _model_types()[model_type].from_arrays(
+                arrays['coords'], arrays['connectivity'], arrays['properties'], arrays['fixed'])
+            free = model.free_dofs()
+            pattern = model.sparse_pattern(free)
+            lu = pattern.factorize(pattern.assemble(model.element_stiffness_matrices()), spd=True)
+            _models[key] = (model, free, lu, model.stiffness_operator())
+            while len(_models) > _cache_size:
+                _models.popitem(last=False)
+        _, free, lu, operator = _models[key]
+
+        F = arrays['F']
+        results = _views(shm_out, outputs)
+        u = results['u']
+        u[...] = 0
+        u[free] = lu.solve(F[free])
+        results['reactions'][...] = operator @ u - F
+        del arrays, results, u, F  # release the buffers before closing
+        return True
+    finally:
+        shm_in.close()
+        shm_out.close()
+
+
+@dataclass
+class SolveResult:
+    """Displacements and reactions of a job, views into shared memory. Call release() when done."""
+
+    u: np.ndarray  # (n_dofs,) or (n_dofs, n_cases)
+    reactions: np.ndarray  # same shape as u
+
+    _shm: shared_memory.SharedMemory = field(default=None, repr=False)
+
+    def release(self):
+        """Frees the shared memory, the arrays must not be used afterwards."""
+        if self._shm is not None:
+            self.u = self.reactions = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+class SolveService:
+    """
+    Solves many independent models in warm worker processes, see the module docstring.
+
+    :param n_workers: Number of worker processes.
+    :param cache_size: Number of models cached by each worker.
+    """
+
+    def __init__(self, n_workers: int = 2, cache_size: int = 16):
+        self.cache_size = cache_size
+        # one single process executor per worker, so the jobs of a model always reach the same cache
+        self._workers = [ProcessPoolExecutor(max_workers=1, initializer=_init_worker, initargs=(cache_size,))
+                         for _ in range(n_workers)]
+        # mirrors of the worker caches, the jobs of a worker are processed in submission order
+        self._cached = [OrderedDict() for _ in range(n_workers)]
+
+    def _worker(self, key: str) -> int:
+        return int(key[:8], 16) % len(self._workers)
+
+    async def solve(self, spec: ModelSpec, F: np.array) -> SolveResult:
+        """
+        Solves K u = F for the model.
+
+        :param spec: The model.
+        :param F: Global load vector (n_dofs,) or one load case per column (n_dofs, n_cases).
+        :return: The displacements and reactions.
+        """
+        F = np.asarray(F, dtype=float)
+        key = spec.key
+        worker = self._worker(key)
+        cached = self._cached[worker]
+
+        shm_out, outputs = _share({'u': np.zeros_like(F), 'reactions': np.zeros_like(F)})
+        try:
+            solved = False
+            send_model = key not in cached
+            while not solved:
+                arrays = {'F': F}
+                if send_model:
+                    arrays.update(spec.arrays())
+                shm_in, inputs = _share(arrays)
+                self._remember(cached, key)
+                try:
+                    loop = asyncio.get_running_loop()
+                    solved = await loop.run_in_executor(self._workers[worker], _solve_job, spec.model_type, key,
+                                                        inputs, outputs)
+                finally:
+                    shm_in.close()
+                    shm_in.unlink()
+                send_model = True  # the worker has lost the model, e.g. after a restart
+        except BaseException:
+            shm_out.close()
+            shm_out.unlink()
+            raise
+
+        results = _views(shm_out, outputs)
+        return SolveResult(u=results['u'], reactions=results['reactions'], _shm=shm_out)
+
+    async def solve_many(self, jobs) -> list:
+        """
+        Solves several jobs concurrently.
+
+        :param jobs: Iterable of (spec, F) tuples.
+        :return: List of SolveResult in the order of the jobs.
+        """
+        return await asyncio.gather(*(self.solve(spec, F) for spec, F in jobs))
+
+    def _remember(self, cached: OrderedDict, key: str):
+        cached[key] = True
+        cached.move_to_end(key)
+        while len(cached) > self.cache_size:
+            cached.popitem(last=False)
+
+    def close(self):
+        for worker in self._workers:
+            worker.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,234 @@
+"""
+Sparse global matrices with a fixed sparsity pattern.
+
+The connectivity of a model does not change between assemblies, so the CSR structure of a global matrix can be
+computed once. Every later assembly only refills the values: the element matrices are stacked into one array and
+summed into the CSR data slots with a single bincount, which costs O(nnz) and does no index work at all.
+
+Large patterns can also be assembled in parallel: the elements are grouped into colors so that the elements of one
+color share no DOF and therefore no data slot. The blocks of one color are then added to the data array concurrently
+by a thread pool (NumPy releases the GIL for the fancy-index additions) without any locking.
+
+The same holds for the factorization: the fill-reducing ordering and the structure of the reordered matrix are
+computed once per pattern, a refactorization only permutes the data array and runs the numeric factorization.
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from source.instrumentation import active, report
+
+
+@dataclass
+class SparsePattern:
+    """
+    CSR sparsity pattern of a global matrix built from the DOF indices of the elements.
+
+    The pattern can be restricted to a subset of the DOFs (e.g. the free DOFs), entries of the element matrices
+    belonging to a removed DOF are then simply dropped during the assembly.
+    """
+
+    indptr: np.ndarray  # CSR row pointers
+    indices: np.ndarray  # CSR column indices, sorted within each row
+    slots: np.ndarray  # for each kept element matrix entry the CSR data slot it is added to
+    entries: np.ndarray = None  # flat indices of the kept element matrix entries, None if all are kept
+    dofs: np.ndarray = None  # global DOF number of each row (and column), None if all DOFs are kept
+
+    _ordering: tuple = field(default=None, init=False, repr=False)  # see ordering
+    _element_slots: np.ndarray = field(default=None, init=False, repr=False)  # see element_slots
+
+    @classmethod
+    def from_dof_indices(cls, dof_indices: np.array, n_dofs: int, free: np.array = None) -> 'SparsePattern':
+        """
+        Computes the pattern for elements with the given global DOF indices.
+
+        :param dof_indices: (n_elements, n_element_dofs) array of global DOF indices.
+        :param n_dofs: Number of global DOFs.
+        :param free: Optional boolean mask of the DOFs to keep; rows and columns of the other DOFs are left out.
+        :return: The sparsity pattern.
+        """
+        dof_indices = np.asarray(dof_indices, dtype=np.int64)
+        n_edof = dof_indices.shape[1]
+
+        if free is None:
+            n = n_dofs
+            dofs = None
+            mapped = dof_indices
+        else:
+            dofs = np.flatnonzero(free)
+            n = len(dofs)
+            # the row number of each global DOF in the reduced matrix, -1 for the removed ones
+            local = np.full(n_dofs, -1, dtype=np.int64)
+            local[dofs] = np.arange(n)
+            mapped = local[dof_indices]
+
+        # row and column of every element matrix entry, in the order of the flattened (n_e, n_edof, n_edof) stack
+        rows = np.repeat(mapped, n_edof, axis=1).ravel()
+        cols = np.tile(mapped, (1, n_edof)).ravel()
+
+        entries = None
+        if free is not None:
+            entries = np.flatnonzero((rows >= 0) & (cols >= 0))
+            rows = rows[entries]
+            cols = cols[entries]
+
+        # sorting the row-major keys gives the CSR order, the inverse is the scatter map into the data array
+        keys, slots = np.unique(rows * n + cols, return_inverse=True)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // n, minlength=n), out=indptr[1:])
+
+        return cls(indptr=indptr, indices=keys % n, slots=slots.ravel(), entries=entries, dofs=dofs)
+
+    @property
+    def n(self) -> int:
+        """Number of rows (and columns) of the matrix."""
+        return len(self.indptr) - 1
+
+    @property
+    def nnz(self) -> int:
+        """Number of stored entries."""
+        return len(self.indices)
+
+    def assemble(self, values: np.array, out: np.array = None) -> np.array:
+        """
+        Sums the stacked element matrices into the CSR data array.
+
+        :param values: (n_elements, n_element_dofs, n_element_dofs) element matrices in global coordinates.
+        :param out: Optional data array to write into.
+        :return: The CSR data array.
+        """
+        values = np.asarray(values).ravel()
+        if self.entries is not None:
+            values = values[self.entries]
+        data = np.bincount(self.slots, weights=values, minlength=self.nnz)
+        if out is None:
+            return data
+        out[:] = data
+        return out
+
+    def element_slots(self, shape: tuple) -> np.array:
+        """
+        The data slot of every element matrix entry, entries of removed DOFs are sent to the extra slot nnz.
+
+        :param shape: (n_elements, n_element_dofs, n_element_dofs), the shape of the stacked element matrices.
+        :return: (n_elements, n_element_dofs ** 2) array.
+        """
+        if self._element_slots is None:
+            if self.entries is None:
+                slots = self.slots
+            else:
+                slots = np.full(int(np.prod(shape)), self.nnz, dtype=np.int64)
+                slots[self.entries] = self.slots
+            self._element_slots = slots.reshape(shape[0], -1)
+        return self._element_slots
+
+    def assemble_colored(self, values: np.array, colors: list, max_workers: int = None) -> np.array:
+        """
+        Sums the stacked element matrices into the CSR data array, the blocks of each color concurrently.
+
+        :param values: (n_elements, n_element_dofs, n_element_dofs) element matrices in global coordinates.
+        :param colors: One list of element index arrays (the blocks) per color, the elements of a color must not
+                       share any DOF, see Model.element_color_blocks.
+        :param max_workers: Number of threads, see concurrent.futures.ThreadPoolExecutor.
+        :return: The CSR data array.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        values = np.asarray(values)
+        slots = self.element_slots(values.shape)
+        values = values.reshape(len(values), -1)
+        data = np.zeros(self.nnz + 1)  # the extra slot collects the dropped entries, its value is never used
+
+        def add(elements: np.array):
+            # no slot is repeated within a color, so the blocks can be added independently
+            data[slots[elements]] += values[elements]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for blocks in colors:
+                # the colors are added one after another
+                list(pool.map(add, blocks))
+        return data[:-1]
+
+    def matrix(self, data: np.array):
+        """
+        Wraps a data array into a scipy CSR matrix without copying.
+
+        :param data: The CSR data array, see `assemble`.
+        :return: scipy.sparse.csr_matrix
+        """
+        from scipy.sparse import csr_matrix
+        return csr_matrix((data, self.indices, self.indptr), shape=(self.n, self.n), copy=False)
+
+    @property
+    def ordering(self) -> tuple:
+        """
+        The symbolic part of the factorization, computed once: a reverse Cuthill-McKee ordering of the pattern and
+        the CSR structure of the reordered matrix P A P^T together with the map of its data slots to the slots of A.
+
+        :return: (permutation, indptr, indices, data map)
+        """
+        if self._ordering is None:
+            from scipy.sparse import csr_matrix
+            from scipy.sparse.csgraph import reverse_cuthill_mckee
+
+            # the values are the data slots, shifted by one so no explicit zero is dropped
+            A = csr_matrix((np.arange(1, self.nnz + 1, dtype=float), self.indices, self.indptr), shape=(self.n, self.n))
+            perm = reverse_cuthill_mckee(A, symmetric_mode=True).astype(np.int64)
+            B = A[perm][:, perm].tocsr()
+            B.sort_indices()
+            self._ordering = (perm, B.indptr, B.indices, B.data.astype(np.int64) - 1)
+        return self._ordering
+
+    def factorize(self, data: np.array, spd: bool = False) -> 'SparseFactorization':
+        """
+        Sparse LU factorization of a symmetric matrix with this pattern, reusing the cached ordering.
+
+        Without pivoting the factorization is only stable for positive definite matrices. An indefinite matrix, e.g.
+        a tangent stiffness matrix past a limit point or K + Kg, can give a wrong solution without any error, so rows
+        are pivoted unless the caller guarantees a positive definite matrix.
+
+        :param data: The CSR data array, see `assemble`.
+        :param spd: True if the matrix is symmetric positive definite (a supported linear stiffness matrix), the
+                    diagonal is then used as pivot without any search.
+        :return: The factorization.
+        """
+        from scipy.sparse import csc_matrix
+        from scipy.sparse.linalg import splu
+
+        perm, indptr, indices, data_map = self.ordering
+        # the reordered matrix is symmetric, so its CSR arrays are also its CSC arrays
+        B = csc_matrix((np.asarray(data)[data_map], indices, indptr), shape=(self.n, self.n))
+        if spd:
+            lu = splu(B, permc_spec='NATURAL', diag_pivot_thresh=0, options={'SymmetricMode': True})
+        else:
+            # the RCM ordering is kept, the default threshold pivoting guards against small pivots
+            lu = splu(B, permc_spec='NATURAL')
+        if active():
+            # the fill-in: stored entries of the factors relative to the matrix
+            factor_nnz = lu.L.nnz + lu.U.nnz - self.n
+            report(nnz=self.nnz, factor_nnz=factor_nnz, fill_in=factor_nnz / max(self.nnz, 1))
+        return SparseFactorization(lu=lu, perm=perm)
+
+
+@dataclass
+class SparseFactorization:
+    """LU factorization of a symmetrically reordered matrix, P A P^T = L U."""
+
+    lu: object  # scipy.sparse.linalg.SuperLU of the reordered matrix
+    perm: np.ndarray  # the permutation P
+
+    @property
+    def shape(self) -> tuple:
+        return self.lu.shape
+
+    def solve(self, b: np.array) -> np.array:
+        """
+        Solves A x = b.
+
+        :param b: Right hand side, a vector or an array with one right hand side per column.
+        :return: The solution, same shape as b.
+        """
+        b = np.asarray(b, dtype=float)
+        x = np.empty_like(b)
+        x[self.perm] = self.lu.solve(np.ascontiguousarray(b[self.perm]))
+        return x
@@ -0,0 +1,226 @@
+"""
+Detection of mechanisms and singular stiffness matrices before a solve.
+
+An under-constrained model has a singular stiffness matrix of the free DOFs. The dense solve with the penalty method
+does not fail then but returns displacements scaled by the penalty value, after the full factorization. The checks
+here are cheap and name the nodes and DOFs at fault:
+
+1. the connectivity graph of the nodes: nodes without elements and connected parts without any support,
+2. a DOF count: each element contributes at most the rank of its stiffness matrix (1 for a truss bar), a model with
+   more free DOFs than that is a mechanism,
+3. free DOFs without any stiffness,
+4. a nullspace probe: the smallest eigenvalues of the Jacobi scaled sparse matrix of the free DOFs, by a subspace
+   iteration with its factorization; their eigenvectors are the mechanisms and the rigid body modes.
+
+The probe factorizes the matrix like the solve would, with the backend chosen by source.planner.plan_solve (banded
+Cholesky or sparse LU), so it costs about one solve. If the planner chooses the iterative solver, no factorization
+fits or is fast enough, and the probe is skipped by default; the report says so.
+
+Usage:
+report = model.check_stability()
+print(report)
+report.raise_if_unstable()
+"""
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+
+# models up to this number of probed DOFs are probed with a dense eigensolver
+DENSE_LIMIT = 200
+
+
+class StabilityError(np.linalg.LinAlgError):
+    """The model is a mechanism or not supported; the report names the nodes and DOFs."""
+
+    def __init__(self, report: 'StabilityReport'):
+        super().__init__(str(report))
+        self.report = report
+
+
+@dataclass
+class StabilityReport:
+    """The findings of check_stability."""
+
+    dof_names: tuple  # names of the DOFs of a node
+    n_free: int  # number of free DOFs
+    rank_bound: int  # upper bound of the rank of the stiffness matrix from the element ranks
+    components: List[np.ndarray]  # node numbers of the connected parts of the model
+    unsupported: List[np.ndarray] = field(default_factory=list)  # the connected parts without any support
+    unconnected_nodes: np.ndarray = None  # nodes without elements
+    zero_stiffness_dofs: np.ndarray = None  # free global DOFs without any stiffness
+    modes: np.ndarray = None  # (n_dofs, n_mechanisms) mechanisms and rigid body modes found by the probe
+    mechanism_dofs: np.ndarray = None  # global DOFs moving in the modes
+    probed: bool = False  # whether the nullspace probe ran
+
+    @property
+    def dof_deficit(self) -> int:
+        """Free DOFs exceeding the rank bound, at least this many mechanisms exist."""
+        return max(self.n_free - self.rank_bound, 0)
+
+    @property
+    def n_mechanisms(self) -> int:
+        """The dimension of the nullspace of the free DOF stiffness matrix (without the zero stiffness DOFs)."""
+        return 0 if self.modes is None else self.modes.shape[1]
+
+    @property
+    def stable(self) -> bool:
+        return (not self.unsupported and not len(self.zero_stiffness_dofs) and not self.dof_deficit
+                and not self.n_mechanisms)
+
+    def dof_label(self, dof: int) -> str:
+        """E.g. 'node 3 uy' for a global DOF."""
+        ND = len(self.dof_names)
+        return f'node {dof // ND} {self.dof_names[dof % ND]}'
+
+    def __str__(self) -> str:
+        if self.stable:
+            return (f'stable: {self.n_free} free DOFs, {len(self.components)} connected part(s)'
+                    + ('' if self.probed else ', mechanisms not probed'))
+
+        def nodes(x, limit=20):
+            return ', '.join(map(str, x[:limit])) + (', ...' if len(x) > limit else '')
+
+        def dofs(x, limit=20):
+            return ', '.join(self.dof_label(d) for d in x[:limit]) + (', ...' if len(x) > limit else '')
+
+        lines = ['unstable:']
+        for component in self.unsupported:
+            lines.append(f'  connected part without supports, nodes {nodes(component)}')
+        if len(self.unconnected_nodes):
+            lines.append(f'  nodes without elements: {nodes(self.unconnected_nodes)}')
+        if len(self.zero_stiffness_dofs):
+            lines.append(f'  free DOFs without stiffness: {dofs(self.zero_stiffness_dofs)}')
+        if self.dof_deficit:
+            lines.append(f'  {self.n_free} free DOFs but the elements give a rank of at most {self.rank_bound}')
+        if self.n_mechanisms:
+            lines.append(f'  {self.n_mechanisms} mechanism(s) or rigid body mode(s) moving '
+                         f'{dofs(self.mechanism_dofs)}')
+        return '\n'.join(lines)
+
+    def raise_if_unstable(self):
+        if not self.stable:
+            raise StabilityError(self)
+
+
+def _null_space(pattern, data: np.array, tol: float, k: int, backend: str = 'sparse',
+                max_iterations: int = 30) -> np.ndarray:
+    """
+    Orthonormal eigenvectors with eigenvalues below tol of a symmetric positive semi-definite matrix.
+
+    :param pattern: source.sparse.SparsePattern of the matrix.
+    :param data: The CSR data array of the matrix.
+    :param tol: Eigenvalues below tol count as zero.
+    :param k: Number of vectors of the first block.
+    :param backend: 'banded' for a banded Cholesky factorization, otherwise the sparse LU factorization.
+    :param max_iterations: Maximum number of subspace iterations.
+    :return: (n, n_null) array.
+    """
+    from source.planner import BandedCholesky
+
+    n = pattern.n
+    A = pattern.matrix(data)
+    if n <= DENSE_LIMIT:
+        values, vectors = np.linalg.eigh(A.toarray())
+        return vectors[:, values < tol]
+
+    # subspace iteration with the inverse of the slightly shifted matrix: unlike a Krylov method (eigsh), a block of
+    # vectors finds all vectors of a multiple eigenvalue, e.g. the six rigid body modes of a free frame
+    rows = np.repeat(np.arange(n), np.diff(pattern.indptr))
+    shifted = data + np.sqrt(tol) * (rows == pattern.indices)
+    factor = BandedCholesky(pattern, shifted) if backend == 'banded' else pattern.factorize(shifted, spd=True)
+    rng = np.random.default_rng(0)
+    while True:
+        k = min(k, n)
+        X = rng.standard_normal((n, k))
+        n_null = -1
+        for iteration in range(max_iterations):
+            X, _ = np.linalg.qr(factor.solve(X))
+            # Rayleigh-Ritz: the best approximations of the eigenvectors in the subspace
+            values, vectors = np.linalg.eigh(X.T @ (A @ X))
+            X = X @ vectors
+            null = values < tol
+            if null.sum() == n_null and iteration >= 1:
+                break
+            n_null = null.sum()
+        if null.sum() < k or k == n:
+            return X[:, null]
+        # all vectors are null vectors, there may be more
+        k = 2 * k
+
+
+def check_stability(model, tol: float = 1e-10, probe='auto', memory_budget: float = None) -> StabilityReport:
+    """
+    Checks the model for missing supports, mechanisms and free DOFs without stiffness, see the module docstring.
+
+    :param model: The model.
+    :param tol: Eigenvalues of the Jacobi scaled free DOF matrix below tol count as zero.
+    :param probe: Whether to run the nullspace probe, the other checks cost O(n). 'auto' runs it unless the planner
+                  chooses the iterative solver, so the check costs about as much as a solve.
+    :param memory_budget: Memory budget of the planner in bytes, the same as of the solve.
+    :return: The report.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    ND = model.ND
+    n_nodes = len(model.nodes)
+    free = model.free_dofs()
+    element_nodes = model.element_dof_indices[:, ::ND] // ND
+
+    # connected parts of the node graph, the nodes of an element are joined in a chain
+    i, j = element_nodes[:, :-1].ravel(), element_nodes[:, 1:].ravel()
+    graph = coo_matrix((np.ones(len(i)), (i, j)), shape=(n_nodes, n_nodes))
+    n_components, labels = connected_components(graph, directed=False)
+    order = np.argsort(labels, kind='stable')
+    components = np.split(order, np.cumsum(np.bincount(labels, minlength=n_components))[:-1])
+
+    has_elements = np.zeros(n_nodes, dtype=bool)
+    has_elements[element_nodes.ravel()] = True
+    supported = (~free.reshape(n_nodes, ND)).any(axis=1)  # nodes with at least one fixed DOF
+    unsupported = [x for x in components if has_elements[x].any() and not supported[x].any()]
+
+    Ke = model.element_stiffness_matrices()
+    # all elements of a model are of one type, so the rank of the first one holds for all
+    element_rank = np.linalg.matrix_rank(Ke[0]) if len(Ke) else 0
+
+    pattern = model.sparse_pattern(free)
+    data = pattern.assemble(Ke)
+    diagonal = pattern.matrix(data).diagonal()
+    scale = np.abs(diagonal).max(initial=0.0)
+    zero = np.abs(diagonal) <= 1e-14 * scale if scale > 0 else np.ones(pattern.n, dtype=bool)
+    free_dofs = np.flatnonzero(free)
+
+    report = StabilityReport(
+        dof_names=tuple(getattr(model, 'DOF_NAMES', ()))[:ND] or tuple(f'dof {x}' for x in range(ND)),
+        n_free=int(free.sum()),
+        rank_bound=int(min(element_rank * len(Ke), free.sum())),
+        components=components,
+        unsupported=unsupported,
+        unconnected_nodes=np.flatnonzero(~has_elements),
+        zero_stiffness_dofs=free_dofs[zero],
+    )
+
+    backend = model.plan_solve(memory_budget).backend if probe else None
+    if probe == 'auto':
+        probe = backend in ('dense', 'banded', 'sparse')
+    if probe and not zero.all():
+        report.probed = True
+        # the DOFs without stiffness are already reported, the probe only looks at the others
+        probed = free.copy()
+        probed[free_dofs[zero]] = False
+        pattern = model.sparse_pattern(probed)
+        data = pattern.assemble(Ke)
+        s = 1 / np.sqrt(pattern.matrix(data).diagonal())
+        rows = np.repeat(np.arange(pattern.n), np.diff(pattern.indptr))
+        # Jacobi scaling, the diagonal of the scaled matrix is 1
+        null = _null_space(pattern, data * s[rows] * s[pattern.indices], tol, k=6 + report.dof_deficit,
+                           backend=backend)
+        if null.shape[1]:
+            modes = np.zeros((len(free), null.shape[1]))
+            modes[probed] = s[:, None] * null
+            report.modes = modes
+            # the participation of each DOF in the nullspace, independent of the choice of its basis
+            participation = np.sqrt(np.square(null).sum(axis=1))
+            report.mechanism_dofs = np.flatnonzero(probed)[participation > 1e-3 * participation.max()]
+    return report
@@ -1,3 +1,5 @@
+import weakref
+
 import numpy as np
 from typing import Tuple
 
@@ -44,3 +46,93 @@ class IDMixin:
         :return:
         """
         cls.ID_counter = {}
+
+
+def derived_property(func):
+    """
+    A property whose value is computed once and kept in the cache of a CacheMixin object until the cache is cleared.
+    Cached numpy arrays are made read-only, so the cached value cannot be changed by accident.
+
+    Usage:
+    @derived_property
+    def length(self) -> float:
+        return self.i.distance(self.j)
+    """
+    name = func.__name__
+
+    def getter(self):
+        cache = self.__dict__.get('_derived_cache')
+        if cache is None:
+            cache = self.__dict__['_derived_cache'] = {}
+        try:
+            return cache[name]
+        except KeyError:
+            pass
+        value = func(self)
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        cache[name] = value
+        return value
+
+    getter.__name__ = name
+    getter.__doc__ = func.__doc__
+    return property(getter)
+
+
+class CacheMixin:
+    """
+    This mixin class keeps derived quantities (lengths, transformation and element matrices etc.) in a cache and
+    clears the cache when an input changes.
+
+    The inputs are the public attributes: setting any attribute not starting with an underscore clears the cache.
+    Objects can depend on each other, e.g. an element on its nodes and a model on its elements. When the cache of an
+    object is cleared, the caches of its dependents are cleared too. Setting a public attribute to another CacheMixin
+    object (e.g. element.i = node) registers the dependency automatically, otherwise use add_dependent.
+
+    Reading a cached value is a dictionary lookup, invalidation is pushed to the dependents when an input changes.
+    """
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if not name.startswith('_'):
+            self.clear_cache()
+            if isinstance(value, CacheMixin):
+                value.add_dependent(self)
+
+    def add_dependent(self, other: 'CacheMixin'):
+        """
+        Registers an object whose cached values depend on this object. Only a weak reference is kept.
+
+        :param other: The dependent object.
+        """
+        dependents = self.__dict__.get('_dependents')
+        if dependents is None:
+            dependents = self.__dict__['_dependents'] = {}
+        dependents[id(other)] = weakref.ref(other)
+
+    def clear_cache(self):
+        """Drops the cached derived quantities of this object and of its dependents."""
+        cache = self.__dict__.get('_derived_cache')
+        if cache:
+            cache.clear()
+        for ref in tuple(self.__dict__.get('_dependents', {}).values()):
+            dependent = ref()
+            if dependent is not None:
+                dependent.clear_cache()
+
+    def _cached(self, key: str, factory):
+        """
+        Returns a derived quantity computed by factory, computing it only once. Same as derived_property, for
+        values that are not properties.
+
+        :param key: Name of the quantity.
+        :param factory: Function without arguments computing the quantity.
+        """
+        cache = self.__dict__.get('_derived_cache')
+        if cache is None:
+            cache = self.__dict__['_derived_cache'] = {}
+        try:
+            return cache[key]
+        except KeyError:
+            value = cache[key] = factory()
+            return value
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from source.io.apdl import ApdlReader, load_apdl
+from source.OneD.frame.spatial_frame import SpatialFrameModel
+from source.OneD.truss.truss import TrussModel
+
+TRUSS_DECK = """
+/PREP7
+ET,1,LINK180              ! truss element
+MP,EX,1,7e10
+MP,DENS,1,1.0
+SECTYPE,1,LINK
+SECDATA,0.1
+N,10,1,1,0 $ N,20,-1,1,0
+N,30,-1,-1,0
+N,40,1,-1,0
+N,50,0,0,2                ! redefined below
+N,50,0,0,1
+E,10,50
+E,20,50
+E,30,50
+E,40,50
+D,10,ALL $ D,20,ALL $ D,30,ALL $ D,40,ALL
+F,50,FZ,-500
+F,50,FZ,-1000             ! replaces the previous force
+FINISH
+"""
+
+FRAME_DECK = """
+/PREP7
+ET,1,188
+MP,EX,1,2.1e11
+MP,PRXY,1,0.3
+MP,DENS,1,7850
+SECT,1,BEAM,RECT
+SECD,0.1,0.2
+N,1,0,0,0
+N,2,1,0,0
+N,3,2,0,0
+E,1,2
+E,2,3
+D,1,ALL
+F,3,FZ,-1000
+"""
+
+
+class TestApdlImport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, deck: str) -> str:
+        path = os.path.join(self.tmp.name, 'deck.inp')
+        with open(path, 'w') as f:
+            f.write(deck)
+        return path
+
+    def test_truss(self):
+        model, F = load_apdl(self._write(TRUSS_DECK))
+        self.assertIsInstance(model, TrussModel)
+        self.assertEqual(len(model.nodes), 5)
+        self.assertEqual(model.nodes[4].z, 1.0)
+        self.assertEqual(F[14], -1000)
+        self.assertEqual(model.supports, {k: (0, 1, 2) for k in range(4)})
+
+        u, _ = model.solve(F.copy())
+        N = model.axial_forces(u)
+        # the vertical components of the four equal member forces carry the load
+        np.testing.assert_allclose(N, -1000 / 4 * 3 ** 0.5)
+
+    def test_frame(self):
+        model, F = load_apdl(self._write(FRAME_DECK))
+        self.assertIsInstance(model, SpatialFrameModel)
+        element = model.elements[0]
+        self.assertAlmostEqual(element.A, 0.02)
+        self.assertAlmostEqual(element.Iy, 0.1 * 0.2 ** 3 / 12)
+        self.assertAlmostEqual(element.nu, 0.3)
+
+        u, _ = model.solve(F.copy())
+        # cantilever tip deflection P L^3 / (3 E I)
+        self.assertAlmostEqual(u[14], -1000 * 8 / (3 * 2.1e11 * element.Iy), places=10)
+
+    def test_chunks(self):
+        # more rows than the chunk size
+        lines = ['ET,1,LINK180', 'R,1,1.0', 'MP,EX,1,1']
+        lines += [f'N,{i + 1},{i}' for i in range(10)]
+        lines += [f'E,{i + 1},{i + 2}' for i in range(9)]
+        arrays = ApdlReader(chunk_size=4).feed(lines).arrays(dim=2)
+        self.assertEqual(arrays['coords'].shape, (10, 2))
+        np.testing.assert_array_equal(arrays['connectivity'][:, 0], np.arange(9))
+        np.testing.assert_array_equal(arrays['properties'], [[1.0, 1.0, 0.0]] * 9)
+
+    def test_unsupported_node_fields(self):
+        # automatic node numbering, the selected set and components would silently give wrong node numbers
+        for line in ('N,,1,2,3', 'E,1', 'D,ALL,UX,0', 'F,TOP,FX,1'):
+            with self.assertRaisesRegex(ValueError, r'^APDL: .* not supported'):
+                ApdlReader().feed(['ET,1,LINK180', line])
+
+
+if __name__ == '__main__':
+    unittest.main()
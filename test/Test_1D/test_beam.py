@@ -32,6 +32,19 @@ class TestBeam(unittest.TestCase):
             bf = self.e1.base_functions(x)
             self.assertAlmostEqual(bf[0] + bf[2], 1)
 
+    def test_shape_function_arrays(self):
+        ksi = np.linspace(-1, 1, 7)
+        self.assertEqual(self.e1.base_functions(ksi).shape, (7, 4))
+        for n, x in enumerate(ksi):
+            np.testing.assert_allclose(self.e1.base_functions(ksi)[n], self.e1.base_functions(x))
+
+        # the derivatives match the finite differences of the base functions
+        h = 1e-6
+        fd_1 = (self.e1.base_functions(ksi + h) - self.e1.base_functions(ksi - h)) / (2 * h)
+        np.testing.assert_allclose(self.e1.base_function_1st_derivatives(ksi), fd_1, atol=1e-8)
+        fd_2 = (self.e1.base_function_1st_derivatives(ksi + h) - self.e1.base_function_1st_derivatives(ksi - h)) / (2 * h)
+        np.testing.assert_allclose(self.e1.base_function_2nd_derivatives(ksi), fd_2, atol=1e-6)
+
     def test_element_stiffness_matrix(self):
         ke = self.e1.ke
         np.testing.assert_allclose(ke, ke.T)  # Check symmetry
@@ -152,6 +165,54 @@ class TesBeamModel(unittest.TestCase):
 
         # self.model_C.plot_model(u=u)
 
+    def test_element_stiffness_matrices(self):
+        Ke = self.model_C.element_stiffness_matrices()
+        for i, element in enumerate(self.model_C.elements.values()):
+            np.testing.assert_allclose(Ke[i], element.Ke)
+
+    def test_banded_solver(self):
+        self.assertTrue(self.model_C.is_chain)
+        self.assertEqual(self.model_C.half_bandwidth, 3)
+
+        # the banded storage holds the upper band of K
+        K = self.model_C.K
+        ab = self.model_C.assemble_banded_K()
+        for d in range(4):
+            np.testing.assert_allclose(ab[3 - d, d:], np.diag(K, d))
+
+        # the banded solution equals the dense one, also for several load cases
+        F = np.zeros((self.model_C.ND * len(self.model_C.nodes), 2))
+        F[4, 0] = -1000
+        F[::2, 1] = -100
+        u, r = self.model_C.solve(F)
+        for i in range(2):
+            _K, _F = self.model_C.apply_boundary_conditions(F[:, i].copy())
+            u_dense = np.linalg.solve(_K, _F)
+            np.testing.assert_allclose(u[:, i], u_dense, rtol=1e-10, atol=1e-20)
+            np.testing.assert_allclose(r[:, i], self.model_C.reaction_forces(u_dense, _F), atol=1e-6)
+
+    def test_sampling(self):
+        """The cubic deflection line of a cantilever with a tip load is represented exactly."""
+        P = -1000
+        F = np.zeros(self.model_A.ND * len(self.model_A.nodes))
+        F[-2] = P
+        u, _ = self.model_A.solve(F.copy())
+        U = np.stack((u, 2 * u), axis=1)
+
+        element = self.model_A.elements[0]
+        EI, L = element.E * element.I, 10
+
+        x, w, slope = self.model_A.sample_deflections(U, n_points=5)
+        self.assertEqual(x.shape, (10, 5))
+        self.assertEqual(w.shape, (2, 10, 5))
+        np.testing.assert_allclose(w[0], P * x ** 2 * (3 * L - x) / (6 * EI), atol=1e-12)
+        np.testing.assert_allclose(slope[0], P * x * (2 * L - x) / (2 * EI), atol=1e-12)
+        np.testing.assert_allclose(w[1], 2 * w[0])
+
+        x, curvature, moment = self.model_A.sample_curvatures(U, n_points=5)
+        np.testing.assert_allclose(moment[0], P * (L - x), atol=1e-6)
+        np.testing.assert_allclose(curvature[0], moment[0] / EI)
+
 
 
 
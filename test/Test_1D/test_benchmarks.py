@@ -0,0 +1,55 @@
+import copy
+import unittest
+
+import numpy as np
+
+from benchmarks.generators import GENERATORS, frame_building, truss_grid
+from benchmarks.run import compare, run
+
+
+class TestGenerators(unittest.TestCase):
+
+    def test_sizes(self):
+        for name, generator in GENERATORS.items():
+            model, F = generator(1000)
+            self.assertLess(abs(len(F) - 1000) / 1000, 0.2, name)
+            self.assertEqual(len(F), model.ND * len(model.nodes))
+
+    def test_truss_grid(self):
+        model, F = truss_grid(2, 3)
+        # 3 x 4 nodes, horizontal, vertical and diagonal members
+        self.assertEqual(len(model.nodes), 12)
+        self.assertEqual(len(model.elements), 2 * 4 + 3 * 3 + 2 * 3)
+        u, _ = model.solve(F.copy())
+        self.assertTrue(np.all(np.isfinite(u)))
+
+    def test_frame_building(self):
+        model, F = frame_building(1, 1, 2)
+        # 4 columns and 4 beams per storey
+        self.assertEqual(len(model.elements), 16)
+        self.assertEqual(len(model.supports), 4)
+
+
+class TestBenchmarkRun(unittest.TestCase):
+
+    def test_run_and_compare(self):
+        results = run([100], models=['truss_plane'])
+        phases = [x['phase'] for x in results['records']]
+        self.assertEqual(phases[:8], ['construction', 'assembly', 'reassembly', 'coloring', 'threaded_assembly',
+                                      'boundary_conditions', 'solve', 'member_forces'])
+        self.assertTrue(all(x['memory'] > 0 for x in results['records']))
+        self.assertEqual(compare(results, results), [])
+
+        # a baseline with a faster solve
+        baseline = copy.deepcopy(results)
+        for x in baseline['records']:
+            if x['phase'] == 'solve':
+                x['time'] = 1e-3
+                results['records'][phases.index('solve')]['time'] = 1.0
+        messages = compare(results, baseline)
+        self.assertEqual(len(messages), 1)
+        self.assertIn('solve', messages[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
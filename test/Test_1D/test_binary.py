@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from source.io.binary import ModelWriter, load_model, read_model
+from source.node import Node
+from source.OneD.frame.spatial_frame import SpatialFrameModel
+from source.OneD.truss.truss import TrussModel
+from source.utils import IDMixin
+
+
+class TestBinaryModelFormat(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'model')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_streaming_writer(self):
+        # a chain of 10 truss elements along x, written in chunks
+        n = 11
+        coords = np.column_stack((np.arange(n), np.zeros(n), np.zeros(n)))
+        fixed = np.zeros((n, 3), dtype=bool)
+        fixed[0] = True
+        fixed[:, 1:] = True
+        with ModelWriter(self.path, 'truss', ND=3) as writer:
+            writer.set_sections([[0.1, 7e10, 1.0], [0.2, 7e10, 1.0]])
+            for chunk in np.array_split(np.arange(n), 3):
+                writer.add_nodes(coords[chunk], fixed[chunk])
+            for chunk in np.array_split(np.arange(n - 1), 4):
+                writer.add_elements(np.column_stack((chunk, chunk + 1)), chunk % 2)
+            F = np.zeros(3 * n)
+            F[-3] = 1000
+            writer.add_load_case(F)
+
+        data = read_model(self.path)
+        self.assertIsInstance(data['coords'], np.memmap)
+        self.assertEqual(data['coords'].shape, (11, 3))
+        self.assertEqual(data['connectivity'].shape, (10, 2))
+        self.assertEqual(data['header']['arrays']['loads']['shape'], [1, 33])
+        np.testing.assert_array_equal(data['coords'], coords)
+
+        model = load_model(self.path)
+        self.assertIsInstance(model, TrussModel)
+        self.assertEqual(model.elements[1].A, 0.2)
+        u, _ = model.solve(data['loads'][0].copy())
+        # the elements are in series
+        np.testing.assert_allclose(u[-3], 1000 * 5 / 7e9 * (1 + 0.5))
+
+    def test_round_trip(self):
+        IDMixin.reset()
+        nodes = (Node(0, 0, 0), Node(1, 2, 3), Node(1, 2, 5))
+        model = SpatialFrameModel(
+            nodes_=nodes,
+            elements_=(
+                (0, 1, 1, 2, 3, 4, 5, 1, 0.3),
+                (1, 2, 2, 3, 4, 5, 6, 1, 0.25),
+            ),
+            supports_={0: (0, 1, 2, 3, 4, 5)},
+        )
+        model.save(self.path)
+        loaded = SpatialFrameModel.load(self.path)
+        self.assertEqual(loaded.supports, model.supports)
+        np.testing.assert_allclose(loaded.K, model.K)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,10 @@
+import os
+import tempfile
 import unittest
 
 import numpy as np
 
+from benchmarks.generators import frame_building
 from source.node import Node
 from source.OneD.frame.spatial_frame import SpatialFrameElement, SpatialFrameModel
 from source.utils import IDMixin
@@ -131,6 +134,239 @@ class TestSpatialFrameModelModal(unittest.TestCase):
     #         self.model2.plot_frame(shapes2[:, i])
 
 
+class TestBatchedKernels(unittest.TestCase):
+
+    def setUp(self):
+        IDMixin.reset()  # Reset ID counters for consistent testing
+        nodes = (Node(0, 0, 0), Node(1, 2, 3), Node(1, 2, 5), Node(-1, 0, 2))
+        self.model = SpatialFrameModel(
+            nodes_=nodes,
+            elements_=(
+                (nodes[0].ID, nodes[1].ID, 1, 2, 3, 4, 5, 1, 0.3),
+                (nodes[1].ID, nodes[2].ID, 2, 3, 4, 5, 6, 1, 0.25),  # vertical element
+                (nodes[2].ID, nodes[3].ID, 3, 4, 5, 6, 7, 1, 0.2),
+            ),
+            supports_={nodes[0].ID: (0, 1, 2, 3, 4, 5)},
+        )
+
+    def test_stiffness_matrices(self):
+        Ke = self.model.element_stiffness_matrices()
+        for i, element in enumerate(self.model.elements.values()):
+            np.testing.assert_allclose(Ke[i], element.Ke, atol=1e-12)
+
+    def test_geometric_stiffness_matrices(self):
+        N = np.array([-1., 2., 3.])
+        Kg = self.model.element_geometric_stiffness_matrices(N)
+        for i, element in enumerate(self.model.elements.values()):
+            np.testing.assert_allclose(Kg[i], element.Kg(N[i]), atol=1e-12)
+            np.testing.assert_allclose(Kg[i], Kg[i].T, atol=1e-12)
+
+    def test_model_cache_invalidation(self):
+        R = self.model.rotation_matrices()
+        self.assertIs(self.model.rotation_matrices(), R)
+
+        # moving a node is seen by the cached arrays of the model
+        node = self.model.nodes[2]
+        node.x, node.y = -1, 0
+        element = self.model.elements[1]
+        np.testing.assert_allclose(self.model.rotation_matrices()[1], element.transformation_matrix[:3, :3])
+        np.testing.assert_allclose(self.model.element_stiffness_matrices()[1], element.Ke, atol=1e-12)
+
+        element.Iy = 10
+        np.testing.assert_allclose(self.model.element_stiffness_matrices()[1], element.Ke, atol=1e-12)
+
+    def test_colored_assembly(self):
+        colors = self.model.element_colors()
+        # two colors for the chain of three elements, the end elements share one
+        self.assertEqual(colors.max() + 1, 2)
+        self.assertEqual(colors[0], colors[2])
+        # elements of the same color share no DOF
+        for color in range(colors.max() + 1):
+            dofs = self.model.element_dof_indices[colors == color].ravel()
+            self.assertEqual(len(dofs), len(np.unique(dofs)))
+
+        for free in (True, False):
+            K = self.model.assemble_sparse_K(free=free)
+            K_colored = self.model.assemble_sparse_K(free=free, max_workers=2)
+            np.testing.assert_allclose(K_colored.toarray(), K.toarray())
+
+        # a building, up to six elements meet at a node
+        model = frame_building(3, 3, 4)[0]
+        colors = model.element_colors()
+        nodes = model.element_dof_indices[:, ::model.ND] // model.ND
+        for color in range(colors.max() + 1):
+            self.assertEqual(len(nodes[colors == color].ravel()), len(np.unique(nodes[colors == color])))
+        self.assertLessEqual(colors.max() + 1, 12)
+        np.testing.assert_allclose(model.assemble_sparse_K(max_workers=3).toarray(),
+                                   model.assemble_sparse_K().toarray())
+
+    def test_axial_forces(self):
+        F = np.zeros(self.model.ND * len(self.model.nodes))
+        F[-6:-3] = (1, 2, 3)
+        u, _ = self.model.solve(F)
+        forces = self.model.member_forces(u)
+        expected = [forces[x.ID][x.j.ID][0] for x in self.model.elements.values()]
+        np.testing.assert_allclose(self.model.axial_forces(u), expected, rtol=1e-8)
+
+
+class TestSpatialFrameModelBuckling(unittest.TestCase):
+
+    def setUp(self):
+        """
+        A vertical cantilever column loaded by a compressive force at the top.
+        The critical loads are pi^2 E I / (4 L^2) for the two bending planes.
+        """
+        IDMixin.reset()  # Reset ID counters for consistent testing
+        self.L = 10
+        self.Iy, self.Iz = 1., 2.
+        nodes = tuple(Node(0, 0, z) for z in np.linspace(0, self.L, 11))
+        self.model = SpatialFrameModel(
+            nodes_=nodes,
+            elements_=tuple((x.ID, y.ID, 1, self.Iy, self.Iz, 1, 1, 1, 0.3) for x, y in zip(nodes, nodes[1:])),
+            supports_={nodes[0].ID: (0, 1, 2, 3, 4, 5)},
+        )
+        self.F = np.zeros(self.model.ND * len(self.model.nodes))
+        self.F[-4] = -1  # unit compression at the top
+
+    def test_critical_load_factors(self):
+        factors, shapes = self.model.solve_buckling(self.F, n_modes=2)
+        expected = sorted(np.pi ** 2 * I / (4 * self.L ** 2) for I in (self.Iy, self.Iz))
+        np.testing.assert_allclose(factors, expected, rtol=1e-3)
+        self.assertEqual(shapes.shape, (self.model.ND * len(self.model.nodes), 2))
+        np.testing.assert_allclose(shapes[:6], 0)  # the clamped base does not move
+
+    def test_shift(self):
+        factors, _ = self.model.solve_buckling(self.F, n_modes=1)
+        shifted, _ = self.model.solve_buckling(self.F, n_modes=1, sigma=0.9 * factors[0])
+        np.testing.assert_allclose(shifted, factors, rtol=1e-6)
+
+
+class TestSpatialFrameModelPDelta(unittest.TestCase):
+
+    def setUp(self):
+        """
+        A vertical cantilever column with an axial compressive force P and a lateral force H at the top.
+        The tip deflection is H (tan(kL) - kL) / (k^3 EI) with k = sqrt(P / EI).
+        """
+        IDMixin.reset()  # Reset ID counters for consistent testing
+        self.L = 10
+        self.I = 1.
+        nodes = tuple(Node(0, 0, z) for z in np.linspace(0, self.L, 11))
+        self.model = SpatialFrameModel(
+            nodes_=nodes,
+            elements_=tuple((x.ID, y.ID, 1, self.I, self.I, 1, 1, 1, 0.3) for x, y in zip(nodes, nodes[1:])),
+            supports_={nodes[0].ID: (0, 1, 2, 3, 4, 5)},
+        )
+        self.P = 0.5 * np.pi ** 2 * self.I / (4 * self.L ** 2)  # half of the critical load
+        self.H = 1e-3
+
+    def expected_deflection(self, H):
+        k = (self.P / self.I) ** 0.5
+        return H * (np.tan(k * self.L) - k * self.L) / (k ** 3 * self.I)
+
+    def test_cantilever(self):
+        F = np.zeros(self.model.ND * len(self.model.nodes))
+        F[-6] = self.H
+        F[-4] = -self.P
+        u, reactions, info = self.model.solve_p_delta(F)
+        self.assertTrue(info[0]['converged'])
+        self.assertAlmostEqual(u[-6] / self.expected_deflection(self.H), 1, delta=1e-3)
+        # the base moment includes the second order moment of the axial force
+        self.assertAlmostEqual(reactions[4], -(self.H * self.L + self.P * u[-6]), delta=1e-6)
+
+    def test_combinations(self):
+        F = np.zeros((self.model.ND * len(self.model.nodes), 3))
+        F[-6] = (self.H, 2 * self.H, 0)
+        F[-4] = -self.P
+        u, _, info = self.model.solve_p_delta(F, max_workers=3)
+        self.assertEqual(u.shape, F.shape)
+        self.assertTrue(all(x['converged'] for x in info))
+        for i in range(3):
+            u_single, _, _ = self.model.solve_p_delta(F[:, i])
+            np.testing.assert_allclose(u[:, i], u_single, atol=1e-12)
+        self.assertAlmostEqual(u[-6, 1] / self.expected_deflection(2 * self.H), 1, delta=1e-3)
+
+    def test_above_critical_load(self):
+        # between the first and the second critical load K + Kg is indefinite, the factorization has to pivot
+        P = 4 * self.P
+        F = np.zeros(self.model.ND * len(self.model.nodes))
+        F[-4] = -1
+        factors, _ = self.model.solve_buckling(F, n_modes=1)
+        self.assertGreater(P, factors[0])
+        F[-6] = self.H
+        F[-4] = -P
+        u, _, info = self.model.solve_p_delta(F)
+        self.assertTrue(info[0]['converged'])
+        k = (P / self.I) ** 0.5
+        expected = self.H * (np.tan(k * self.L) - k * self.L) / (k ** 3 * self.I)
+        self.assertLess(expected, 0)  # the column deflects against the lateral force
+        self.assertAlmostEqual(u[-6] / expected, 1, delta=1e-3)
+
+    def test_not_converged(self):
+        F = np.zeros(self.model.ND * len(self.model.nodes))
+        F[-6] = self.H
+        F[-4] = -self.P
+        with self.assertRaisesRegex(np.linalg.LinAlgError, r'combination\(s\) \[0\] did not converge'):
+            self.model.solve_p_delta(50 * F, max_iterations=1)
+        # the residual is within tol too
+        _, _, info = self.model.solve_p_delta(F, tol=1e-10)
+        self.assertLessEqual(info[0]['residual'], 1e-10)
+
+
+class TestSpatialFrameModelInternalActions(unittest.TestCase):
+
+    def setUp(self):
+        """A simply supported beam along the x axis, three elements, uniform load in the y direction."""
+        IDMixin.reset()  # Reset ID counters for consistent testing
+        self.L = 6.
+        self.q = 2.
+        nodes = tuple(Node(x, 0, 0) for x in np.linspace(0, self.L, 4))
+        self.model = SpatialFrameModel(
+            nodes_=nodes,
+            elements_=tuple((x.ID, y.ID, 1, 2, 3, 4, 5, 1, 0.3) for x, y in zip(nodes, nodes[1:])),
+            supports_={nodes[0].ID: (0, 1, 2, 3), nodes[-1].ID: (1, 2)},
+        )
+        self.member_loads = np.zeros((3, 3))
+        self.member_loads[:, 1] = -self.q
+        F = self.model.member_load_vector(self.member_loads)
+        self.u, _ = self.model.solve(F)
+
+    def test_uniform_load(self):
+        actions = self.model.internal_actions(self.u, n_stations=3, q=self.member_loads)
+        self.assertEqual(actions.shape, (1, 3, 3, 6))
+
+        # bending moment at midspan, shear forces at the supports
+        self.assertAlmostEqual(actions[0, 1, 1, 5], self.q * self.L ** 2 / 8, delta=1e-8)
+        self.assertAlmostEqual(actions[0, 0, 0, 1], -self.q * self.L / 2, delta=1e-8)
+        self.assertAlmostEqual(actions[0, 2, 2, 1], self.q * self.L / 2, delta=1e-8)
+        np.testing.assert_allclose(actions[0, [0, 2], [0, 2], 5], 0, atol=1e-8)
+        np.testing.assert_allclose(actions[..., [0, 2, 3, 4]], 0, atol=1e-8)
+
+        # the internal actions are continuous between the elements
+        np.testing.assert_allclose(actions[0, :-1, -1], actions[0, 1:, 0], atol=1e-8)
+
+    def test_end_values(self):
+        F = np.zeros(self.model.ND * len(self.model.nodes))
+        F[6:12] = (1, 2, 3, 4, 5, 6)
+        u, _ = self.model.solve(F)
+        U = np.stack((u, 2 * u), axis=1)
+        actions = self.model.internal_actions(U, n_stations=5)
+        self.assertEqual(actions.shape, (2, 3, 5, 6))
+
+        forces = self.model.member_forces(u)
+        for n, element in enumerate(self.model.elements.values()):
+            np.testing.assert_allclose(actions[0, n, 0], -forces[element.ID][element.i.ID], atol=1e-8)
+            np.testing.assert_allclose(actions[0, n, -1], forces[element.ID][element.j.ID], atol=1e-8)
+        np.testing.assert_allclose(actions[1], 2 * actions[0], atol=1e-8)
+
+    def test_memory_mapped_output(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'actions.npy')
+            actions = self.model.internal_actions(self.u, q=self.member_loads, out=path, chunk_size=2)
+            expected = self.model.internal_actions(self.u, q=self.member_loads)
+            np.testing.assert_allclose(np.load(path), expected)
+            del actions
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,47 @@
+import json
+import subprocess
+import sys
+import unittest
+
+# the numeric core: nodes, elements, models and solvers
+CORE_MODULES = (
+    'source.node',
+    'source.sparse',
+    'source.OneD.model',
+    'source.OneD.truss.truss',
+    'source.OneD.truss.nonlinear',
+    'source.OneD.beam.beam',
+    'source.OneD.frame.spatial_frame',
+)
+
+# optional dependencies, imported on first use only
+LAZY_MODULES = ('scipy', 'matplotlib', 'sympy')
+
+SCRIPT = f"""
+import json, sys, time
+import numpy
+start = time.perf_counter()
+for name in {CORE_MODULES!r}:
+    __import__(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({{'time': elapsed, 'loaded': [x for x in {LAZY_MODULES!r} if x in sys.modules]}}))
+"""
+
+
+class TestImportTime(unittest.TestCase):
+
+    """
+    Importing the core in a fresh interpreter must not load the optional dependencies and must stay fast, so short
+    lived worker processes start quickly.
+    """
+
+    def test_core_import(self):
+        result = subprocess.run([sys.executable, '-c', SCRIPT], capture_output=True, text=True, check=True)
+        result = json.loads(result.stdout.strip().splitlines()[-1])
+        self.assertEqual(result['loaded'], [])
+        # a generous bound, the core imports in a few tens of milliseconds after numpy
+        self.assertLess(result['time'], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from source.instrumentation import JsonLinesSink, MemorySink, instrument, instrumented, uninstrument
+from source.OneD.truss.truss import TrussModel
+
+
+def pyramid() -> TrussModel:
+    return TrussModel.from_arrays(
+        coords=[[1, 1, 0], [-1, 1, 0], [-1, -1, 0], [1, -1, 0], [0, 0, 1]],
+        connectivity=[[0, 4], [1, 4], [2, 4], [3, 4]],
+        properties=[0.1, 7e10, 1.0],
+        supports={k: (0, 1, 2) for k in range(4)},
+    )
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.model = pyramid()
+        self.load = np.zeros(15)
+        self.load[14] = -1000
+
+    def test_phases(self):
+        u, _ = self.model.solve(self.load.copy())
+        sink = MemorySink()
+        with instrumented(self.model, sink, memory=True):
+            u_instrumented, _ = self.model.solve(self.load.copy())
+        np.testing.assert_array_equal(u_instrumented, u)
+
+        # the nested phases finish first
+        self.assertEqual([(x.phase, x.depth) for x in sink.events], [
+            ('assemble_global_K', 2), ('apply_boundary_conditions', 1), ('_linear_solve', 1),
+            ('reaction_forces', 1), ('solve', 0)])
+        events = {x.phase: x for x in sink.events}
+        self.assertEqual(events['assemble_global_K'].info['shape'], [15, 15])
+        self.assertGreater(events['assemble_global_K'].memory, 15 * 15 * 8)
+        self.assertGreaterEqual(events['solve'].memory, events['assemble_global_K'].memory)
+        self.assertGreaterEqual(events['solve'].time, sum(x.time for x in sink.events if x.depth == 1))
+        self.assertEqual(set(sink.totals()), set(events))
+
+        # the original methods are restored
+        self.assertFalse(any(hasattr(x, '__instrumented__') for x in vars(self.model).values()))
+        self.model.solve(self.load.copy())
+        self.assertEqual(len(sink.events), 5)
+
+    def test_json_lines(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'events.jsonl')
+            sink = JsonLinesSink(path)
+            with instrumented(self.model, sink, phases=('solve',)):
+                self.model.solve(self.load.copy())
+                self.model.solve(self.load.copy())
+            sink.close()
+            with open(path) as f:
+                events = [json.loads(line) for line in f]
+        self.assertEqual([x['phase'] for x in events], ['solve', 'solve'])
+        self.assertEqual(events[0]['model'], 'TrussModel')
+        self.assertIsNone(events[0]['memory'])
+
+    def test_class(self):
+        sink = MemorySink()
+        instrument(TrussModel, sink, phases=('set_element_dof_indices', 'solve'))
+        try:
+            model = pyramid()
+            model.solve(self.load.copy())
+        finally:
+            uninstrument(TrussModel)
+        self.assertEqual([x.phase for x in sink.events], ['set_element_dof_indices', 'solve'])
+        # the inherited methods are not left behind in the class
+        self.assertNotIn('solve', vars(TrussModel))
+        pyramid().solve(self.load.copy())
+        self.assertEqual(len(sink.events), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+
+from source.mesh import weld_nodes
+from source.OneD.truss.truss import TrussModel
+
+
+class TestWeldNodes(unittest.TestCase):
+
+    def test_weld(self):
+        # two sub-meshes sharing node 1 / 3, node 5 is within the tolerance of node 4 and so of node 2
+        coords = [[0, 0], [1, 0], [2, 0], [1, 1e-9], [1, 1], [2, 1e-9]]
+        connectivity = [[0, 1], [1, 4], [3, 2], [3, 4], [2, 5], [1, 4]]
+        fixed = np.zeros((6, 2), dtype=bool)
+        fixed[0] = True
+        fixed[3, 1] = True
+        loads = np.arange(12.0)
+        result = weld_nodes(coords, connectivity, tol=1e-6, fixed=fixed, loads=loads)
+
+        np.testing.assert_array_equal(result.node_map, [0, 1, 2, 1, 3, 2])
+        np.testing.assert_array_equal(result.coords, [[0, 0], [1, 0], [2, 0], [1, 1]])
+        np.testing.assert_array_equal(result.merged, [3, 5])
+        self.assertEqual([x.tolist() for x in result.groups()], [[1, 3], [2, 5]])
+        # element 4 (2-5) collapses, elements 3 and 5 repeat element 1
+        np.testing.assert_array_equal(result.collapsed_elements, [4])
+        np.testing.assert_array_equal(result.elements, [0, 1, 2, 3, 5])
+        np.testing.assert_array_equal(result.duplicate_elements, [3, 5])
+        np.testing.assert_array_equal(result.connectivity, [[0, 1], [1, 3], [1, 2], [1, 3], [1, 3]])
+        np.testing.assert_array_equal(result.fixed, [[True, True], [False, True], [False, False], [False, False]])
+        np.testing.assert_array_equal(result.loads, [0, 1, 2 + 6, 3 + 7, 4 + 10, 5 + 11, 8, 9])
+        self.assertIn('6 nodes welded to 4', str(result))
+
+    def test_nothing_to_weld(self):
+        coords = np.random.default_rng(0).random((1000, 3))
+        connectivity = np.arange(1000).reshape(-1, 2)
+        result = weld_nodes(coords, connectivity, tol=1e-12)
+        np.testing.assert_array_equal(result.coords, coords)
+        np.testing.assert_array_equal(result.connectivity, connectivity)
+        self.assertEqual(len(result.merged), 0)
+        self.assertEqual(result.groups(), [])
+
+    def test_model(self):
+        # two bars meeting at the top, each with its own top node: a mechanism until the nodes are welded
+        model = TrussModel.from_arrays(
+            coords=[[0, 0], [1, 1], [2, 0], [1, 1]],
+            connectivity=[[0, 1], [2, 3]],
+            properties=[0.1, 7e10, 1.0],
+            supports={0: (0, 1), 2: (0, 1)},
+        )
+        F = np.zeros(8)
+        F[3] = -1000
+        self.assertFalse(model.check_stability().stable)
+        welded, result = model.weld_nodes(F=F)
+        self.assertEqual(len(welded.nodes), 3)
+        self.assertTrue(welded.check_stability().stable)
+        u, _ = welded.solve(result.loads.copy())
+        self.assertLess(u[3], 0)
+        self.assertAlmostEqual(u[2], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
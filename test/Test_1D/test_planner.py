@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+
+from benchmarks.generators import frame_building_with_dofs, truss_grid
+from source.planner import InsufficientMemoryError
+
+
+class TestPlanner(unittest.TestCase):
+
+    def setUp(self):
+        self.model, self.F = frame_building_with_dofs(1000)
+
+    def test_small_models_are_dense(self):
+        model, F = truss_grid(2, 3)
+        plan = model.plan_solve()
+        self.assertEqual(plan.backend, 'dense')
+        # the pattern is not even analysed
+        self.assertIsNone(plan.nnz)
+
+    def test_plan(self):
+        plan = self.model.plan_solve(memory_budget=2 ** 30)
+        self.assertIn(plan.backend, ('banded', 'sparse'))
+        self.assertEqual(set(plan.estimates), {'dense', 'banded', 'sparse', 'iterative'})
+        self.assertLess(plan.estimates['sparse'].memory, plan.estimates['dense'].memory)
+        self.assertLessEqual(plan.bandwidth, plan.n_free)
+        self.assertIn(f'backend: {plan.backend}', str(plan))
+
+        # a budget below the dense matrix excludes the dense backend
+        plan = self.model.plan_solve(memory_budget=plan.estimates['dense'].memory / 2, backend='dense')
+        self.assertIsNone(plan.backend)
+
+    def test_backends(self):
+        u_dense, r_dense = self.model.solve(self.F.copy(), backend='dense')
+        scale = np.abs(u_dense).max()
+        for backend in ('auto', 'banded', 'sparse', 'iterative'):
+            u, reactions = self.model.solve(self.F.copy(), backend=backend)
+            np.testing.assert_allclose(u, u_dense, atol=1e-6 * scale, err_msg=backend)
+            np.testing.assert_allclose(reactions, r_dense, atol=1e-6 * np.abs(r_dense).max(), err_msg=backend)
+
+        # several load cases
+        F = np.stack((self.F, 2 * self.F), axis=1)
+        u, _ = self.model.solve(F, backend='banded')
+        np.testing.assert_allclose(u[:, 1], 2 * u_dense, atol=1e-6 * scale)
+
+    def test_refuse(self):
+        with self.assertRaises(InsufficientMemoryError) as context:
+            self.model.solve(self.F.copy(), memory_budget=2 ** 10)
+        self.assertIsNone(context.exception.plan.backend)
+        self.assertIn('no backend fits', str(context.exception))
+        self.assertIsInstance(context.exception, MemoryError)
+
+
+if __name__ == '__main__':
+    unittest.main()
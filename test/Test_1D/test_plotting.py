@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from source.OneD.beam.beam import BeamModel
+from source.OneD.frame.spatial_frame import SpatialFrameModel
+from source.OneD.truss.truss import TrussModel
+from source.plotting import decimate, plot_lines
+
+
+class TestPlotting(unittest.TestCase):
+
+    """
+    The plots are rendered headless into files.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.tmp.name, name)
+
+    def test_plot_truss(self):
+        model = TrussModel.from_arrays(
+            coords=[[1, 1, 0], [-1, 1, 0], [-1, -1, 0], [1, -1, 0], [0, 0, 1]],
+            connectivity=[[0, 4], [1, 4], [2, 4], [3, 4]],
+            properties=[0.1, 7e10, 1.0],
+            supports={k: (0, 1, 2) for k in range(4)},
+        )
+        F = np.zeros(15)
+        F[14] = -1000
+        u, _ = model.solve(F)
+        ax = model.plot_truss(u, color_by_force=True, filename=self._file('truss.png'))
+        self.assertTrue(os.path.getsize(self._file('truss.png')) > 0)
+        # the original and the deformed elements, each one collection
+        self.assertEqual(len(ax.collections), 4)  # including the node markers
+        np.testing.assert_allclose(ax.collections[2].get_array(), model.axial_forces(u))
+
+    def test_plot_frame(self):
+        model = SpatialFrameModel.from_arrays(
+            coords=[[0, 0, 0], [0, 0, 3], [4, 0, 3]],
+            connectivity=[[0, 1], [1, 2]],
+            properties=[1e-2, 1e-5, 1e-5, 2e-5, 2.1e11, 7850, 0.3],
+            supports={0: tuple(range(6))},
+        )
+        F = np.zeros(18)
+        F[14] = -1000
+        u, _ = model.solve(F)
+        model.plot_frame(u, filename=self._file('frame.png'))
+        self.assertTrue(os.path.getsize(self._file('frame.png')) > 0)
+
+    def test_plot_beam(self):
+        model = BeamModel.from_arrays(
+            coords=np.column_stack((np.linspace(0, 10, 11), np.zeros(11))),
+            connectivity=np.column_stack((np.arange(10), np.arange(1, 11))),
+            properties=[0.1, 0.2, 7e10, 1.0],
+            supports={0: (0, 1)},
+        )
+        F = np.zeros(22)
+        F[-2] = -1000
+        u, _ = model.solve(F)
+        ax = model.plot_model(u, filename=self._file('beam.png'))
+        self.assertTrue(os.path.getsize(self._file('beam.png')) > 0)
+        # the deflection curves, one line per element
+        self.assertEqual(len(ax.collections[1].get_segments()), 10)
+
+    def test_decimation(self):
+        n = 1000
+        coords = np.random.default_rng(0).normal(size=(n + 1, 2))
+        connectivity = np.column_stack((np.arange(n), np.arange(1, n + 1)))
+        ax = plot_lines(coords, connectivity, max_segments=300, filename=self._file('lines.png'))
+        self.assertLessEqual(len(ax.collections[0].get_segments()), 300)
+        self.assertEqual(decimate(10, 20), slice(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from source.OneD.truss.truss import TrussModel
+from source.result_cache import ResultCache, TMP_MAX_AGE
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(self.tmp.name)
+        self.model = TrussModel.from_arrays(
+            coords=[[1, 1, 0], [-1, 1, 0], [-1, -1, 0], [1, -1, 0], [0, 0, 1]],
+            connectivity=[[0, 4], [1, 4], [2, 4], [3, 4]],
+            properties=[0.1, 7e10, 1.0],
+            supports={k: (0, 1, 2) for k in range(4)},
+        )
+        self.load = np.zeros(15)
+        self.load[14] = -1000
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_solve(self):
+        u, reactions = self.model.solve(self.load.copy())
+        for _ in range(2):
+            u_cached, reactions_cached = self.cache.solve(self.model, self.load)
+            np.testing.assert_array_equal(u_cached, u)
+            np.testing.assert_array_equal(reactions_cached, reactions)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        np.testing.assert_allclose(self.cache.static(self.model, self.load)['member_forces'],
+                                   self.model.axial_forces(u))
+
+    def test_invalidation(self):
+        self.cache.solve(self.model, self.load)
+        # a changed load or a changed property gives a new key
+        self.cache.solve(self.model, 2 * self.load)
+        self.model.elements[0].A = 0.2
+        self.cache.solve(self.model, self.load)
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 3))
+
+    def test_eviction(self):
+        self.cache.solve(self.model, self.load)
+        size = self.cache.size
+        self.cache.max_bytes = 2 * size
+        for factor in (2, 3, 4):
+            self.cache.solve(self.model, factor * self.load)
+        self.assertLessEqual(self.cache.size, 2 * size)
+        # the oldest results have been removed
+        self.assertIsNone(self.cache.get(self.cache.key(self.model, 'static', F=self.load)))
+        self.assertIsNotNone(self.cache.get(self.cache.key(self.model, 'static', F=4 * self.load)))
+
+    def test_corrupt_and_orphaned_files(self):
+        self.cache.solve(self.model, self.load)
+        key = self.cache.key(self.model, 'static', F=self.load)
+        path = self.cache.directory / (key + '.npz')
+        # a truncated result is a miss and is replaced
+        path.write_bytes(path.read_bytes()[:100])
+        self.assertIsNone(self.cache.get(key))
+        path.write_bytes(b'not a zip file')
+        self.assertIsNone(self.cache.get(key))
+        self.cache.solve(self.model, self.load)
+        self.assertIsNotNone(self.cache.get(key))
+
+        # temporary files of killed writers are removed once they are old, and by clear
+        old, new = self.cache.directory / 'old.tmp', self.cache.directory / 'new.tmp'
+        for tmp in (old, new):
+            tmp.write_bytes(b'partial')
+        past = time.time() - 2 * TMP_MAX_AGE
+        os.utime(old, (past, past))
+        self.cache.evict()
+        self.assertEqual((old.exists(), new.exists()), (False, True))
+        self.cache.clear()
+        self.assertEqual(list(self.cache.directory.iterdir()), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
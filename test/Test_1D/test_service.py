@@ -0,0 +1,58 @@
+import asyncio
+import unittest
+
+import numpy as np
+
+from source.OneD.truss.truss import TrussModel
+from source.service import ModelSpec, SolveService
+
+
+class TestSolveService(unittest.TestCase):
+
+    """
+    The pyramid truss of the truss tests, solved in worker processes.
+    """
+
+    def setUp(self):
+        self.spec = ModelSpec(
+            model_type='truss',
+            coords=np.array([[1, 1, 0], [-1, 1, 0], [-1, -1, 0], [1, -1, 0], [0, 0, 1]], dtype=float),
+            connectivity=np.array([[0, 4], [1, 4], [2, 4], [3, 4]]),
+            properties=np.array([0.1, 7e10, 1.0]),  # A, E, ro of all elements
+            fixed=np.vstack((np.ones((4, 3), dtype=bool), np.zeros((1, 3), dtype=bool))),
+        )
+        self.load = np.zeros(15)
+        self.load[14] = -1000
+
+        model = TrussModel.from_arrays(self.spec.coords, self.spec.connectivity, self.spec.properties,
+                                       self.spec.fixed)
+        self.u, self.reactions = model.solve(self.load.copy())
+
+    def test_solve(self):
+        async def run(service):
+            first = await service.solve(self.spec, self.load)
+            # the same model again, now solved with the cached factorization, with two load cases
+            second = await service.solve(self.spec, np.stack((self.load, 2 * self.load), axis=1))
+            return first, second
+
+        with SolveService(n_workers=2) as service:
+            first, second = asyncio.run(run(service))
+            self.assertEqual(len(service._cached[service._worker(self.spec.key)]), 1)
+
+        with first, second:
+            np.testing.assert_allclose(first.u, self.u, atol=1e-15)
+            np.testing.assert_allclose(first.reactions, self.reactions, atol=1e-6)
+            np.testing.assert_allclose(second.u[:, 0], first.u)
+            np.testing.assert_allclose(second.u[:, 1], 2 * first.u)
+        self.assertIsNone(first.u)
+
+    def test_solve_many(self):
+        with SolveService(n_workers=2) as service:
+            results = asyncio.run(service.solve_many([(self.spec, self.load), (self.spec, -self.load)]))
+        np.testing.assert_allclose(results[0].u, -results[1].u)
+        for result in results:
+            result.release()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+
+import numpy as np
+
+from source.sparse import SparsePattern
+
+
+class TestSparsePattern(unittest.TestCase):
+
+    def test_factorization_pivots(self):
+        # a well conditioned but indefinite tangent with vanishing diagonal entries, as past a limit point: the
+        # factorization without pivoting returns a wrong solution without any error
+        dof_indices = np.array([[0, 1], [1, 2]])
+        Ke = np.array([[[2., 1.], [1., 1e-17]], [[0., 1.], [1., 1e-17]]])
+        pattern = SparsePattern.from_dof_indices(dof_indices, 3)
+        data = pattern.assemble(Ke)
+        A = pattern.matrix(data).toarray()
+        self.assertLess(np.linalg.eigvalsh(A).min(), 0)
+        self.assertLess(np.linalg.cond(A), 10)
+
+        b = np.array([1., 2., 3.])
+        np.testing.assert_allclose(A @ pattern.factorize(data).solve(b), b, atol=1e-12)
+        np.testing.assert_allclose(pattern.factorize(data).solve(b), np.linalg.solve(A, b))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import time
+import unittest
+
+import numpy as np
+
+from benchmarks.generators import frame_building, frame_building_with_dofs
+from source.OneD.frame.spatial_frame import SpatialFrameModel
+from source.OneD.truss.truss import TrussModel
+from source.stability import StabilityError
+
+
+class TestStability(unittest.TestCase):
+
+    def test_stable(self):
+        model = TrussModel.from_arrays(
+            coords=[[1, 1, 0], [-1, 1, 0], [-1, -1, 0], [1, -1, 0], [0, 0, 1]],
+            connectivity=[[0, 4], [1, 4], [2, 4], [3, 4]],
+            properties=[0.1, 7e10, 1.0],
+            supports={k: (0, 1, 2) for k in range(4)},
+        )
+        report = model.check_stability()
+        self.assertTrue(report.stable, str(report))
+        report.raise_if_unstable()
+
+    def test_mechanism(self):
+        # a square frame of bars without a diagonal sways
+        model = TrussModel.from_arrays(
+            coords=[[0, 0], [1, 0], [1, 1], [0, 1]],
+            connectivity=[[0, 3], [1, 2], [2, 3]],
+            properties=[0.1, 7e10, 1.0],
+            supports={0: (0, 1), 1: (0, 1)},
+        )
+        report = model.check_stability()
+        self.assertFalse(report.stable)
+        self.assertEqual(report.dof_deficit, 1)
+        self.assertEqual(report.n_mechanisms, 1)
+        # the top nodes move sideways
+        np.testing.assert_array_equal(report.mechanism_dofs, [4, 6])
+        self.assertIn('node 2 ux', str(report))
+        with self.assertRaises(StabilityError):
+            report.raise_if_unstable()
+
+        # with a diagonal the square is stable
+        model = TrussModel.from_arrays(model.to_arrays()['coords'], [[0, 3], [1, 2], [2, 3], [0, 2]],
+                                       [0.1, 7e10, 1.0], {0: (0, 1), 1: (0, 1)})
+        self.assertTrue(model.check_stability().stable)
+
+    def test_unsupported_part_and_zero_stiffness(self):
+        # a spatial truss lying in a plane with free out-of-plane DOFs, and a second bar not connected to it
+        model = TrussModel.from_arrays(
+            coords=[[0, 0, 0], [1, 0, 0], [0, 1, 0], [5, 0, 0], [6, 0, 0]],
+            connectivity=[[0, 1], [1, 2], [0, 2], [3, 4]],
+            properties=[0.1, 7e10, 1.0],
+            supports={0: (0, 1, 2), 1: (1, 2)},
+        )
+        report = model.check_stability()
+        self.assertEqual(len(report.components), 2)
+        self.assertEqual([x.tolist() for x in report.unsupported], [[3, 4]])
+        # the out of plane DOF of node 2, and all but the axial DOFs of the free bar
+        np.testing.assert_array_equal(report.zero_stiffness_dofs, [8, 10, 11, 13, 14])
+        self.assertIn('node 2 uz', str(report))
+        # the free bar moves as a rigid body along its axis
+        self.assertEqual(report.n_mechanisms, 1)
+        np.testing.assert_array_equal(report.mechanism_dofs, [9, 12])
+
+    def test_frame_rigid_body_modes(self):
+        arrays = frame_building(2, 2, 3)[0].to_arrays()
+        model = SpatialFrameModel.from_arrays(arrays['coords'], arrays['connectivity'], arrays['properties'])
+        self.assertGreater(model.ND * len(model.nodes), 200)  # the sparse probe
+        report = model.check_stability()
+        self.assertEqual(report.n_mechanisms, 6)
+        self.assertEqual(len(report.unsupported), 1)
+        self.assertEqual(len(report.mechanism_dofs), model.ND * len(model.nodes))
+
+    def test_probe_cost(self):
+        # the check before a solve costs no more than the solve, both start from a new model
+        frame_building_with_dofs(1000)[0].check_stability()  # warm up the imports
+        model, F = frame_building_with_dofs(20000)
+        self.assertGreaterEqual(model.ND * len(model.nodes), 10 ** 4)
+        start = time.perf_counter()
+        model.solve(F)
+        solve_time = time.perf_counter() - start
+
+        model, F = frame_building_with_dofs(20000)
+        start = time.perf_counter()
+        report = model.check_stability()
+        check_time = time.perf_counter() - start
+        self.assertEqual(report.probed, model.plan_solve().backend != 'iterative')
+        self.assertTrue(report.stable, str(report))
+        self.assertLess(check_time, 1.5 * solve_time)
+
+        # the probe is skipped if the planner chooses the iterative solver
+        budget = model.plan_solve().estimates['iterative'].memory
+        self.assertEqual(model.plan_solve(budget).backend, 'iterative')
+        report = model.check_stability(memory_budget=budget)
+        self.assertFalse(report.probed)
+        self.assertIn('mechanisms not probed', str(report))
+
+
+if __name__ == '__main__':
+    unittest.main()
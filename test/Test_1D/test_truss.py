@@ -46,6 +46,26 @@ class TestTruss(unittest.TestCase):
         T = self.e1.transformation_matrix
         np.testing.assert_allclose(T @ T.T, np.eye(2))  # Check orthogonality
 
+    def test_cached_quantities(self):
+        # repeated reads return the cached, read-only arrays
+        self.assertIs(self.e1.Ke, self.e1.Ke)
+        self.assertIs(self.n1.coords, self.n1.coords)
+        with self.assertRaises(ValueError):
+            self.e1.ke[0, 0] = 0
+
+    def test_cache_invalidation(self):
+        Ke = self.e1.Ke
+        # moving a node changes the length and the stiffness
+        self.n2.x = 2.0
+        self.assertEqual(self.e1.length, 2.0)
+        np.testing.assert_allclose(self.e1.Ke, Ke / 2)
+        np.testing.assert_allclose(self.n2.coords, (2, 0, 0))
+
+        # changing a section property changes the stiffness, but not the geometry
+        self.e1.A = 2.0
+        np.testing.assert_allclose(self.e1.Ke, Ke)
+        self.assertEqual(self.e1.length, 2.0)
+
 
 class SingleElementTest(unittest.TestCase):
 
@@ -129,6 +149,55 @@ class MultiElementTest(unittest.TestCase):
         # all member forces are the same
         self.assertTrue(len(set(x[0] for x in member_forces)) == 1)
 
+    def test_member_force_table(self):
+        _K, _F = self.model.apply_boundary_conditions(self.load)  # Apply boundary conditions
+        _U = np.linalg.solve(_K, _F)
+
+        # three load cases: the load, the reversed load and no load
+        U = np.stack((_U, -_U, np.zeros_like(_U)), axis=1)
+        table = self.model.member_force_table(U, allowable_stress=1e4)
+        self.assertEqual(table.shape, (3, 4))
+
+        # the closed form: the four bars of length sqrt(3) carry the vertical load equally, in compression
+        expected = np.full(4, -1000 * np.sqrt(3) / 4)
+        np.testing.assert_allclose(table['N'][0], expected, rtol=1e-6)
+        # the end force at node j of each element, computed element by element
+        for N, element in zip(table['N'][0], self.model.elements.values()):
+            f = element.ke @ element.transformation_matrix @ _U[element.dof_indices]
+            self.assertAlmostEqual(N, f[1])
+        np.testing.assert_allclose(table['N'][1], -np.array(expected))
+        np.testing.assert_allclose(table['stress'], table['N'] / 0.1)
+        np.testing.assert_allclose(table['utilization'], np.abs(table['N']) / 0.1 / 1e4)
+        np.testing.assert_array_equal(table['state'], [[-1] * 4, [1] * 4, [0] * 4])
+        np.testing.assert_array_equal(table['element'][0], list(self.model.elements.keys()))
+
+    def test_sparse_assembly(self):
+        free = self.model.free_dofs()
+        K = self.model.assemble_sparse_K()
+        np.testing.assert_allclose(K.toarray(), self.model.K[np.ix_(free, free)])
+        # the pattern is computed once and reused for every assembly
+        self.assertIs(self.model.sparse_pattern(free), self.model.sparse_pattern(free))
+        pattern = self.model.sparse_pattern(free)
+        self.model.elements[0].A = 0.2
+        self.model.assemble_sparse_K()
+        self.assertIs(self.model.sparse_pattern(free), pattern)
+
+        # the factorization with the cached ordering gives the dense solution
+        u = np.zeros_like(self.load)
+        u[free] = pattern.factorize(K.data).solve(self.load[free])
+        np.testing.assert_allclose(K @ u[free], self.load[free])
+        np.testing.assert_allclose(u[free], np.linalg.solve(K.toarray(), self.load[free]))
+
+    def test_stiffness_operator(self):
+        K = self.model.K
+        operator = self.model.stiffness_operator()
+        u = np.random.default_rng(0).normal(size=(len(self.load), 2))
+        np.testing.assert_allclose(operator @ u[:, 0], K @ u[:, 0])
+        np.testing.assert_allclose(operator @ u, K @ u)
+
+        _u, _re = self.model.solve(self.load.copy())
+        np.testing.assert_allclose(_re, K @ _u - self.load, atol=1e-6)
+
 
 if __name__ == '__main__':
     unittest.main()
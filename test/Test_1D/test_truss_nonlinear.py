@@ -0,0 +1,81 @@
+import unittest
+
+import numpy as np
+
+from source.node import Node
+from source.OneD.truss.truss import TrussModel
+from source.OneD.truss.nonlinear import NonlinearTrussSolver
+from source.utils import IDMixin
+
+
+class VonMisesTrussTest(unittest.TestCase):
+
+    """
+    A shallow two-bar truss loaded vertically at the apex. The horizontal displacement of the apex is restrained.
+    Under increasing load the truss snaps through, the analytical equilibrium path is
+
+    P(w) = -2 N (h - w) / l, l = sqrt(1 + (h - w)^2), N = EA (l - L) / L
+
+    where w is the downward displacement of the apex.
+    """
+
+    def setUp(self):
+        IDMixin.reset()  # Reset ID counters for consistent testing
+
+        self.h = 0.1
+        self.EA = 1000.
+        self.L = (1 + self.h ** 2) ** 0.5
+
+        n1 = Node(-1, 0)
+        n2 = Node(0, self.h)
+        n3 = Node(1, 0)
+        self.model = TrussModel(
+            nodes_=(n1, n2, n3),
+            elements_=((n1.ID, n2.ID, 1., self.EA, 1.),
+                       (n2.ID, n3.ID, 1., self.EA, 1.),),
+            supports_={n1.ID: (0, 1), n2.ID: (0, ), n3.ID: (0, 1)},
+        )
+
+        self.P = 0.3  # reference load, downwards, the limit load is about 0.38
+        self.F = np.zeros(self.model.ND * len(self.model.nodes))
+        self.F[3] = -self.P
+
+    def analytical_load(self, w):
+        l = (1 + (self.h - w) ** 2) ** 0.5
+        N = self.EA * (l - self.L) / self.L
+        return -2 * N * (self.h - w) / l
+
+    def test_tangent_at_rest_is_linear_stiffness(self):
+        solver = NonlinearTrussSolver(self.model)
+        Kt = solver.tangent_stiffness(np.zeros(solver.n_dofs)).toarray()
+        free = self.model.free_dofs()
+        K = self.model.K[np.ix_(free, free)]
+        np.testing.assert_allclose(Kt, K, atol=1e-10)
+
+    def test_newton_raphson(self):
+        results = list(self.model.solve_nonlinear(self.F, n_steps=5))
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(x.converged for x in results))
+        for result in results:
+            w = -result.u[3]
+            self.assertAlmostEqual(self.analytical_load(w), result.load_factor * self.P, delta=1e-6)
+        # compression in both bars
+        self.assertTrue(np.all(results[-1].axial_forces < 0))
+
+    def test_arc_length_snap_through(self):
+        results = list(self.model.solve_nonlinear(self.F, arc_length=0.02, n_steps=10))
+        self.assertTrue(all(x.converged for x in results))
+
+        load_factors = np.array([x.load_factor for x in results])
+        ws = np.array([-x.u[3] for x in results])
+        for w, load_factor in zip(ws, load_factors):
+            self.assertAlmostEqual(self.analytical_load(w), load_factor * self.P, delta=1e-6)
+
+        # the path passes the limit point, the load reverses and the apex snaps through below the supports
+        self.assertTrue(np.all(np.diff(ws) > 0))
+        self.assertLess(load_factors.min(), 0)
+        self.assertGreater(ws[-1], self.h)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from source.io.vtu import export_model, write_vtu
+from source.OneD.truss.truss import TrussModel
+
+
+def read_vtu(path) -> dict:
+    """Reads the arrays of a .vtu file with raw appended data."""
+    with open(path, 'rb') as f:
+        content = f.read()
+    start = content.index(b'<AppendedData encoding="raw">')
+    data_start = content.index(b'_', start) + 1
+    root = ET.fromstring(content[:start] + b'</VTKFile>')
+    dtypes = {'Float64': '<f8', 'Int64': '<i8', 'UInt8': 'u1'}
+    arrays = {}
+    for x in root.iter('DataArray'):
+        offset = data_start + int(x.get('offset'))
+        n_bytes = int(np.frombuffer(content[offset:offset + 8], dtype='<u8')[0])
+        array = np.frombuffer(content[offset + 8:offset + 8 + n_bytes], dtype=dtypes[x.get('type')])
+        arrays[x.get('Name', 'points')] = array.reshape(-1, int(x.get('NumberOfComponents')))
+    return arrays
+
+
+class TestVtuExport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.model = TrussModel.from_arrays(
+            coords=[[1, 1, 0], [-1, 1, 0], [-1, -1, 0], [1, -1, 0], [0, 0, 1]],
+            connectivity=[[0, 4], [1, 4], [2, 4], [3, 4]],
+            properties=[0.1, 7e10, 1.0],
+            supports={k: (0, 1, 2) for k in range(4)},
+        )
+        self.load = np.zeros(15)
+        self.load[14] = -1000
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_write_vtu(self):
+        path = os.path.join(self.tmp.name, 'mesh.vtu')
+        coords = np.random.default_rng(0).normal(size=(7, 2))
+        connectivity = np.column_stack((np.arange(6), np.arange(1, 7)))
+        write_vtu(path, coords, connectivity, point_data={'T': np.arange(7.0)},
+                  cell_data={'N': np.ones(6)}, chunk_size=4)
+        arrays = read_vtu(path)
+        np.testing.assert_array_equal(arrays['points'][:, :2], coords)
+        np.testing.assert_array_equal(arrays['points'][:, 2], 0)
+        np.testing.assert_array_equal(arrays['connectivity'], connectivity)
+        np.testing.assert_array_equal(arrays['offsets'][:, 0], 2 * np.arange(1, 7))
+        np.testing.assert_array_equal(arrays['types'], 3)
+        np.testing.assert_array_equal(arrays['T'][:, 0], np.arange(7))
+
+    def test_time_history(self):
+        u, _ = self.model.solve(self.load.copy())
+        U = np.outer(u, [0, 0.5, 1])
+        path = export_model(self.tmp.name, self.model, U, times=[0, 0.1, 0.2], name='truss')
+        self.assertTrue(str(path).endswith('truss.pvd'))
+        collection = ET.parse(path).getroot()
+        files = [x.get('file') for x in collection.iter('DataSet')]
+        self.assertEqual(files, ['truss_0000.vtu', 'truss_0001.vtu', 'truss_0002.vtu'])
+
+        arrays = read_vtu(os.path.join(self.tmp.name, files[2]))
+        np.testing.assert_allclose(arrays['displacement'], u.reshape(-1, 3))
+        np.testing.assert_allclose(arrays['N'][:, 0], self.model.axial_forces(u))
+        np.testing.assert_array_equal(arrays['properties'], [[0.1, 7e10, 1.0]] * 4)
+
+    def test_memmap_history(self):
+        u, _ = self.model.solve(self.load.copy())
+        factors = np.linspace(0, 1, 5)
+        # an (n_dofs, n_steps) file read in blocks of two steps, and a step-major file passed transposed
+        by_dof = np.memmap(os.path.join(self.tmp.name, 'by_dof.dat'), dtype=float, mode='w+', shape=(15, 5))
+        by_dof[:] = np.outer(u, factors)
+        by_step = np.memmap(os.path.join(self.tmp.name, 'by_step.dat'), dtype=float, mode='w+', shape=(5, 15))
+        by_step[:] = np.outer(factors, u)
+        for name, U in (('by_dof', by_dof), ('by_step', by_step.T)):
+            export_model(self.tmp.name, self.model, U, times=factors, name=name, block_bytes=2 * 15 * 8)
+            for step, factor in enumerate(factors):
+                arrays = read_vtu(os.path.join(self.tmp.name, f'{name}_{step:04d}.vtu'))
+                np.testing.assert_allclose(arrays['displacement'], factor * u.reshape(-1, 3))
+                np.testing.assert_allclose(arrays['N'][:, 0], self.model.axial_forces(factor * u))
+        del by_dof, by_step
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import json
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+from source.TwoD.Axissymmetric.kernels import get_kernel, assemble_stiffness, harmonic_stiffness, elasticity_matrices
+from source.TwoD.PlaneQuad.plane_quad import rectangle
+
+
+class TestAxisymmetricKernels(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_tri_centroid(self):
+        # method 3 of tri_axissymmetric.ipynb: the B matrix at the centroid, Example 13.3 of the Szekrenyes book
+        r, z = np.array([3., 4., 3.]), np.array([0., 0., 1.])
+        alpha = np.array([r[1] * z[2] - r[2] * z[1], r[2] * z[0] - r[0] * z[2], r[0] * z[1] - r[1] * z[0]])
+        beta = np.array([z[1] - z[2], z[2] - z[0], z[0] - z[1]])
+        gamma = np.array([r[2] - r[1], r[0] - r[2], r[1] - r[0]])
+        two_A = r @ beta
+        rc, zc = r.mean(), z.mean()
+        B = np.zeros((4, 6))
+        B[0, 0::2] = beta / two_A
+        B[1, 0::2] = (alpha / rc + beta + gamma * zc / rc) / two_A
+        B[2, 1::2] = gamma / two_A
+        B[3, 0::2] = gamma / two_A
+        B[3, 1::2] = beta / two_A
+        expected = 2 * np.pi * rc * two_A / 2 * B.T @ elasticity_matrices(200e9, 0.3) @ B
+
+        kernel = get_kernel('tri3', order=1, directory=self.directory.name)
+        K = kernel.stiffness_matrices(np.column_stack((r, z))[None], 200e9, 0.3)
+        np.testing.assert_allclose(K[0], expected, rtol=1e-12, atol=1e-3)
+
+    def test_rigid_body_modes(self):
+        coords = np.array([[[1, 0], [2, 0], [2.2, 1], [0.9, 1.1]]], dtype=float)
+        K = get_kernel('quad4', directory=self.directory.name).stiffness_matrices(coords, 200e9, 0.3)
+        values = np.linalg.eigvalsh(K[0])
+        # the translation along the axis
+        self.assertEqual(int(np.sum(values < 1e-9 * values.max())), 1)
+
+        K = get_kernel('quad4', 'harmonic', directory=self.directory.name).stiffness_matrices(coords, 200e9, 0.3)
+        # n = 0: axial translation and torsion, n = 1: lateral translation and tilt, n = 2: none
+        for n, n_modes in ((0, 2), (1, 2), (2, 0)):
+            values = np.linalg.eigvalsh(harmonic_stiffness(K, n)[0])
+            self.assertEqual(int(np.sum(values < 1e-9 * values.max())), n_modes)
+
+    def test_patch(self):
+        # uniaxial stress along the axis is represented exactly: no forces at the inner nodes
+        coords, connectivity = rectangle(1, 2, 4, 4)
+        coords[:, 0] += 1
+        coords[12] += 0.05  # an inner node, the elements are distorted
+        triangles = np.concatenate((connectivity[:, [0, 1, 2]], connectivity[:, [0, 2, 3]]))
+        u = np.column_stack((-0.3 * 1e-3 * coords[:, 0], 1e-3 * coords[:, 1])).ravel()
+        inner = np.flatnonzero((coords[:, 0] > 1) & (coords[:, 0] < 2) & (coords[:, 1] > 0) & (coords[:, 1] < 2))
+        for elements in (connectivity, triangles):
+            K = assemble_stiffness(coords, elements, 200e9, 0.3, directory=self.directory.name)
+            f = (K @ u).reshape(-1, 2)
+            np.testing.assert_allclose(f[inner], 0, atol=1e-6 * np.abs(f).max())
+            # the axial forces of the top edge sum up to the axial force
+            top = np.isclose(coords[:, 1], 2)
+            self.assertAlmostEqual(f[top, 1].sum() / (200e9 * 1e-3 * np.pi * (2 ** 2 - 1)), 1)
+
+    def test_disk_cache(self):
+        kernel = get_kernel('tri3', directory=self.directory.name)
+        self.assertTrue(kernel.path.exists())
+        # a new process loads the generated module, without sympy
+        script = (f'import json, sys\n'
+                  f'from source.TwoD.Axissymmetric.kernels import get_kernel\n'
+                  f'K = get_kernel("tri3", directory={self.directory.name!r}).stiffness_matrices('
+                  f'[[[1, 0], [2, 0], [1, 1]]], 1., 0.3)\n'
+                  f'print(json.dumps({{"sympy": "sympy" in sys.modules, "K": K.tolist()}}))')
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+        result = json.loads(result.stdout.strip().splitlines()[-1])
+        self.assertFalse(result['sympy'])
+        np.testing.assert_allclose(result['K'], kernel.stiffness_matrices([[[1, 0], [2, 0], [1, 1]]], 1., 0.3))
+
+
+if __name__ == '__main__':
+    unittest.main()
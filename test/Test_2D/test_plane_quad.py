@@ -1,15 +1,20 @@
+import tempfile
 import unittest
 import random
 
 import numpy as np
 
 from source.node import Node
-from source.TwoD.PlaneQuad.plane_quad import PlaneQuadModel
+from source.io.binary import load_model
+from source.result_cache import ResultCache
+from source.utils import IDMixin
+from source.TwoD.PlaneQuad.plane_quad import PlaneQuadModel, rectangle, plate_stiffness_matrices
 
 
 class TestRM2DPlate(unittest.TestCase):
 
     def setUp(self):
+        IDMixin.reset()  # Reset ID counters for consistent testing
         n1 = Node(-3, -4, 0)
         n2 = Node(1, -2, 0)
         n3 = Node(1.5, 2, 0)
@@ -39,6 +44,72 @@ class TestRM2DPlate(unittest.TestCase):
         eta = random.randrange(-100, 100) / 100
         np.testing.assert_almost_equal(sum(self.element._N(xi, eta)), 1.)
 
+    def test_rigid_body_modes(self):
+        # w, rotation about x and rotation about y; the one point shear integration of a single element adds two
+        # spurious modes, they are suppressed in a supported mesh
+        for shear_rule, n_modes in ((2, 3), (1, 5)):
+            Ke = plate_stiffness_matrices(self.element.coords[None], 1.2, 210, 0.3, shear_rule=shear_rule)[0]
+            values = np.linalg.eigvalsh(Ke)
+            self.assertEqual(int(np.sum(values < 1e-9 * values.max())), n_modes)
+        np.testing.assert_allclose(self.element.Ke, Ke)
+
+
+class TestPlaneQuadModel(unittest.TestCase):
+
+    @staticmethod
+    def clamped_plate(n: int, shear_rule: int = 1) -> tuple:
+        # square plate a = 1, t = 0.01, clamped at the edges
+        coords, connectivity = rectangle(1, 1, n, n)
+        edge = np.isclose(coords, 0).any(axis=1) | np.isclose(coords, 1).any(axis=1)
+        fixed = np.repeat(edge[:, None], 3, axis=1)
+        model = PlaneQuadModel.from_arrays(coords, connectivity, [0.01, 210e9, 0.3], fixed)
+        model.shear_rule = shear_rule
+        D = 210e9 * 0.01 ** 3 / (12 * (1 - 0.3 ** 2))
+        centre = np.flatnonzero(np.isclose(coords, 0.5).all(axis=1))[0]
+        return model, D, centre
+
+    def test_clamped_plate(self):
+        model, D, centre = self.clamped_plate(16)
+        F = model.pressure_load(1000.)
+        np.testing.assert_almost_equal(F.sum(), 1000.)
+        u, _ = model.solve(F, backend='sparse')
+        # Timoshenko: w = 0.00126 q a^4 / D
+        self.assertAlmostEqual(u[3 * centre] / (0.00126 * 1000 / D), 1, delta=0.02)
+        np.testing.assert_allclose(model.solve(F, backend='dense')[0], u, rtol=1e-6, atol=1e-12)
+        # mx = 0.0231 q a^2 at the centre, from the four elements around it
+        M = model.stress_resultants(u)['M']
+        self.assertAlmostEqual(np.sort(M[:, 0])[-4:].mean() / (0.0231 * 1000), 1, delta=0.1)
+
+    def test_shear_locking(self):
+        # the full integration of the shear part locks the thin plate
+        model, D, centre = self.clamped_plate(8, shear_rule=2)
+        u, _ = model.solve(model.pressure_load(1000.), backend='sparse')
+        self.assertLess(u[3 * centre] / (0.00126 * 1000 / D), 0.1)
+
+    def test_settings(self):
+        # the shear rule and the shear correction factor are part of the model content
+        model, _, _ = self.clamped_plate(4, shear_rule=2)
+        model.kappa = 0.8
+        element = next(iter(model.elements.values()))
+        np.testing.assert_allclose(element.Ke, model.element_stiffness_matrices()[0])
+
+        F = model.pressure_load(1000.)
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResultCache(directory)
+            u, _ = cache.solve(model, F)
+            model.shear_rule = 1
+            np.testing.assert_allclose(element.Ke, model.element_stiffness_matrices()[0])
+            u_reduced, _ = cache.solve(model, F)
+            self.assertEqual(cache.hits, 0)
+            self.assertGreater(np.abs(u_reduced).max(), 2 * np.abs(u).max())
+
+            model.save(directory + '/plate')
+            loaded = load_model(directory + '/plate')
+        welded, _ = model.weld_nodes()
+        for copy in (loaded, welded):
+            self.assertIsInstance(copy, PlaneQuadModel)
+            self.assertEqual((copy.kappa, copy.shear_rule), (0.8, 1))
+            np.testing.assert_allclose(copy.solve(F)[0], u_reduced)
 
 
 if __name__ == '__main__':